@@ -116,6 +116,39 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# --- REPORTES GENERADOS (caché + cola de reportes) ---
+# Fuera de MEDIA_ROOT a propósito: solo se entregan por las vistas de reportes (con permisos)
+REPORTES_DIR = Path(config("REPORTES_DIR", default=str(BASE_DIR / "reportes_generados")))
+
+# --- CACHÉ (ver core.cache) ---
+# CACHE_BACKEND elige el backend de toda la app; DASHBOARD_CACHE, el de los
+# dashboards (core.cache_dashboard; por defecto el mismo). Valores:
+#   locmem (por defecto, por proceso) | file | db (requiere `python manage.py createcachetable`)
+#   | una URL redis://... (Redis o compatible: Valkey, KeyDB...; requiere el paquete redis)
+# Con varios procesos (gunicorn) conviene file, db o redis: locmem no se comparte.
+# CACHE_VERSION: subirlo en un deploy invalida todo lo guardado.
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem")
+CACHE_DIR = Path(config("CACHE_DIR", default=str(BASE_DIR / "cache")))
+CACHE_VERSION = config("CACHE_VERSION", default=1, cast=int)
+
+
+def _backend_cache(tipo, nombre):
+    if tipo.startswith(("redis://", "rediss://", "unix://")):
+        backend = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": tipo, "KEY_PREFIX": nombre}
+    elif tipo == "file":
+        backend = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(CACHE_DIR / nombre)}
+    elif tipo == "db":
+        backend = {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": f"cache_{nombre}"}
+    else:
+        backend = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": nombre}
+    return {**backend, "VERSION": CACHE_VERSION}
+
+
+CACHES = {
+    "default": _backend_cache(CACHE_BACKEND, "default"),
+    "dashboard": _backend_cache(config("DASHBOARD_CACHE", default=CACHE_BACKEND), "dashboard"),
+}
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_URL = "login"
@@ -0,0 +1,172 @@
+"""
+Caché de aplicación sobre el framework de Django (settings.CACHES).
+
+El backend lo eligen CACHE_BACKEND / DASHBOARD_CACHE en el .env (locmem,
+file, db o un servidor Redis local). Este módulo agrega:
+
+1) obtener(clave, calcular): cache-aside con candado anti-estampida. Cada
+   entrada guarda (valor, vence_en) y vive GRACIA más que su TTL: cuando
+   vence, UN proceso toma el candado (cache.add, atómico) y la recalcula;
+   los demás siguen sirviendo el valor vencido en vez de recalcular todos a
+   la vez. Si no hay valor previo, esperan un poco a que aparezca.
+
+2) @memoizar(*espacios, ttl=..., version=...): memoiza una función por sus
+   argumentos. La clave lleva:
+   - version: subirla invalida lo guardado por esa función (p. ej. al cambiar
+     lo que devuelve); CACHE_VERSION (settings) hace lo mismo con toda la caché;
+   - la generación de cada espacio de nombres del que depende la función.
+
+3) invalidar(*espacios): sube la generación de esos espacios de nombres
+   (al confirmar la transacción). Todo lo memoizado que dependa de ellos deja
+   de encontrarse y vence solo por TTL; no hay que conocer las claves.
+   core.signals invalida "inventario" con los cambios de Espacio y Recurso.
+
+Solo hay espacios de nombres con algo memoizado debajo: cada uno cuesta una
+ida a la caché por alias en cada escritura de sus modelos. Para memoizar sobre
+otros datos se agrega el espacio aquí y su invalidación en las signals.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+
+ESPACIOS = ("inventario",)
+
+TTL_DEFECTO = 60 * 5
+# Cuánto más vive una entrada vencida (para servirla mientras otro la recalcula)
+GRACIA = 60
+# Candado de recálculo: si el proceso que lo toma muere, se libera solo
+CANDADO_TTL = 30
+# Sin valor previo: cuánto se espera a que otro proceso termine de calcular
+ESPERA_MAX = 5.0
+ESPERA_PASO = 0.05
+
+
+# -----------------------------
+# Cache-aside con candado anti-estampida
+# -----------------------------
+
+def obtener(clave, calcular, ttl=TTL_DEFECTO, alias="default"):
+    """Valor de `clave`; si falta o venció, lo calcula UN solo proceso a la vez."""
+    cache = caches[alias]
+    entrada = cache.get(clave)
+    if entrada is not None and entrada[1] > time.time():
+        return entrada[0]
+
+    candado = f"candado:{clave}"
+    if cache.add(candado, 1, CANDADO_TTL):
+        try:
+            valor = calcular()
+            cache.set(clave, (valor, time.time() + ttl), ttl + GRACIA)
+        finally:
+            cache.delete(candado)
+        return valor
+
+    # Otro proceso está recalculando
+    if entrada is not None:
+        return entrada[0]
+
+    limite = time.monotonic() + ESPERA_MAX
+    while time.monotonic() < limite:
+        time.sleep(ESPERA_PASO)
+        entrada = cache.get(clave)
+        if entrada is not None:
+            return entrada[0]
+
+    # El otro no terminó a tiempo: se calcula sin guardar (él guardará)
+    return calcular()
+
+
+# -----------------------------
+# Espacios de nombres (generaciones)
+# -----------------------------
+
+def _validar(espacios):
+    desconocidos = set(espacios) - set(ESPACIOS)
+    if desconocidos:
+        raise ValueError(f"Espacio de caché desconocido: {', '.join(sorted(desconocidos))}")
+
+
+def _clave_generacion(espacio):
+    return f"generacion:{espacio}"
+
+
+def generaciones(espacios, alias="default") -> dict:
+    """{espacio: generación} en una lectura. Una generación perdida se recrea con la hora actual."""
+    cache = caches[alias]
+    claves = {_clave_generacion(e): e for e in espacios}
+    actuales = cache.get_many(claves)
+
+    faltantes = {c: time.time_ns() for c in claves if c not in actuales}
+    for clave, valor in faltantes.items():
+        # add: si otro proceso la creó recién, se respeta la suya
+        if not cache.add(clave, valor, None):
+            faltantes[clave] = cache.get(clave, valor)
+    actuales.update(faltantes)
+    return {claves[c]: v for c, v in actuales.items()}
+
+
+def _subir_generaciones(espacios):
+    # En todos los alias: cada función memoiza en el suyo
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        for espacio in espacios:
+            try:
+                cache.incr(_clave_generacion(espacio))
+            except ValueError:  # no existía: se crea al leerla
+                pass
+
+
+def invalidar(*espacios) -> None:
+    """Invalida todo lo memoizado que dependa de `espacios` (al confirmar la transacción)."""
+    _validar(espacios)
+    transaction.on_commit(lambda: _subir_generaciones(espacios))
+
+
+# -----------------------------
+# Memoización
+# -----------------------------
+
+def _serializable(valor):
+    if isinstance(valor, models.Model):
+        return f"{valor._meta.label}:{valor.pk}"
+    if hasattr(valor, "isoformat"):
+        return valor.isoformat()
+    return repr(valor)
+
+
+def _clave_argumentos(args, kwargs) -> str:
+    crudo = json.dumps([args, kwargs], sort_keys=True, default=_serializable)
+    return hashlib.sha1(crudo.encode()).hexdigest()
+
+
+def memoizar(*espacios, ttl=TTL_DEFECTO, version=1, alias="default"):
+    """
+    Decorador cache-aside para funciones puras de (args, datos de `espacios`).
+
+        @memoizar("inventario", ttl=600)
+        def espacios_activos(): ...
+
+    La función decorada tiene .sin_cache (la original) para tests o para
+    forzar el cálculo.
+    """
+    _validar(espacios)
+
+    def decorador(func):
+        nombre = f"memo:{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def envoltura(*args, **kwargs):
+            gens = generaciones(espacios, alias) if espacios else {}
+            sufijo = ":".join(f"{e}{gens[e]}" for e in espacios)
+            clave = f"{nombre}:v{version}:{sufijo}:{_clave_argumentos(args, kwargs)}"
+            return obtener(clave, lambda: func(*args, **kwargs), ttl=ttl, alias=alias)
+
+        envoltura.sin_cache = func
+        return envoltura
+
+    return decorador
@@ -0,0 +1,91 @@
+"""
+Caché de los dashboards (home del solicitante y admin_dashboard).
+
+Usa el alias CACHE_DASHBOARD de settings.CACHES (locmem, archivo, BD o Redis
+según DASHBOARD_CACHE en el .env). Entradas:
+
+- home:u<id>:<fecha>  KPIs de un solicitante (core.kpis.kpis_home)
+- admin:<fecha>       KPIs globales (core.kpis.kpis_admin_dashboard)
+- inventario          conteos de espacios/recursos del home (memoizado en el
+                      espacio de nombres "inventario", ver core.cache)
+
+La fecha va en la clave porque los gráficos son "los últimos 7 días": al
+cambiar de día la entrada vieja simplemente deja de leerse.
+
+Invalidación (core.signals): los post_save/post_delete de Reserva y
+RecursoReserva borran el home de ESE solicitante y el admin; las operaciones
+masivas avisan con dias_recalculados. El borrado se hace al confirmar la
+transacción (on_commit), para no volver a cachear datos sin confirmar. El TTL
+solo acota lo que se pueda escapar (p. ej. una lectura concurrente que
+guarda justo después de invalidar). Las lecturas pasan por core.cache.obtener:
+al vencer una entrada muy pedida (el admin), la recalcula un solo proceso.
+"""
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import memoizar, obtener
+from .kpis import kpis_admin_dashboard, kpis_home, kpis_inventario
+
+CACHE_DASHBOARD = "dashboard"
+TTL_DASHBOARD = 60 * 10
+
+
+def _cache():
+    return caches[CACHE_DASHBOARD]
+
+
+def clave_home(usuario_id, hoy) -> str:
+    return f"home:u{usuario_id}:{hoy.isoformat()}"
+
+
+def clave_admin(hoy) -> str:
+    return f"admin:{hoy.isoformat()}"
+
+
+def _leer(clave, calcular):
+    return obtener(clave, calcular, ttl=TTL_DASHBOARD, alias=CACHE_DASHBOARD)
+
+
+# -----------------------------
+# Lectura
+# -----------------------------
+
+def home(usuario_id, hoy=None) -> dict:
+    hoy = hoy or timezone.localdate()
+    return _leer(clave_home(usuario_id, hoy), lambda: kpis_home(usuario_id, hoy))
+
+
+@memoizar("inventario", ttl=TTL_DASHBOARD, alias=CACHE_DASHBOARD)
+def inventario() -> dict:
+    return kpis_inventario()
+
+
+def admin(hoy=None) -> dict:
+    hoy = hoy or timezone.localdate()
+    return _leer(clave_admin(hoy), lambda: kpis_admin_dashboard(hoy=hoy))
+
+
+# -----------------------------
+# Invalidación
+# -----------------------------
+
+def _borrar(claves) -> None:
+    claves = list(claves)
+    if claves:
+        transaction.on_commit(lambda: _cache().delete_many(claves))
+
+
+def invalidar_usuarios(usuario_ids) -> None:
+    hoy = timezone.localdate()
+    _borrar(clave_home(i, hoy) for i in set(usuario_ids) if i)
+
+
+def invalidar_admin() -> None:
+    _borrar([clave_admin(timezone.localdate())])
+
+
+def invalidar_inventario() -> None:
+    # inventario() se invalida con el espacio "inventario" (core.signals);
+    # los conteos de espacios/recursos también salen en el admin
+    invalidar_admin()
@@ -0,0 +1,172 @@
+"""
+KPIs del dashboard de administración.
+
+Se leen de la tabla de hechos ResumenDiarioReserva (reservas.estadisticas),
+que ya trae las reservas agregadas por (fecha, espacio, área, carrera, estado):
+no hay joins Reserva -> User -> Carrera -> Area en cada carga.
+
+Cada bloque del dashboard es UNA consulta agregada:
+
+1) conteos por estado (Sum con filter)
+2) reservas por día de la última semana (GROUP BY fecha)
+3) espacios activos
+4) recursos críticos
+5) top recursos pedidos
+6) reservas por área
+7-8) carrera con más reservas / más recursos
+9-10) fecha con más reservas / más recursos
+
+Total acotado: CONSULTAS_ADMIN_DASHBOARD, sin importar el volumen de datos.
+
+El home del solicitante (kpis_home) sale de sus propias reservas en
+CONSULTAS_HOME consultas: conteos (hoy + por estado) en un aggregate, la
+semana en un GROUP BY fecha, top recursos y últimas reservas.
+
+Los dos se sirven desde caché (core.cache_dashboard).
+"""
+from datetime import timedelta
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventario.models import Espacio, Recurso
+from reservas.models import RecursoReserva, Reserva, ResumenDiarioReserva
+
+CONSULTAS_ADMIN_DASHBOARD = 10
+CONSULTAS_HOME = 4
+DIAS_GRAFICO = 7
+STOCK_CRITICO = 5
+
+
+def conteos_por_estado(qs=None, estados=("PENDIENTE", "APROBADA", "RECHAZADA")) -> dict:
+    """{estado: total} en una sola consulta con agregación condicional."""
+    qs = ResumenDiarioReserva.objects.all() if qs is None else qs
+    return qs.aggregate(**{e: Coalesce(Sum("reservas", filter=Q(estado=e)), 0) for e in estados})
+
+
+def serie_diaria(hoy=None, dias=DIAS_GRAFICO, qs=None):
+    """(labels "dd/mm", totales) de los últimos `dias` días con un GROUP BY fecha."""
+    hoy = hoy or timezone.localdate()
+    desde = hoy - timedelta(days=dias - 1)
+    qs = ResumenDiarioReserva.objects.all() if qs is None else qs
+
+    por_fecha = dict(
+        qs.filter(fecha__gte=desde, fecha__lte=hoy)
+        .values("fecha")
+        .annotate(total=Sum("reservas"))
+        .order_by()
+        .values_list("fecha", "total")
+    )
+    fechas = [desde + timedelta(days=i) for i in range(dias)]
+    return [f.strftime("%d/%m") for f in fechas], [por_fecha.get(f, 0) for f in fechas]
+
+
+def top_recursos(qs=None, limite=5):
+    qs = RecursoReserva.objects.all() if qs is None else qs
+    top = list(
+        qs.values("recurso__nombre")
+        .annotate(total_pedidos=Sum("cantidad"))
+        .order_by("-total_pedidos")[:limite]
+    )
+    return [x["recurso__nombre"] for x in top], [x["total_pedidos"] for x in top]
+
+
+def _mayor(qs, campo, metrica):
+    fila = qs.values(campo).annotate(total=Sum(metrica)).order_by("-total").first() or {}
+    return fila.get(campo), fila.get("total") or 0
+
+
+def kpis_admin_dashboard(hoy=None) -> dict:
+    """Contexto completo de administracion/dashboard.html."""
+    resumen = ResumenDiarioReserva.objects.all()
+    con_recursos = resumen.filter(recursos__gt=0)
+    con_carrera = resumen.exclude(carrera__isnull=True)
+
+    estados = conteos_por_estado(resumen)
+    chart_labels, chart_data = serie_diaria(hoy, qs=resumen)
+    recursos_labels, recursos_data = top_recursos()
+
+    areas = list(
+        resumen.exclude(area__isnull=True)
+        .values("area__nombre")
+        .annotate(total=Sum("reservas"))
+        .order_by("-total")
+    )
+
+    carrera_reservas, carrera_reservas_total = _mayor(con_carrera, "carrera__nombre", "reservas")
+    carrera_stock, carrera_stock_total = _mayor(con_carrera.filter(recursos__gt=0), "carrera__nombre", "recursos")
+    fecha_reservas, fecha_reservas_total = _mayor(resumen, "fecha", "reservas")
+    fecha_stock, fecha_stock_total = _mayor(con_recursos, "fecha", "recursos")
+
+    return {
+        'pending_count': estados["PENDIENTE"],
+        'approved_count': estados["APROBADA"],
+        'rejected_count': estados["RECHAZADA"],
+        'total_spaces': Espacio.objects.filter(activo=True).count(),
+        'critical_resources': Recurso.objects.filter(stock__lte=STOCK_CRITICO).count(),
+
+        'chart_labels': chart_labels,
+        'chart_data': chart_data,
+        'recursos_labels': recursos_labels,
+        'recursos_data': recursos_data,
+        'areas_labels': [x["area__nombre"] for x in areas],
+        'areas_data': [x["total"] for x in areas],
+
+        'kpi_carrera_mas_reservas_nombre': carrera_reservas or "N/A",
+        'kpi_carrera_mas_reservas_total': carrera_reservas_total,
+        'kpi_carrera_mas_stock_nombre': carrera_stock or "N/A",
+        'kpi_carrera_mas_stock_total': int(carrera_stock_total),
+        'kpi_fecha_mas_reservas': fecha_reservas,
+        'kpi_fecha_mas_reservas_total': fecha_reservas_total,
+        'kpi_fecha_mas_stock': fecha_stock,
+        'kpi_fecha_mas_stock_total': int(fecha_stock_total),
+    }
+
+
+def kpis_home(usuario_id, hoy=None) -> dict:
+    """KPIs y gráficos del home de un solicitante (solo sus reservas)."""
+    hoy = hoy or timezone.localdate()
+    desde = hoy - timedelta(days=DIAS_GRAFICO - 1)
+    propias = Reserva.objects.filter(solicitante_id=usuario_id)
+
+    conteos = propias.aggregate(
+        hoy=Count("id", filter=Q(fecha=hoy)),
+        **{e: Count("id", filter=Q(estado=e)) for e in ("PENDIENTE", "APROBADA", "RECHAZADA")},
+    )
+    por_fecha = dict(
+        propias.filter(fecha__range=(desde, hoy))
+        .values("fecha")
+        .annotate(total=Count("id"))
+        .order_by()
+        .values_list("fecha", "total")
+    )
+    fechas = [desde + timedelta(days=i) for i in range(DIAS_GRAFICO)]
+    recursos_labels, recursos_data = top_recursos(RecursoReserva.objects.filter(reserva__solicitante_id=usuario_id))
+
+    return {
+        'kpi_reservas_hoy': conteos["hoy"],
+        'kpi_pendientes': conteos["PENDIENTE"],
+        'kpi_aprobadas': conteos["APROBADA"],
+        'kpi_rechazadas': conteos["RECHAZADA"],
+        # Dicts y no instancias: el resultado va a la caché y un modelo pickleado
+        # arrastra su estado interno (y se rompe al cambiar el modelo entre deploys)
+        'ultimas_reservas': list(
+            propias.order_by("-fecha_solicitud")
+            .values("id", "fecha", "hora_inicio", "hora_fin", "estado", espacio_nombre=F("espacio__nombre"))[:5]
+        ),
+
+        'chart_labels': [f.strftime("%d/%m") for f in fechas],
+        'chart_data': [por_fecha.get(f, 0) for f in fechas],
+        'recursos_labels': recursos_labels,
+        'recursos_data': recursos_data,
+        'estados_data': [conteos["PENDIENTE"], conteos["APROBADA"], conteos["RECHAZADA"]],
+    }
+
+
+def kpis_inventario() -> dict:
+    """Conteos de inventario que muestra el home (iguales para todos los usuarios)."""
+    return {
+        'kpi_espacios_disponibles': Espacio.objects.filter(activo=True).count(),
+        'kpi_recursos': Recurso.objects.count(),
+    }
@@ -0,0 +1,85 @@
+"""
+Mixins reutilizables para modelos del proyecto.
+"""
+from django.core.exceptions import FieldDoesNotExist
+
+
+class CamposRastreadosMixin:
+    """
+    Guarda los valores con que se cargó la instancia desde la base de datos, para
+    saber "qué había antes" sin volver a consultar (por ejemplo, en un pre_save).
+
+    Uso:
+        class Reserva(CamposRastreadosMixin, models.Model):
+            campos_rastreados = ('estado', 'espacio_id', 'fecha')
+
+    - Se usan los attname de los campos (para FKs: 'espacio_id', no 'espacio').
+    - Los campos diferidos (.only()/.defer()) no quedan rastreados:
+      tiene_original() devuelve False y quien lo use decide si consulta.
+    - Después de save() / refresh_from_db() la foto se actualiza; los signals
+      pre_save y post_save siguen viendo los valores anteriores.
+    """
+
+    campos_rastreados = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._guardar_originales()
+        return instance
+
+    def _guardar_originales(self, campos=None):
+        originales = getattr(self, '_originales', None)
+        if originales is None or campos is None:
+            originales = self._originales = {}
+        for campo in self.campos_rastreados if campos is None else campos:
+            if campo in self.__dict__:
+                originales[campo] = self.__dict__[campo]
+
+    def tiene_original(self, campo) -> bool:
+        return campo in getattr(self, '_originales', {})
+
+    def valor_original(self, campo, default=None):
+        return getattr(self, '_originales', {}).get(campo, default)
+
+    def campo_cambio(self, campo) -> bool:
+        """True si el campo cambió respecto a lo cargado (False si no hay valor original)."""
+        if not self.tiene_original(campo):
+            return False
+        return self.__dict__.get(campo) != self._originales[campo]
+
+    def campos_cambiados(self) -> dict:
+        """{campo: (anterior, actual)} de los campos rastreados que cambiaron."""
+        return {
+            campo: (anterior, self.__dict__.get(campo))
+            for campo, anterior in getattr(self, '_originales', {}).items()
+            if self.__dict__.get(campo) != anterior
+        }
+
+    def _rastreados_entre(self, campos):
+        """Campos rastreados incluidos en `campos` (acepta nombre o attname)."""
+        attnames = set()
+        for nombre in campos:
+            try:
+                attnames.add(self._meta.get_field(nombre).attname)
+            except FieldDoesNotExist:  # p. ej. un prefetch pasado a refresh_from_db
+                continue
+        return [c for c in self.campos_rastreados if c in attnames]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._guardar_originales()
+        else:
+            self._guardar_originales(self._rastreados_entre(update_fields))
+
+    save.alters_data = True
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None:
+            self._guardar_originales([c for c in self.campos_rastreados if c in self.__dict__])
+        else:
+            # Solo lo recargado: el resto conserva su foto aunque tenga cambios sin guardar
+            self._guardar_originales(self._rastreados_entre(fields))
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.apps import apps
 
+from .mixins import CamposRastreadosMixin
+
 # ==============================================================================
 # 1. MANAGER PERSONALIZADO
 # ==============================================================================
@@ -79,7 +81,10 @@ class Area(models.Model):
         return self.nombre
 
 
-class Carrera(models.Model):
+class Carrera(CamposRastreadosMixin, models.Model):
+    # El resumen diario de reservas guarda el área: si cambia, se recalcula (reservas.signals)
+    campos_rastreados = ("area_id",)
+
     area = models.ForeignKey(
         Area,
         on_delete=models.CASCADE,
@@ -101,7 +106,10 @@ class Carrera(models.Model):
 # ==============================================================================
 # 3. MODELO DE USUARIO
 # ==============================================================================
-class User(AbstractUser):
+class User(CamposRastreadosMixin, AbstractUser):
+    # Área/carrera van en el resumen diario de sus reservas (reservas.signals)
+    campos_rastreados = ("carrera_id", "area_id")
+
     # ROLES DEL SISTEMA
     ROLES = (
         ("ADMIN", "Administrador"),
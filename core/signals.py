@@ -0,0 +1,104 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from inventario.models import Espacio, Recurso
+from reservas.derivados import dias_recalculados
+from reservas.models import RecursoReserva, Reserva
+
+from . import cache_dashboard
+from .cache import invalidar
+from .models import Area, Carrera
+
+# Espacio de nombres de caché (core.cache) que invalida cada modelo: solo los
+# que tienen algo memoizado debajo (cache_dashboard.inventario)
+ESPACIO_DE_CACHE = {
+    Espacio: "inventario",
+    Recurso: "inventario",
+}
+
+
+def _solicitantes_de_dias(pares):
+    """Solicitantes con reservas en los (espacio_id, fecha) dados (una consulta por espacio)."""
+    por_espacio = {}
+    for espacio_id, fecha in pares:
+        por_espacio.setdefault(espacio_id, set()).add(fecha)
+
+    ids = set()
+    for espacio_id, fechas in por_espacio.items():
+        ids.update(
+            Reserva.objects.filter(espacio_id=espacio_id, fecha__in=fechas)
+            .values_list("solicitante_id", flat=True)
+            .distinct()
+        )
+    return ids
+
+
+# =============================================================================
+# DASHBOARDS: cada cambio borra solo el home del solicitante afectado (+ admin)
+# =============================================================================
+@receiver(post_save, sender=Reserva)
+@receiver(post_delete, sender=Reserva)
+def dashboard_reserva(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cache_dashboard.invalidar_usuarios([instance.solicitante_id])
+    cache_dashboard.invalidar_admin()
+
+
+@receiver(post_save, sender=RecursoReserva)
+@receiver(post_delete, sender=RecursoReserva)
+def dashboard_recurso_reserva(sender, instance, raw=False, origin=None, **kwargs):
+    # Borrado en cascada desde la reserva: su propio post_delete ya invalidó
+    if raw or isinstance(origin, Reserva):
+        return
+    solicitantes = Reserva.objects.filter(pk=instance.reserva_id).values_list("solicitante_id", flat=True)
+    cache_dashboard.invalidar_usuarios(solicitantes)
+    cache_dashboard.invalidar_admin()
+
+
+@receiver(dias_recalculados)
+def dashboard_dias_recalculados(sender, pares, origen=None, **kwargs):
+    # Con origen, el recálculo viene del signal de una Reserva (ya invalidado arriba);
+    # sin origen es una operación masiva (update/bulk_update/bulk_create)
+    if origen is not None or not pares:
+        return
+    cache_dashboard.invalidar_usuarios(_solicitantes_de_dias(pares))
+    cache_dashboard.invalidar_admin()
+
+
+# =============================================================================
+# DASHBOARDS: inventario (conteos del home y del admin) y nombres de área/carrera
+# =============================================================================
+@receiver(post_save, sender=Espacio)
+@receiver(post_delete, sender=Espacio)
+@receiver(post_save, sender=Recurso)
+@receiver(post_delete, sender=Recurso)
+def dashboard_inventario(sender, raw=False, **kwargs):
+    if not raw:
+        cache_dashboard.invalidar_inventario()
+
+
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+@receiver(post_save, sender=Carrera)
+@receiver(post_delete, sender=Carrera)
+def dashboard_area_carrera(sender, raw=False, **kwargs):
+    if not raw:
+        cache_dashboard.invalidar_admin()
+
+
+# =============================================================================
+# CACHÉ POR ESPACIO DE NOMBRES: lo memoizado con core.cache.memoizar
+# =============================================================================
+def _espacio_guardado(sender, raw=False, **kwargs):
+    if not raw:
+        invalidar(ESPACIO_DE_CACHE[sender])
+
+
+def _espacio_eliminado(sender, **kwargs):
+    invalidar(ESPACIO_DE_CACHE[sender])
+
+
+for _modelo in ESPACIO_DE_CACHE:
+    post_save.connect(_espacio_guardado, sender=_modelo, dispatch_uid=f"core_cache_save_{_modelo.__name__}")
+    post_delete.connect(_espacio_eliminado, sender=_modelo, dispatch_uid=f"core_cache_delete_{_modelo.__name__}")
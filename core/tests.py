@@ -1,3 +1,359 @@
-from django.test import TestCase
+from datetime import time, timedelta
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from inventario.models import Espacio, Recurso
+from notificaciones.models import Notificacion
+from reservas.derivados import recalcular_dias
+from reservas.models import Reserva, RecursoReserva
+
+from . import cache as cache_app
+from . import cache_dashboard
+from .kpis import CONSULTAS_ADMIN_DASHBOARD, CONSULTAS_HOME, kpis_admin_dashboard, kpis_home
+from .models import Area, Carrera, User
+
+# Los presupuestos de consultas asumen una caché en memoria (con CACHE_BACKEND=db
+# las lecturas de caché también serían consultas)
+CACHES_LOCMEM = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"tests-{alias}"}
+    for alias in ("default", "dashboard")
+}
+
+
+@override_settings(CACHES=CACHES_LOCMEM)
+class AdminDashboardKpisTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        area = Area.objects.create(nombre="Ingeniería")
+        carrera = Carrera.objects.create(nombre="Informática", codigo="INF", area=area)
+        cls.admin = User.objects.create_user(
+            email="admin@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN", carrera=carrera,
+        )
+        solicitante = User.objects.create_user(
+            email="docente@test.cl", password="x", first_name="D", last_name="C", carrera=carrera,
+        )
+        espacio = Espacio.objects.create(nombre="Sala 1", ubicacion="A", capacidad=30)
+        recurso = Recurso.objects.create(nombre="Proyector", codigo="P1", stock=3)
+
+        hoy = timezone.localdate()
+        estados = ["PENDIENTE", "APROBADA", "APROBADA", "RECHAZADA"]
+        for i in range(20):
+            reserva = Reserva.objects.create(
+                solicitante=solicitante, espacio=espacio, fecha=hoy - timedelta(days=i % 10),
+                hora_inicio=time(9), hora_fin=time(10), motivo="x", estado=estados[i % 4],
+            )
+            RecursoReserva.objects.create(reserva=reserva, recurso=recurso, cantidad=1)
+
+    def test_kpis_cantidad_de_consultas_acotada(self):
+        with self.assertNumQueries(CONSULTAS_ADMIN_DASHBOARD):
+            kpis = kpis_admin_dashboard()
+
+        self.assertEqual(kpis["pending_count"], 5)
+        self.assertEqual(kpis["approved_count"], 10)
+        self.assertEqual(kpis["rejected_count"], 5)
+        self.assertEqual(len(kpis["chart_data"]), 7)
+        self.assertEqual(sum(kpis["chart_data"]), 14)
+        self.assertEqual(kpis["areas_labels"], ["Ingeniería"])
+        self.assertEqual(kpis["areas_data"], [20])
+        self.assertEqual(kpis["kpi_carrera_mas_stock_total"], 20)
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        with CaptureQueriesContext(connection) as antes:
+            kpis_admin_dashboard()
+        reserva = Reserva.objects.first()
+        for _ in range(30):
+            reserva.pk = None
+            reserva.save()
+        with CaptureQueriesContext(connection) as despues:
+            kpis_admin_dashboard()
+        self.assertEqual(len(antes), len(despues))
+
+    def test_vista_admin_dashboard(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse("admin_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        # KPIs + sesión/usuario del request
+        self.assertLessEqual(len(consultas), CONSULTAS_ADMIN_DASHBOARD + 4)
+
+
+class ExportReservasCsvTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        salud = Area.objects.create(nombre="Salud")
+        informatica = Carrera.objects.create(nombre="Informática", codigo="INF", area=Area.objects.create(nombre="TI"))
+        cls.admin = User.objects.create_user(
+            email="admin@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN",
+        )
+        cls.area_salud = salud
+        con_carrera = User.objects.create_user(
+            email="inf@test.cl", password="x", first_name="I", last_name="N", carrera=informatica,
+        )
+        legacy = User.objects.create_user(email="salud@test.cl", password="x", first_name="S", last_name="A")
+        # Usuario antiguo: sin carrera, solo con área directa
+        User.objects.filter(pk=legacy.pk).update(carrera=None, area=salud)
+        espacio = Espacio.objects.create(nombre="Sala 1", ubicacion="A", capacidad=30)
+        for i, (usuario, estado) in enumerate([
+            (con_carrera, "APROBADA"), (con_carrera, "PENDIENTE"), (legacy, "APROBADA"),
+        ]):
+            Reserva.objects.create(
+                solicitante=usuario, espacio=espacio, fecha=timezone.localdate() + timedelta(days=i),
+                hora_inicio=time(9), hora_fin=time(10), motivo="x", estado=estado,
+            )
+
+    def _csv(self, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("export_reservas_csv"), params)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_exporta_todas_con_encabezado(self):
+        lineas = self._csv()
+        self.assertEqual(lineas[0], "id,solicitante,rut,area,carrera,espacio,fecha,hora,estado")
+        self.assertEqual(len(lineas), 4)
+        self.assertIn("Salud,Sin Carrera", lineas[1])
+
+    def test_filtros(self):
+        hoy = timezone.localdate()
+        self.assertEqual(len(self._csv(estado="APROBADA")), 3)
+        self.assertEqual(len(self._csv(area=self.area_salud.pk)), 2)
+        self.assertEqual(len(self._csv(desde=hoy + timedelta(days=1), hasta=hoy + timedelta(days=1))), 2)
+        # filtros inválidos se ignoran
+        self.assertEqual(len(self._csv(desde="x", estado="NADA", area="abc")), 4)
+
+
+@override_settings(CACHES=CACHES_LOCMEM)
+class DashboardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        cls.otro = User.objects.create_user(email="otro@test.cl", password="x", first_name="O", last_name="T")
+        cls.espacio = Espacio.objects.create(nombre="Sala 1", ubicacion="A", capacidad=30)
+        cls.recurso = Recurso.objects.create(nombre="Proyector", codigo="P1", stock=3)
+        cls.hoy = timezone.localdate()
+        cls._reserva(cls.usuario)
+        cls._reserva(cls.usuario)
+        RecursoReserva.objects.create(reserva=cls._reserva(cls.otro), recurso=cls.recurso, cantidad=2)
+
+    @classmethod
+    def _reserva(cls, solicitante, **extra):
+        return Reserva.objects.create(
+            solicitante=solicitante, espacio=cls.espacio, fecha=cls.hoy,
+            hora_inicio=time(9), hora_fin=time(10), motivo="x", **extra,
+        )
+
+    def setUp(self):
+        caches[cache_dashboard.CACHE_DASHBOARD].clear()
+        self.cache = caches[cache_dashboard.CACHE_DASHBOARD]
+        self.clave = cache_dashboard.clave_home(self.usuario.pk, self.hoy)
+        self.clave_otro = cache_dashboard.clave_home(self.otro.pk, self.hoy)
+
+    def test_kpis_home(self):
+        with self.assertNumQueries(CONSULTAS_HOME):
+            kpis = kpis_home(self.usuario.pk, self.hoy)
+        self.assertEqual(kpis["kpi_reservas_hoy"], 2)
+        self.assertEqual(kpis["kpi_pendientes"], 2)
+        self.assertEqual(kpis["chart_data"], [0] * 6 + [2])
+        self.assertEqual(len(kpis["ultimas_reservas"]), 2)
+        self.assertEqual(kpis["ultimas_reservas"][0]["espacio_nombre"], self.espacio.nombre)
+        self.assertTrue(all(isinstance(r, dict) for r in kpis["ultimas_reservas"]))
+
+    def test_home_desde_cache(self):
+        self.client.force_login(self.usuario)
+        primera = self.client.get(reverse("home"))
+        with self.assertNumQueries(2):  # sesión + usuario: KPIs e inventario desde caché
+            segunda = self.client.get(reverse("home"))
+        self.assertEqual(primera.context["chart_data"], segunda.context["chart_data"])
+        self.assertEqual(segunda.context["kpi_espacios_disponibles"], 1)
+        self.assertEqual(segunda.context["kpi_reservas_hoy"], 2)
+
+    def test_cambios_invalidan_solo_al_solicitante(self):
+        cache_dashboard.home(self.usuario.pk, self.hoy)
+        cache_dashboard.home(self.otro.pk, self.hoy)
+        cache_dashboard.admin(self.hoy)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva = self._reserva(self.usuario)
+        self.assertIsNone(self.cache.get(self.clave))
+        self.assertIsNone(self.cache.get(cache_dashboard.clave_admin(self.hoy)))
+        self.assertIsNotNone(self.cache.get(self.clave_otro))
+        self.assertEqual(cache_dashboard.home(self.usuario.pk, self.hoy)["kpi_reservas_hoy"], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecursoReserva.objects.create(reserva=reserva, recurso=self.recurso, cantidad=1)
+        self.assertIsNone(self.cache.get(self.clave))
+        self.assertIsNotNone(self.cache.get(self.clave_otro))
+
+    def test_operaciones_masivas_invalidan_por_dias(self):
+        cache_dashboard.home(self.usuario.pk, self.hoy)
+        cache_dashboard.home(self.otro.pk, self.hoy)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reserva.objects.filter(solicitante=self.otro).update(estado="CANCELADA")
+            recalcular_dias({(self.espacio.pk, self.hoy)})
+        self.assertIsNone(self.cache.get(self.clave_otro))
+        self.assertIsNone(self.cache.get(self.clave))  # mismo día/espacio: también se recalcula
+
+    def test_inventario_invalida_home_y_admin(self):
+        cache_dashboard.inventario()
+        cache_dashboard.admin(self.hoy)
+        with self.assertNumQueries(0):
+            cache_dashboard.inventario()
+        with self.captureOnCommitCallbacks(execute=True):
+            Espacio.objects.create(nombre="Sala 2", ubicacion="A", capacidad=10)
+        self.assertIsNone(self.cache.get(cache_dashboard.clave_admin(self.hoy)))
+        self.assertEqual(cache_dashboard.inventario()["kpi_espacios_disponibles"], 2)
+
+
+@override_settings(CACHES=CACHES_LOCMEM)
+class CacheAppTests(TestCase):
+    def setUp(self):
+        self.cache = caches["default"]
+        self.cache.clear()
+        self.llamadas = []
+
+    def _contar(self, valor="v"):
+        self.llamadas.append(valor)
+        return valor
+
+    def test_memoizar_con_espacios_y_version(self):
+        @cache_app.memoizar("inventario")
+        def doble(x):
+            self.llamadas.append(x)
+            return x * 2
+
+        self.assertEqual([doble(2), doble(2), doble(3)], [4, 4, 6])
+        self.assertEqual(self.llamadas, [2, 3])
+
+        # Un cambio en inventario (signal) invalida; uno en core, no
+        with self.captureOnCommitCallbacks(execute=True):
+            Area.objects.create(nombre="Salud")
+        doble(2)
+        self.assertEqual(self.llamadas, [2, 3])
+        with self.captureOnCommitCallbacks(execute=True):
+            Recurso.objects.create(nombre="Proyector", codigo="P1", stock=3)
+        doble(2)
+        self.assertEqual(self.llamadas, [2, 3, 2])
+
+        # Otra versión de la función no lee lo guardado por la anterior
+        doble_v2 = cache_app.memoizar("inventario", version=2)(doble.sin_cache)
+        doble_v2(2)
+        self.assertEqual(self.llamadas, [2, 3, 2, 2])
+
+        with self.assertRaises(ValueError):
+            cache_app.memoizar("reservas")  # sin nada memoizado debajo: no existe
+
+    def test_candado_anti_estampida(self):
+        cache_app.obtener("hot", lambda: self._contar("viejo"), ttl=60)
+        # Vencida (pero dentro de la gracia) y con otro proceso recalculando: se sirve la vencida
+        valor, _ = self.cache.get("hot")
+        self.cache.set("hot", (valor, 0), 60)
+        self.cache.add("candado:hot", 1)
+        self.assertEqual(cache_app.obtener("hot", lambda: self._contar("nuevo")), "viejo")
+        self.assertEqual(self.llamadas, ["viejo"])
+
+        # Candado libre: recalcula UN proceso y lo suelta
+        self.cache.delete("candado:hot")
+        self.assertEqual(cache_app.obtener("hot", lambda: self._contar("nuevo")), "nuevo")
+        self.assertIsNone(self.cache.get("candado:hot"))
+        self.assertEqual(cache_app.obtener("hot", lambda: self._contar("otro")), "nuevo")
+        self.assertEqual(self.llamadas, ["viejo", "nuevo"])
+
+    def test_generacion_perdida_no_revive_entradas(self):
+        antes = cache_app.generaciones(["inventario"])["inventario"]
+        self.cache.delete("generacion:inventario")
+        self.assertGreater(cache_app.generaciones(["inventario"])["inventario"], antes)
+
+
+class CamposRastreadosTests(TestCase):
+    """CamposRastreadosMixin sobre Reserva (rastrea estado, espacio_id y fecha)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        cls.dia = timezone.localdate() + timedelta(days=7)
+        cls.reserva_id = Reserva.objects.create(
+            solicitante=cls.usuario, espacio=cls.espacio, fecha=cls.dia,
+            hora_inicio=time(9), hora_fin=time(10), motivo="x",
+        ).pk
+
+    def test_foto_al_cargar_desde_la_bd(self):
+        reserva = Reserva.objects.get(pk=self.reserva_id)
+        self.assertTrue(reserva.tiene_original("estado"))
+        self.assertFalse(reserva.tiene_original("motivo"))  # no rastreado
+
+        reserva.estado = "APROBADA"
+        self.assertTrue(reserva.campo_cambio("estado"))
+        self.assertFalse(reserva.campo_cambio("fecha"))
+        self.assertEqual(reserva.campos_cambiados(), {"estado": ("PENDIENTE", "APROBADA")})
+
+    def test_save_actualiza_la_foto(self):
+        reserva = Reserva.objects.get(pk=self.reserva_id)
+        reserva.estado = "APROBADA"
+        reserva.save()
+        self.assertEqual(reserva.valor_original("estado"), "APROBADA")
+        self.assertEqual(reserva.campos_cambiados(), {})
+
+    def test_save_con_update_fields_solo_actualiza_esos_campos(self):
+        reserva = Reserva.objects.get(pk=self.reserva_id)
+        reserva.estado = "APROBADA"
+        reserva.fecha = self.dia + timedelta(days=1)
+        reserva.save(update_fields=["estado"])
+
+        self.assertFalse(reserva.campo_cambio("estado"))
+        # La fecha no se guardó: sigue figurando como cambiada respecto de la BD
+        self.assertEqual(reserva.campos_cambiados(), {"fecha": (self.dia, self.dia + timedelta(days=1))})
+
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.campos_cambiados(), {})
+
+    def test_refresh_from_db_con_fields_solo_renueva_esos_campos(self):
+        reserva = Reserva.objects.get(pk=self.reserva_id)
+        Reserva.objects.filter(pk=self.reserva_id).update(estado="APROBADA")
+        reserva.fecha = self.dia + timedelta(days=1)
+
+        reserva.refresh_from_db(fields=["estado"])
+
+        self.assertEqual(reserva.valor_original("estado"), "APROBADA")
+        # La fecha no se recargó: su foto sigue siendo la de la BD y el cambio local se ve
+        self.assertEqual(reserva.valor_original("fecha"), self.dia)
+        self.assertEqual(reserva.campos_cambiados(), {"fecha": (self.dia, self.dia + timedelta(days=1))})
+
+    def test_campos_diferidos_no_tienen_original(self):
+        reserva = Reserva.objects.only("id", "estado").get(pk=self.reserva_id)
+        self.assertTrue(reserva.tiene_original("estado"))
+        self.assertFalse(reserva.tiene_original("fecha"))
+        self.assertFalse(reserva.campo_cambio("fecha"))
+
+        # Sin foto y sin id no hay nada rastreado (instancia armada a mano)
+        self.assertFalse(Reserva(estado="PENDIENTE").tiene_original("estado"))
+
+    def test_notificacion_de_cambio_de_estado_sin_consultar_el_anterior(self):
+        reserva = Reserva.objects.select_related("espacio", "solicitante").get(pk=self.reserva_id)
+        reserva.estado = "APROBADA"
+        with CaptureQueriesContext(connection) as consultas:
+            reserva.save()
+        # El estado anterior sale de la foto: antes del UPDATE solo va el aviso (pre_save),
+        # sin leer la reserva; lo que sigue son las tablas derivadas del post_save
+        sql = [q["sql"] for q in consultas.captured_queries]
+        self.assertTrue(sql[0].startswith('INSERT INTO "notificaciones_notificacion"'))
+        self.assertTrue(sql[1].startswith('UPDATE "reservas_reserva"'))
+        avisos = Notificacion.objects.filter(usuario=self.usuario)
+        self.assertEqual(avisos.count(), 1)
+        self.assertIn("APROBADA", avisos.get().mensaje)
+
+        # Guardar de nuevo sin cambiar el estado no vuelve a avisar
+        reserva.save()
+        self.assertEqual(avisos.count(), 1)
+
+        # Campo diferido: se consulta la BD y el aviso sale igual
+        diferida = Reserva.objects.only("id", "fecha").get(pk=self.reserva_id)
+        diferida.estado = "CANCELADA"
+        diferida.save(update_fields=["estado"])
+        self.assertEqual(avisos.count(), 2)
@@ -25,6 +25,7 @@ urlpatterns = [
     path('administracion/reservas/', views.gestion_reservas, name='gestion_reservas'),
     path('administracion/reservas/aprobar/<int:reserva_id>/', views.aprobar_reserva, name='aprobar_reserva'),
     path('administracion/reservas/cancelar/<int:reserva_id>/', views.cancelar_forzosamente, name='cancelar_forzosamente'),
+    path('administracion/reservas/lote/', views.gestion_reservas_lote, name='gestion_reservas_lote'),
     path('administracion/reservas/exportar/', views.export_reservas_csv, name='export_reservas_csv'),
     path('administracion/reservas/exportar/excel/', views.export_reservas_excel, name='export_reservas_excel'),
 
@@ -1,6 +1,4 @@
 from functools import wraps
-from datetime import timedelta
-import csv
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from django.conf import settings 
@@ -10,7 +8,7 @@ from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
-from django.db.models import Q, Count, Sum
+from django.db.models import Q
 from django.utils import timezone
 from django.http import HttpResponse, JsonResponse
 from django.db import IntegrityError, transaction
@@ -18,9 +16,16 @@ from django.utils.safestring import mark_safe
 from django.urls import reverse
 
 # --- MODELOS ---
-from reservas.models import Reserva, RecursoReserva
+from reservas.models import Reserva
+from reservas.availability import conflictos_espacio
+from reservas.calendario import respuesta_calendario
+from reservas.stock import stock_snapshot, stock_por_id
+from reservas.derivados import recalcular_dias
+from reservas.aprobacion import aprobar_lote, rechazar_lote
 from inventario.models import Espacio, Recurso
 from .models import Area, Carrera
+from . import cache_dashboard
+from .exportar import COLUMNAS_CSV, filas_csv, filtros_desde_request, reservas_filtradas, respuesta_csv
 
 # --- FORMULARIOS ---
 from .forms import (
@@ -83,66 +88,26 @@ def home(request):
     hoy = timezone.localdate()
 
     if request.user.rol == 'SOLICITANTE':
-        reservas_hoy = Reserva.objects.filter(solicitante=request.user, fecha=hoy).count()
-        pendientes = Reserva.objects.filter(solicitante=request.user, estado='PENDIENTE').count()
-        aprobadas = Reserva.objects.filter(solicitante=request.user, estado='APROBADA').count()
-        rechazadas = Reserva.objects.filter(solicitante=request.user, estado='RECHAZADA').count()
-
-        ultimas_reservas = Reserva.objects.filter(solicitante=request.user).order_by('-fecha_solicitud')[:5]
-
-        # Gráfico 1: actividad últimos 7 días
-        today = timezone.now().date()
-        fechas_grafico, datos_grafico = [], []
-        for i in range(6, -1, -1):
-            fecha = today - timedelta(days=i)
-            count = Reserva.objects.filter(solicitante=request.user, fecha=fecha).count()
-            fechas_grafico.append(fecha.strftime("%d/%m"))
-            datos_grafico.append(count)
-
-        # Gráfico 2: top recursos del usuario
-        top_recursos_qs = (
-            RecursoReserva.objects.filter(reserva__solicitante=request.user)
-            .values('recurso__nombre')
-            .annotate(total_pedidos=Sum('cantidad'))
-            .order_by('-total_pedidos')[:5]
-        )
-
-        recursos_labels = [item['recurso__nombre'] for item in top_recursos_qs]
-        recursos_data = [item['total_pedidos'] for item in top_recursos_qs]
-
-        # Gráfico 3: estados del usuario
-        estados_labels = dates_to_json_list(["Pendiente", "Aprobada", "Rechazada"])
-        estados_data = [pendientes, aprobadas, rechazadas]
-
+        # KPIs propios desde caché (se invalida con cada cambio en sus reservas)
+        context = dict(cache_dashboard.home(request.user.pk, hoy))
     else:
         # Cualquier otro rol: dashboard informativo vacío
-        reservas_hoy = pendientes = aprobadas = rechazadas = 0
-        ultimas_reservas = []
-        fechas_grafico = [timezone.now().strftime("%d/%m")]
-        datos_grafico = [0]
-        recursos_labels = []
-        recursos_data = []
-        estados_labels = dates_to_json_list(["Pendiente", "Aprobada", "Rechazada"])
-        estados_data = [0, 0, 0]
-
-    context = {
-        'kpi_reservas_hoy': reservas_hoy,
-        'kpi_pendientes': pendientes,
-        'kpi_aprobadas': aprobadas,
-        'kpi_rechazadas': rechazadas,
-        'ultimas_reservas': ultimas_reservas,
-        'kpi_espacios_disponibles': Espacio.objects.filter(activo=True).count(),
-        'kpi_recursos': Recurso.objects.count(),
-
-        'chart_labels': dates_to_json_list(fechas_grafico),
-        'chart_data': datos_grafico,
-        'recursos_labels': dates_to_json_list(recursos_labels),
-        'recursos_data': recursos_data,
-        'estados_labels': estados_labels,
-        'estados_data': estados_data,
-
-        'ultima_sync': timezone.now()
-    }
+        context = {
+            'kpi_reservas_hoy': 0,
+            'kpi_pendientes': 0,
+            'kpi_aprobadas': 0,
+            'kpi_rechazadas': 0,
+            'ultimas_reservas': [],
+            'chart_labels': [hoy.strftime("%d/%m")],
+            'chart_data': [0],
+            'recursos_labels': [],
+            'recursos_data': [],
+            'estados_data': [0, 0, 0],
+        }
+
+    context.update(cache_dashboard.inventario())
+    context['estados_labels'] = dates_to_json_list(["Pendiente", "Aprobada", "Rechazada"])
+    context['ultima_sync'] = timezone.now()
     return render(request, 'core/home.html', context)
 
 
@@ -152,136 +117,8 @@ def home(request):
 
 @admin_required
 def admin_dashboard(request):
-    # KPIs base
-    pending_count = Reserva.objects.filter(estado='PENDIENTE').count()
-    approved_count = Reserva.objects.filter(estado='APROBADA').count()
-    rejected_count = Reserva.objects.filter(estado='RECHAZADA').count()
-    total_spaces = Espacio.objects.filter(activo=True).count()
-
-    # Recursos críticos
-    critical_resources = Recurso.objects.filter(stock__lte=5).count()
-
-    # Gráfico 1: actividad últimos 7 días
-    today = timezone.now().date()
-    fechas_grafico, datos_grafico = [], []
-    for i in range(6, -1, -1):
-        fecha = today - timedelta(days=i)
-        count = Reserva.objects.filter(fecha=fecha).count()
-        fechas_grafico.append(fecha.strftime("%d/%m"))
-        datos_grafico.append(count)
-
-    # Gráfico 2: top recursos más solicitados (por cantidad)
-    top_recursos_qs = (
-        RecursoReserva.objects
-        .values('recurso__nombre')
-        .annotate(total_pedidos=Sum('cantidad'))
-        .order_by('-total_pedidos')[:5]
-    )
-    recursos_labels = [item['recurso__nombre'] for item in top_recursos_qs]
-    recursos_data = [item['total_pedidos'] for item in top_recursos_qs]
-
-    # Gráfico 3: reservas por Área (considera carrera.area y el area directo legacy)
-    areas_qs = (
-        Reserva.objects
-        .values('solicitante__carrera__area__nombre')
-        .exclude(solicitante__carrera__isnull=True)
-        .exclude(solicitante__carrera__area__isnull=True)
-        .annotate(total=Count('id'))
-        .order_by('-total')
-    )
-
-    areas_legacy_qs = (
-        Reserva.objects
-        .values('solicitante__area__nombre')
-        .filter(solicitante__carrera__isnull=True)
-        .exclude(solicitante__area__isnull=True)
-        .annotate(total=Count('id'))
-        .order_by('-total')
-    )
-
-    areas_map = {}
-    for item in areas_qs:
-        key = item['solicitante__carrera__area__nombre']
-        areas_map[key] = areas_map.get(key, 0) + (item['total'] or 0)
-
-    for item in areas_legacy_qs:
-        key = item['solicitante__area__nombre']
-        areas_map[key] = areas_map.get(key, 0) + (item['total'] or 0)
-
-    areas_sorted = sorted(areas_map.items(), key=lambda x: x[1], reverse=True)
-    areas_labels = [k for k, _ in areas_sorted]
-    areas_data = [v for _, v in areas_sorted]
-
-    # KPI: carrera con más reservas
-    carrera_mas_reservas = (
-        Reserva.objects
-        .values('solicitante__carrera__nombre')
-        .exclude(solicitante__carrera__isnull=True)
-        .annotate(total=Count('id'))
-        .order_by('-total')
-        .first()
-    )
-    carrera_mas_reservas_nombre = (carrera_mas_reservas or {}).get('solicitante__carrera__nombre') or "N/A"
-    carrera_mas_reservas_total = (carrera_mas_reservas or {}).get('total') or 0
-
-    # KPI: carrera con más consumo de recursos
-    carrera_mas_stock = (
-        RecursoReserva.objects
-        .values('reserva__solicitante__carrera__nombre')
-        .exclude(reserva__solicitante__carrera__isnull=True)
-        .annotate(total=Sum('cantidad'))
-        .order_by('-total')
-        .first()
-    )
-    carrera_mas_stock_nombre = (carrera_mas_stock or {}).get('reserva__solicitante__carrera__nombre') or "N/A"
-    carrera_mas_stock_total = int((carrera_mas_stock or {}).get('total') or 0)
-
-    # KPI: fecha con más reservas
-    fecha_mas_reservas = (
-        Reserva.objects
-        .values('fecha')
-        .annotate(total=Count('id'))
-        .order_by('-total')
-        .first()
-    )
-    fecha_mas_reservas_valor = (fecha_mas_reservas or {}).get('fecha')
-    fecha_mas_reservas_total = (fecha_mas_reservas or {}).get('total') or 0
-
-    # KPI: fecha con más consumo de recursos
-    fecha_mas_stock = (
-        RecursoReserva.objects
-        .values('reserva__fecha')
-        .annotate(total=Sum('cantidad'))
-        .order_by('-total')
-        .first()
-    )
-    fecha_mas_stock_valor = (fecha_mas_stock or {}).get('reserva__fecha')
-    fecha_mas_stock_total = int((fecha_mas_stock or {}).get('total') or 0)
-
-    context = {
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'rejected_count': rejected_count,
-        'total_spaces': total_spaces,
-        'critical_resources': critical_resources,
-
-        'chart_labels': dates_to_json_list(fechas_grafico),
-        'chart_data': datos_grafico,
-        'recursos_labels': dates_to_json_list(recursos_labels),
-        'recursos_data': recursos_data,
-        'areas_labels': dates_to_json_list(areas_labels),
-        'areas_data': areas_data,
-
-        # Nuevos KPIs
-        'kpi_carrera_mas_reservas_nombre': carrera_mas_reservas_nombre,
-        'kpi_carrera_mas_reservas_total': carrera_mas_reservas_total,
-        'kpi_carrera_mas_stock_nombre': carrera_mas_stock_nombre,
-        'kpi_carrera_mas_stock_total': carrera_mas_stock_total,
-        'kpi_fecha_mas_reservas': fecha_mas_reservas_valor,
-        'kpi_fecha_mas_reservas_total': fecha_mas_reservas_total,
-        'kpi_fecha_mas_stock': fecha_mas_stock_valor,
-        'kpi_fecha_mas_stock_total': fecha_mas_stock_total,
-    }
+    # Todos los KPIs salen de consultas agregadas (ver core/kpis.py), desde caché
+    context = cache_dashboard.admin(timezone.localdate())
     return render(request, 'administracion/dashboard.html', context)
 
 
@@ -371,37 +208,13 @@ def export_reservas_excel(request):
 
 @admin_required
 def export_reservas_csv(request):
-    qs = (
-        Reserva.objects
-        .select_related(
-            "solicitante",
-            "solicitante__carrera",
-            "solicitante__carrera__area",
-            "solicitante__area",
-            "espacio",
-        )
-        .order_by('-fecha')
-    )
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="reservas_export.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['id', 'solicitante', 'rut', 'area', 'carrera', 'espacio', 'fecha', 'hora', 'estado'])
-
-    for r in qs:
-        carrera_nombre = r.solicitante.carrera.nombre if getattr(r.solicitante, "carrera", None) else "Sin Carrera"
-        writer.writerow([
-            r.id,
-            r.solicitante.email,
-            r.solicitante.rut or "",
-            r.solicitante.nombre_area,
-            carrera_nombre,
-            r.espacio.nombre,
-            r.fecha,
-            r.hora_inicio,
-            r.estado
-        ])
-    return response
+    """
+    CSV en streaming (memoria acotada aunque sean varios años).
+    Filtros opcionales: ?desde=&hasta=&estado=&area=
+    """
+    filtros = filtros_desde_request(request.GET)
+    filas = filas_csv(reservas_filtradas(filtros))
+    return respuesta_csv(COLUMNAS_CSV, filas, "reservas_export.csv")
 
 
 # ==============================================================================
@@ -467,22 +280,20 @@ def aprobar_reserva(request, reserva_id):
 
         if action == 'APROBAR':
             # Conflictos con otras ya aprobadas (espacio ocupado)
-            conflictos_existentes = Reserva.objects.filter(
-                espacio=reserva.espacio, fecha=reserva.fecha, estado='APROBADA'
-            ).filter(
-                Q(hora_inicio__lt=reserva.hora_fin) & Q(hora_fin__gt=reserva.hora_inicio)
-            ).exclude(id=reserva.id)
+            conflictos_existentes = conflictos_espacio(
+                reserva.espacio_id, reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                estados=['APROBADA'], excluir_id=reserva.id,
+            )
 
             if conflictos_existentes.exists():
                 messages.error(request, "Error: El espacio ya está ocupado por otra reserva aprobada.")
                 return redirect('gestion_reservas')
 
             # Conflicto con pendientes (competencia)
-            competencia = Reserva.objects.filter(
-                espacio=reserva.espacio, fecha=reserva.fecha, estado='PENDIENTE'
-            ).filter(
-                Q(hora_inicio__lt=reserva.hora_fin) & Q(hora_fin__gt=reserva.hora_inicio)
-            ).exclude(id=reserva.id)
+            competencia = conflictos_espacio(
+                reserva.espacio_id, reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                estados=['PENDIENTE'], excluir_id=reserva.id,
+            )
 
             # Si hay competencia y aún no confirmaron => aviso con botón
             if competencia.exists() and confirmado != 'si':
@@ -518,16 +329,16 @@ def aprobar_reserva(request, reserva_id):
             # Aprobar + validar stock por rango horario
             try:
                 with transaction.atomic():
-                    for rr in reserva.recursos_asociados.all():
-                        ocupados = RecursoReserva.objects.filter(
-                            recurso=rr.recurso,
-                            reserva__estado='APROBADA',
-                            reserva__fecha=reserva.fecha
-                        ).filter(
-                            Q(reserva__hora_inicio__lt=reserva.hora_fin) & Q(reserva__hora_fin__gt=reserva.hora_inicio)
-                        ).aggregate(total=Sum('cantidad'))['total'] or 0
-
-                        if (rr.recurso.stock - ocupados) < rr.cantidad:
+                    # Pico de uso simultáneo de los recursos de esta reserva (una sola pasada)
+                    pedidos = list(reserva.recursos_asociados.select_related('recurso'))
+                    stock = stock_por_id(
+                        reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                        recurso_ids=[rr.recurso_id for rr in pedidos],
+                        estados=['APROBADA'],
+                    )
+
+                    for rr in pedidos:
+                        if stock[rr.recurso_id]['disponible'] < rr.cantidad:
                             raise ValidationError(f"Stock insuficiente para {rr.recurso.nombre} en el horario solicitado.")
 
                     reserva.estado = 'APROBADA'
@@ -535,7 +346,8 @@ def aprobar_reserva(request, reserva_id):
 
                     if competencia.exists():
                         motivo_rechazo = f"Sistema: Se aprobó una solicitud prioritaria (ID #{reserva.id})."
-                        competencia.update(estado='RECHAZADA', motivo_cancelacion=motivo_rechazo)
+                        competencia.update(estado='RECHAZADA', motivo_cancelacion=motivo_rechazo, actualizado=timezone.now())
+                        recalcular_dias([(reserva.espacio_id, reserva.fecha)])  # update() no dispara signals
                         messages.success(request, f'Reserva #{reserva.id} APROBADA. Conflictos rechazados.')
                     else:
                         messages.success(request, f'Reserva #{reserva.id} APROBADA exitosamente.')
@@ -551,6 +363,72 @@ def aprobar_reserva(request, reserva_id):
     return redirect('gestion_reservas')
 
 
+@admin_required
+def gestion_reservas_lote(request):
+    """Aprobar / rechazar muchas solicitudes pendientes en una sola operación."""
+    if request.method != 'POST':
+        return redirect('gestion_reservas')
+
+    ids = [int(x) for x in request.POST.getlist('reserva_ids') if str(x).isdigit()]
+    action = request.POST.get('action')
+
+    if not ids:
+        messages.error(request, "Selecciona al menos una solicitud.")
+        return redirect('gestion_reservas')
+
+    if action == 'APROBAR':
+        resultado = aprobar_lote(ids, confirmado=request.POST.get('confirmado') == 'si')
+        if resultado['aprobadas']:
+            messages.success(
+                request,
+                f"{len(resultado['aprobadas'])} reservas APROBADAS. "
+                f"{len(resultado['rechazadas'])} solicitudes en conflicto rechazadas."
+            )
+        for reserva, motivo in resultado['omitidas']:
+            messages.error(request, f"Reserva #{reserva.id} no se aprobó: {motivo}.")
+        if resultado['no_pendientes']:
+            ids_omitidos = ", ".join(f"#{i}" for i in resultado['no_pendientes'])
+            messages.info(request, f"Se omitieron {ids_omitidos}: ya no están pendientes.")
+
+        # Igual que la aprobación individual: rechazar a la competencia requiere confirmar
+        if resultado['por_confirmar']:
+            detalle = "<br>".join(
+                f"#{reserva.id} choca con " + ", ".join(f"#{i}" for i in competidoras)
+                for reserva, competidoras in resultado['por_confirmar']
+            )
+            inputs = "".join(
+                f'<input type="hidden" name="reserva_ids" value="{reserva.id}">'
+                for reserva, _competidoras in resultado['por_confirmar']
+            )
+            csrf_token = request.POST.get('csrfmiddlewaretoken')
+            msg_html = f"""
+                <div class="d-flex align-items-center justify-content-between flex-wrap gap-2">
+                    <div>
+                        <i class="bi bi-exclamation-triangle-fill fs-4 me-2"></i>
+                        <strong>¡Conflicto Detectado!</strong><br>
+                        {len(resultado['por_confirmar'])} solicitudes chocan con otras pendientes:<br>{detalle}
+                        <br><small>Al aprobarlas, las demás serán rechazadas automáticamente.</small>
+                    </div>
+                    <form method="post" action="{reverse('gestion_reservas_lote')}">
+                        <input type="hidden" name="csrfmiddlewaretoken" value="{csrf_token}">
+                        <input type="hidden" name="action" value="APROBAR">
+                        <input type="hidden" name="confirmado" value="si">
+                        {inputs}
+                        <button type="submit" class="btn btn-warning btn-sm text-dark fw-bold border-dark shadow-sm">
+                            <i class="bi bi-check-circle-fill me-1"></i> Confirmar y Aprobar
+                        </button>
+                    </form>
+                </div>
+            """
+            messages.warning(request, mark_safe(msg_html))
+
+    elif action == 'RECHAZAR':
+        rechazadas = rechazar_lote(ids, motivo=request.POST.get('motivo_cancelacion') or None)
+        messages.warning(request, f"{len(rechazadas)} reservas RECHAZADAS.")
+
+    return redirect('gestion_reservas')
+
+
 @admin_required
 def cancelar_forzosamente(request, reserva_id):
     reserva = get_object_or_404(Reserva, pk=reserva_id)
@@ -890,6 +768,7 @@ def api_stock_actual(request):
     """
     Retorna JSON con stock disponible, considerando reservas PENDIENTE/APROBADA en el rango horario.
     Este endpoint NO se rompe si Recurso no tiene campo area.
+    Acepta ?ids=1,2,3 para consultar solo algunos recursos.
     """
     fecha_str = request.GET.get('fecha')
     hora_inicio_str = request.GET.get('hora_inicio')
@@ -901,6 +780,12 @@ def api_stock_actual(request):
         except Exception:
             return False
 
+    # ?ids=1,2,3 => solo esos recursos (ej: los del carrito)
+    recurso_ids = None
+    ids_str = request.GET.get('ids')
+    if ids_str:
+        recurso_ids = [int(x) for x in ids_str.split(',') if x.strip().isdigit()]
+
     recursos = Recurso.objects.all()
 
     if (
@@ -911,37 +796,17 @@ def api_stock_actual(request):
     ):
         recursos = Recurso.objects.filter(area=request.user.area)
 
-    data = []
-
-    for r in recursos.order_by("nombre"):
-        ocupados = 0
-
-        if fecha_str and hora_inicio_str and hora_fin_str:
-            reservas_conflicto = Reserva.objects.filter(
-                fecha=fecha_str,
-                estado__in=['PENDIENTE', 'APROBADA']
-            ).filter(
-                Q(hora_inicio__lt=hora_fin_str) & Q(hora_fin__gt=hora_inicio_str)
-            )
+    # Dos consultas en total (recursos + eventos del bloque), sin importar cuántos recursos haya (antes 2N+1)
+    snapshot = stock_snapshot(
+        fecha_str, hora_inicio_str, hora_fin_str,
+        recurso_ids=recurso_ids,
+        recursos=recursos,
+    )
 
-            if reservas_conflicto.exists():
-                ocupados = (
-                    RecursoReserva.objects
-                    .filter(reserva__in=reservas_conflicto, recurso=r)
-                    .aggregate(total=Sum('cantidad'))['total']
-                    or 0
-                )
-
-        stock_total = int(r.stock or 0)
-        ocupado_total = int(ocupados or 0)
-        disponible = stock_total - ocupado_total
-
-        data.append({
-            'id': r.id,
-            'nombre': r.nombre,
-            'total': stock_total,
-            'disponible': max(disponible, 0)
-        })
+    data = [
+        {'id': x['id'], 'nombre': x['nombre'], 'total': x['total'], 'disponible': x['disponible']}
+        for x in snapshot
+    ]
 
     return JsonResponse({'recursos': data})
 
@@ -949,18 +814,7 @@ def api_stock_actual(request):
 @login_required
 def api_reservas_calendario(request):
     """
-    Retorna eventos para FullCalendar (solo reservas aprobadas)
+    Retorna eventos para FullCalendar (solo reservas aprobadas) de la ventana
+    start/end pedida, con ETag/Last-Modified (ver reservas.calendario).
     """
-    reservas = Reserva.objects.filter(estado='APROBADA')
-    eventos = []
-
-    for r in reservas:
-        eventos.append({
-            'title': f"Ocupado: {r.espacio.nombre}",
-            'start': f"{r.fecha}T{r.hora_inicio}",
-            'end': f"{r.fecha}T{r.hora_fin}",
-            'color': '#D71920',
-            'allDay': False,
-        })
-
-    return JsonResponse(eventos, safe=False)
+    return respuesta_calendario(request)
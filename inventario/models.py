@@ -1,7 +1,11 @@
 from django.db import models
 from django.db.models import Sum
 
-class Espacio(models.Model):
+from core.mixins import CamposRastreadosMixin
+
+class Espacio(CamposRastreadosMixin, models.Model):
+    campos_rastreados = ('activo',)
+
     nombre = models.CharField(max_length=100)
     ubicacion = models.CharField(max_length=200)
     capacidad = models.PositiveIntegerField()
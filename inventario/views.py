@@ -3,7 +3,9 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import ProtectedError
 from django.utils import timezone
+from django.urls import reverse
 from core.views import admin_required  # Importamos el decorador de seguridad
+from reservas.ics import token_espacio
 from .models import Espacio, Recurso
 
 # ==============================================================================
@@ -32,7 +34,12 @@ def gestion_espacios(request):
             messages.error(request, f"Error al crear espacio: {e}")
 
     # 2. Lógica para LISTAR espacios
-    espacios = Espacio.objects.all().order_by('nombre')
+    espacios = list(Espacio.objects.all().order_by('nombre'))
+    # Enlace de suscripción (ICS) al calendario de cada espacio
+    for espacio in espacios:
+        espacio.ics_url = request.build_absolute_uri(
+            reverse('reservas:ics_espacio', args=[token_espacio(espacio.pk)])
+        )
     return render(request, "inventario/espacios.html", {"espacios": espacios})
 
 @admin_required
@@ -64,6 +71,7 @@ def eliminar_espacio(request, espacio_id):
     """
     # IMPORTACIÓN AQUÍ DENTRO para evitar error circular con core/reservas
     from reservas.models import Reserva 
+    from reservas.derivados import recalcular_dias
     
     espacio = get_object_or_404(Espacio, pk=espacio_id)
     
@@ -82,10 +90,14 @@ def eliminar_espacio(request, espacio_id):
         # 2. Cancelar masivamente
         motivo = f"Cancelación automática: El espacio '{espacio.nombre}' ha sido eliminado/clausurado del inventario."
         
+        dias_afectados = set(reservas_afectadas.values_list('espacio_id', 'fecha').order_by().distinct())
         reservas_afectadas.update(
             estado='CANCELADA', 
-            motivo_cancelacion=motivo
+            motivo_cancelacion=motivo,
+            actualizado=timezone.now(),
         )
+        # update() no dispara signals: actualizamos las tablas derivadas a mano
+        recalcular_dias(dias_afectados)
         msg_detalle = f" Se cancelaron {cantidad_afectados} reservas futuras automáticamente."
     else:
         msg_detalle = " No habían reservas futuras afectadas."
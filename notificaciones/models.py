@@ -20,6 +20,12 @@ class Notificacion(models.Model):
 
     class Meta:
         ordering = ["-creada_en"]
+        indexes = [
+            # Contador de no leídas (se consulta en cada página)
+            models.Index(fields=["usuario", "leida"], name="notif_usuario_leida_idx"),
+            # Listado del usuario ordenado por fecha
+            models.Index(fields=["usuario", "-creada_en"], name="notif_usuario_creada_idx"),
+        ]
 
     def __str__(self):
         return f"{self.usuario} - {self.titulo}"
@@ -32,6 +32,47 @@ def _reserva_detalle_url(reserva):
         return ""
 
 
+def _valor_anterior(instance, campo):
+    """
+    Valor del campo antes del save. Sale de la foto tomada al cargar la instancia
+    (CamposRastreadosMixin); solo si no existe (instancia armada a mano o campo
+    diferido) se consulta la base de datos.
+    """
+    if instance.tiene_original(campo):
+        return instance.valor_original(campo)
+    return type(instance)._default_manager.filter(pk=instance.pk).values_list(campo, flat=True).first()
+
+
+def mensaje_cambio_estado(reserva):
+    """(titulo, mensaje, level) del aviso al solicitante según el nuevo estado de la reserva."""
+    titulo = "Actualización de tu reserva"
+
+    # Mensajes en español
+    if reserva.estado == "APROBADA":
+        mensaje = f"Tu reserva para {reserva.espacio} el {reserva.fecha} fue APROBADA."
+        level = "SUCCESS"
+    elif reserva.estado == "RECHAZADA":
+        extra = ""
+        # si existe motivo_cancelacion o similar, lo agregamos
+        if getattr(reserva, "motivo_cancelacion", None):
+            extra = f" Motivo: {reserva.motivo_cancelacion}"
+        mensaje = f"Tu reserva para {reserva.espacio} el {reserva.fecha} fue RECHAZADA.{extra}"
+        level = "DANGER"
+    elif reserva.estado == "CANCELADA":
+        extra = ""
+        if getattr(reserva, "motivo_cancelacion", None):
+            extra = f" Motivo: {reserva.motivo_cancelacion}"
+        mensaje = f"Tu reserva para {reserva.espacio} el {reserva.fecha} fue CANCELADA.{extra}"
+        level = "WARNING"
+    else:
+        mensaje = (
+            f"Tu reserva para {reserva.espacio} el {reserva.fecha} cambió a: {reserva.estado}."
+        )
+        level = "INFO"
+
+    return titulo, mensaje, level
+
+
 # =============================================================================
 # 1) NOTIFICAR A ADMINS CUANDO SE CREA UNA RESERVA (NUEVA SOLICITUD)
 # =============================================================================
@@ -62,38 +103,11 @@ def notif_usuario_cambio_estado(sender, instance, **kwargs):
     if not instance.pk:
         return
 
-    Reserva = apps.get_model("reservas", "Reserva")
-    old = Reserva.objects.filter(pk=instance.pk).only("estado", "motivo_cancelacion").first()
-    if not old:
+    estado_anterior = _valor_anterior(instance, "estado")
+    if estado_anterior is None or estado_anterior == instance.estado:
         return
 
-    if old.estado == instance.estado:
-        return
-
-    titulo = "Actualización de tu reserva"
-
-    # Mensajes en español
-    if instance.estado == "APROBADA":
-        mensaje = f"Tu reserva para {instance.espacio} el {instance.fecha} fue APROBADA."
-        level = "SUCCESS"
-    elif instance.estado == "RECHAZADA":
-        extra = ""
-        # si existe motivo_cancelacion o similar, lo agregamos
-        if getattr(instance, "motivo_cancelacion", None):
-            extra = f" Motivo: {instance.motivo_cancelacion}"
-        mensaje = f"Tu reserva para {instance.espacio} el {instance.fecha} fue RECHAZADA.{extra}"
-        level = "DANGER"
-    elif instance.estado == "CANCELADA":
-        extra = ""
-        if getattr(instance, "motivo_cancelacion", None):
-            extra = f" Motivo: {instance.motivo_cancelacion}"
-        mensaje = f"Tu reserva para {instance.espacio} el {instance.fecha} fue CANCELADA.{extra}"
-        level = "WARNING"
-    else:
-        mensaje = (
-            f"Tu reserva para {instance.espacio} el {instance.fecha} cambió a: {instance.estado}."
-        )
-        level = "INFO"
+    titulo, mensaje, level = mensaje_cambio_estado(instance)
 
     # ✅ Para el usuario conviene ir al detalle de su reserva
     url = _reserva_detalle_url(instance)
@@ -111,13 +125,8 @@ def notif_espacio_desactivado(sender, instance, **kwargs):
     if not instance.pk:
         return
 
-    Espacio = apps.get_model("inventario", "Espacio")
-    old = Espacio.objects.filter(pk=instance.pk).only("activo", "nombre").first()
-    if not old:
-        return
-
     # Si se desactiva (True -> False)
-    if old.activo and (instance.activo is False):
+    if _valor_anterior(instance, "activo") and (instance.activo is False):
         Reserva = apps.get_model("reservas", "Reserva")
 
         hoy = timezone.localdate()
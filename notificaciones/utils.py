@@ -18,3 +18,12 @@ def notificar_muchos(qs_usuarios, titulo, mensaje, level="INFO", url=""):
         for u in qs_usuarios
     ]
     Notificacion.objects.bulk_create(objs)
+
+
+def notificar_lote(filas):
+    # filas: iterable de (usuario_id, titulo, mensaje, level, url), un mensaje distinto por usuario
+    objs = [
+        Notificacion(usuario_id=usuario_id, titulo=titulo, mensaje=mensaje, level=level, url=url or "")
+        for usuario_id, titulo, mensaje, level, url in filas
+    ]
+    Notificacion.objects.bulk_create(objs)
@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import TrabajoReporte, VersionDatos
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'reporte', 'parametros', 'estado', 'version_datos', 'solicitado_por', 'creado', 'terminado')
+    list_filter = ('estado', 'reporte')
+    readonly_fields = ('clave', 'version_datos', 'iniciado', 'terminado', 'error')
+
+
+@admin.register(VersionDatos)
+class VersionDatosAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'valor')
+    readonly_fields = ('nombre', 'valor')
@@ -0,0 +1,106 @@
+"""
+Caché en disco de los Excel de reportes, versionada por datos.
+
+Clave: (reporte, parámetros, alcance, versión de datos)
+- VERSION_FORMATO: se sube a mano cuando cambia el código de un reporte.
+- alcance: "admin" para el pack admin, "u<id>" para los reportes personales.
+- versión: reportes.versionado.version_actual(); cualquier cambio la sube.
+
+Estructura: REPORTES_DIR/cache/v<version>/<hash>/<nombre>.xlsx
+La versión va en la ruta, así un archivo viejo nunca se sirve: al subir la
+versión simplemente deja de encontrarse. Al generar un archivo se borran las
+carpetas v<n> anteriores salvo la inmediatamente anterior, donde otro proceso
+puede estar terminando de escribir; si aun así le borran la carpeta a mitad de
+camino, archivo_reporte() lo reconstruye con la versión vigente.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .excel import XLSX_CONTENT_TYPE, respuesta_archivo
+from .versionado import version_actual
+
+# Subir cuando cambie el contenido/formato de algún reporte: invalida lo ya guardado
+VERSION_FORMATO = 1
+
+
+def _raiz() -> Path:
+    return Path(settings.REPORTES_DIR) / "cache"
+
+
+def _carpeta(reporte: str, parametros: dict, alcance: str, version: int) -> Path:
+    crudo = json.dumps([VERSION_FORMATO, reporte, parametros, alcance], sort_keys=True, default=str)
+    return _raiz() / f"v{version}" / hashlib.sha256(crudo.encode()).hexdigest()
+
+
+def _buscar(carpeta: Path):
+    try:
+        nombres = [n for n in os.listdir(carpeta) if not n.startswith(".")]
+    except FileNotFoundError:
+        return None
+    return carpeta / nombres[0] if nombres else None
+
+
+def _guardar(carpeta: Path, wb, nombre: str) -> Path:
+    """Escribe en un temporal de la misma carpeta y lo renombra (atómico)."""
+    carpeta.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=carpeta, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            wb.save(f)
+        destino = carpeta / nombre
+        os.replace(tmp, destino)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)  # pudo irse con la carpeta
+        raise
+    return destino
+
+
+def _borrar_versiones_anteriores(version: int) -> None:
+    """Borra v<n> con n < version - 1 (la anterior puede tener escrituras en curso)."""
+    try:
+        entradas = list(_raiz().iterdir())
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        nombre = entrada.name
+        if nombre.startswith("v") and nombre[1:].isdigit() and int(nombre[1:]) < version - 1:
+            shutil.rmtree(entrada, ignore_errors=True)
+
+
+def archivo_reporte(reporte: str, parametros: dict, alcance: str, construir) -> Path:
+    """
+    Ruta del Excel para estos parámetros con los datos vigentes.
+    `construir()` -> (wb, nombre) solo se llama si no está en caché
+    (wb: cualquier objeto con .save(archivo), ej. columnar.TablaParquet).
+    """
+    # La versión se lee ANTES de construir: si los datos cambian a mitad,
+    # el archivo queda guardado con la versión vieja y no se vuelve a servir.
+    version = version_actual()
+    carpeta = _carpeta(reporte, parametros, alcance, version)
+
+    ruta = _buscar(carpeta)
+    if ruta is not None:
+        return ruta
+
+    wb, nombre = construir()
+    try:
+        ruta = _guardar(carpeta, wb, nombre)
+    except FileNotFoundError:
+        # Otro proceso borró la carpeta de esta versión (ya vieja) mientras se escribía:
+        # se construye de nuevo con la vigente (el libro ya guardado no se puede reusar)
+        version = version_actual()
+        wb, nombre = construir()
+        ruta = _guardar(_carpeta(reporte, parametros, alcance, version), wb, nombre)
+    _borrar_versiones_anteriores(version)
+    return ruta
+
+
+def respuesta_reporte(reporte: str, parametros: dict, alcance: str, construir, content_type: str = XLSX_CONTENT_TYPE):
+    ruta = archivo_reporte(reporte, parametros, alcance, construir)
+    return respuesta_archivo(open(ruta, "rb"), ruta.name, content_type)
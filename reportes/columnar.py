@@ -0,0 +1,71 @@
+"""
+Exportación columnar (Parquet) de datasets de reportes, para análisis.
+
+- pyarrow es OPCIONAL: si no está instalado, PARQUET_DISPONIBLE es False y las
+  vistas avisan en vez de fallar (pip install pyarrow para habilitarlo).
+- Las filas (dicts) llegan de un QuerySet.iterator() y se escriben por grupos
+  de FILAS_POR_GRUPO: cada grupo es un row group del archivo, así la memoria
+  queda acotada aunque el dataset abarque varios años.
+- Las columnas van tipadas (fechas, horas, enteros...), no como texto: el
+  archivo se lee directo en pandas/polars/DuckDB/Power BI sin convertir.
+
+TablaParquet tiene el mismo .save(archivo) que un Workbook de openpyxl, por eso
+sirve tal cual con reportes.cache (archivo_reporte) y excel.guardar_en_temporal.
+"""
+from __future__ import annotations
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # dependencia opcional
+    pa = pq = None
+
+PARQUET_DISPONIBLE = pa is not None
+PARQUET_CONTENT_TYPE = "application/vnd.apache.parquet"
+
+# Filas por row group (cada grupo se arma en memoria antes de escribirse)
+FILAS_POR_GRUPO = 50_000
+
+
+def _tipos() -> dict:
+    return {
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+        "date": pa.date32(),
+        "time": pa.time64("us"),
+        # Los datetime de Django (USE_TZ) vienen aware en UTC
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+
+
+def esquema(columnas) -> "pa.Schema":
+    """[(nombre, tipo)] con tipo en _tipos() -> pa.Schema (todas las columnas aceptan nulos)."""
+    tipos = _tipos()
+    return pa.schema([pa.field(nombre, tipos[tipo]) for nombre, tipo in columnas])
+
+
+class TablaParquet:
+    """Dataset a escribir como Parquet. Las filas se consumen recién en save()."""
+
+    def __init__(self, columnas, filas):
+        if not PARQUET_DISPONIBLE:
+            raise RuntimeError("La exportación Parquet requiere pyarrow (pip install pyarrow).")
+        self.esquema = esquema(columnas)
+        self.filas = filas
+
+    def _grupos(self):
+        grupo = []
+        for fila in self.filas:
+            grupo.append(fila)
+            if len(grupo) >= FILAS_POR_GRUPO:
+                yield grupo
+                grupo = []
+        if grupo:
+            yield grupo
+
+    def save(self, archivo) -> None:
+        with pq.ParquetWriter(archivo, self.esquema, compression="zstd") as writer:
+            for grupo in self._grupos():
+                writer.write_table(pa.Table.from_pylist(grupo, schema=self.esquema))
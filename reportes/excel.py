@@ -0,0 +1,228 @@
+"""
+Escritura de reportes Excel en streaming (openpyxl write-only).
+
+- Las filas se escriben a medida que llegan (pueden venir de un generador /
+  QuerySet.iterator()): openpyxl las va volcando a disco, no quedan en memoria.
+- Los estilos son NamedStyle compartidos por todo el libro (no un objeto de
+  estilo por celda).
+- El ancho de columnas se calcula ANTES de escribir, con el encabezado y una
+  muestra de las primeras filas (en write-only no se puede volver atrás).
+- El archivo final se arma en un archivo temporal y se entrega con
+  FileResponse (StreamingHttpResponse) en bloques.
+"""
+from __future__ import annotations
+
+import tempfile
+import warnings
+from datetime import date, datetime, time as time_cls
+
+from django.http import FileResponse
+from django.utils import timezone
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+HEADER_FILL = PatternFill("solid", fgColor="D71920")  # Rojo INACAP
+HEADER_FONT = Font(color="FFFFFF", bold=True)
+THIN = Side(style="thin", color="CCCCCC")
+BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+
+# Filas de muestra para calcular el ancho de columnas
+FILAS_MUESTRA = 200
+ANCHO_MIN = 12
+ANCHO_MAX = 48
+
+# Fila del encabezado: 1 título, 2 subtítulo, 3 vacía
+FILA_ENCABEZADO = 4
+
+
+def _estilos():
+    celda = dict(border=BORDER, alignment=Alignment(vertical="top", wrap_text=True))
+    return [
+        NamedStyle(name="rep_titulo", font=Font(bold=True, size=14)),
+        NamedStyle(name="rep_subtitulo", font=Font(color="666666")),
+        NamedStyle(
+            name="rep_encabezado",
+            fill=HEADER_FILL,
+            font=HEADER_FONT,
+            border=BORDER,
+            alignment=Alignment(horizontal="center", vertical="center"),
+        ),
+        NamedStyle(name="rep_celda", **celda),
+        # Tipos: fechas/horas reales para ordenamiento correcto
+        NamedStyle(name="rep_fecha", number_format="yyyy-mm-dd", **celda),
+        NamedStyle(name="rep_fecha_hora", number_format="yyyy-mm-dd hh:mm", **celda),
+        NamedStyle(name="rep_hora", number_format="hh:mm", **celda),
+    ]
+
+
+def nuevo_libro() -> Workbook:
+    """Workbook write-only con los estilos de reporte ya registrados."""
+    wb = Workbook(write_only=True)
+    for estilo in _estilos():
+        wb.add_named_style(estilo)
+    return wb
+
+
+def _valor(val):
+    # Excel no acepta datetimes con zona horaria: se exportan en hora local
+    if isinstance(val, datetime) and timezone.is_aware(val):
+        return timezone.localtime(val).replace(tzinfo=None)
+    return val
+
+
+def _estilo_de(val) -> str:
+    if isinstance(val, datetime):
+        return "rep_fecha_hora"
+    if isinstance(val, date):
+        return "rep_fecha"
+    if isinstance(val, time_cls):
+        return "rep_hora"
+    return "rep_celda"
+
+
+def _anchos(columns, muestra, min_w: int = ANCHO_MIN, max_w: int = ANCHO_MAX) -> list[int]:
+    """Ancho por columna según encabezado + filas de muestra."""
+    largos = [len(str(c)) for c in columns]
+    for fila in muestra:
+        for i, val in enumerate(fila[:len(largos)]):
+            if val is not None:
+                largos[i] = max(largos[i], len(str(val)))
+    return [max(min_w, min(max_w, n + 2)) for n in largos]
+
+
+def _safe_table_name(ws_title: str, header_row: int) -> str:
+    """
+    Nombre de tabla Excel:
+    - Debe empezar con letra
+    - Solo letras/números/underscore
+    - Debe ser único por workbook
+    """
+    base = "".join(ch if ch.isalnum() else "_" for ch in ws_title)
+    base = base.strip("_") or "Sheet"
+    name = f"T_{base}_{header_row}"
+    if not name[0].isalpha():
+        name = "T_" + name
+    return name[:60]
+
+
+class TablaEnStreaming:
+    """
+    Hoja con tabla que se va llenando fila a fila (agregar) y se cierra al final.
+
+    Las primeras FILAS_MUESTRA filas quedan en memoria para calcular anchos;
+    después todo se escribe directo. Varias tablas del mismo libro se pueden
+    llenar intercaladas (p. ej. el pack de reportes, en una sola pasada).
+    """
+
+    def __init__(self, wb: Workbook, hoja: str, title: str, subtitle: str, columns: list[str]):
+        self.ws = wb.create_sheet(hoja)
+        self.hoja = hoja
+        self.title = title
+        self.subtitle = subtitle
+        self.columns = columns
+        self.muestra = []
+        self.abierta = False
+        self.n = 0
+
+    def _celda(self, val, estilo):
+        cell = WriteOnlyCell(self.ws, value=val)
+        cell.style = estilo
+        return cell
+
+    def _escribir(self, fila):
+        self.ws.append([self._celda(v, _estilo_de(v)) for v in map(_valor, fila)])
+        self.n += 1
+
+    def _abrir(self):
+        # En write-only los anchos deben fijarse antes de la primera fila
+        for i, ancho in enumerate(_anchos(self.columns, self.muestra), start=1):
+            self.ws.column_dimensions[get_column_letter(i)].width = ancho
+
+        # Congelar encabezado
+        self.ws.freeze_panes = f"A{FILA_ENCABEZADO + 1}"
+
+        self.ws.append([self._celda(self.title, "rep_titulo")])
+        self.ws.append([self._celda(self.subtitle, "rep_subtitulo")])
+        self.ws.append([])
+        self.ws.append([self._celda(c, "rep_encabezado") for c in self.columns])
+
+        for fila in self.muestra:
+            self._escribir(fila)
+        self.muestra = []
+        self.abierta = True
+
+    def agregar(self, fila) -> None:
+        if self.abierta:
+            self._escribir(fila)
+            return
+        self.muestra.append(fila)
+        if len(self.muestra) >= FILAS_MUESTRA:
+            self._abrir()
+
+    def cerrar(self) -> int:
+        """Escribe lo pendiente y agrega la Tabla Excel. Devuelve filas de datos escritas."""
+        if not self.abierta:
+            self._abrir()
+
+        # Tabla Excel con filtros (flechas) y estilo
+        last_col = get_column_letter(len(self.columns))
+        table = Table(
+            displayName=_safe_table_name(self.hoja, FILA_ENCABEZADO),
+            ref=f"A{FILA_ENCABEZADO}:{last_col}{FILA_ENCABEZADO + self.n}",
+        )
+        # En write-only openpyxl no lee el encabezado de la hoja: se declaran las columnas
+        table._initialise_columns()
+        for col, nombre in zip(table.tableColumns, self.columns):
+            col.name = str(nombre)
+        table.tableStyleInfo = TableStyleInfo(
+            name="TableStyleMedium9",
+            showFirstColumn=False,
+            showLastColumn=False,
+            showRowStripes=True,
+            showColumnStripes=False,
+        )
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="In write-only mode you must add table columns manually")
+            self.ws.add_table(table)
+        return self.n
+
+
+def escribir_tabla(wb: Workbook, hoja: str, title: str, subtitle: str, columns: list[str], rows) -> int:
+    """
+    Agrega la hoja `hoja` con:
+    - Título + subtítulo
+    - Encabezados estilo INACAP
+    - Tabla Excel (con flechas de filtro/ordenamiento)
+    - Freeze panes
+    - Bordes
+
+    `rows` puede ser cualquier iterable (lista, generador, iterator()).
+    Devuelve la cantidad de filas de datos escritas.
+    """
+    tabla = TablaEnStreaming(wb, hoja, title, subtitle, columns)
+    for fila in rows:
+        tabla.agregar(fila)
+    return tabla.cerrar()
+
+
+def guardar_en_temporal(wb: Workbook):
+    """Guarda el libro en un archivo temporal (se borra al cerrarlo) listo para leer."""
+    tmp = tempfile.TemporaryFile()
+    wb.save(tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def respuesta_excel(wb: Workbook, filename: str) -> FileResponse:
+    """Guarda el libro en un archivo temporal y lo entrega en streaming."""
+    return respuesta_archivo(guardar_en_temporal(wb), filename)
+
+
+def respuesta_archivo(archivo, filename: str, content_type: str = XLSX_CONTENT_TYPE) -> FileResponse:
+    return FileResponse(archivo, as_attachment=True, filename=filename, content_type=content_type)
@@ -0,0 +1,108 @@
+"""
+Armado de filas de reportes SOLO con datos ya cargados.
+
+Estas funciones no hacen consultas si el objeto viene de los querysets de
+este módulo (reservas_con_relaciones / usuario_con_relaciones):
+- las relaciones del solicitante (área, carrera, carrera.área) van en el
+  select_related y, si el FK es NULL, se mira el *_id sin tocar la relación;
+- los recursos se leen de la caché del prefetch con .all() (nunca .exists()
+  ni .count(), que van a la BD aunque haya prefetch).
+
+Los tests de reportes fijan un presupuesto de consultas por reporte
+(reportes.tests.PresupuestoConsultasTests): si una fila vuelve a consultar,
+el presupuesto falla.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+
+from reservas.estadisticas import minutos_reservados
+from reservas.models import RecursoReserva
+
+RELACIONES_SOLICITANTE = ("solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area")
+
+
+# -----------------------------
+# Querysets con todo precargado
+# -----------------------------
+
+def reservas_con_relaciones(qs):
+    """Reservas con espacio, solicitante (área/carrera) y recursos precargados (1 consulta extra por lote)."""
+    return (
+        qs.select_related("espacio", *RELACIONES_SOLICITANTE)
+        .prefetch_related(Prefetch("recursos_asociados", queryset=RecursoReserva.objects.select_related("recurso")))
+        .order_by("-fecha", "-hora_inicio")
+    )
+
+
+def usuario_con_relaciones(usuario):
+    """El usuario con área/carrera en la misma consulta (request.user viene sin ellas)."""
+    return get_user_model().objects.select_related("area", "carrera", "carrera__area").get(pk=usuario.pk)
+
+
+# -----------------------------
+# Solicitante
+# -----------------------------
+
+def area_nombre(user) -> str:
+    # carrera.area o area legacy o "Sin Área" (igual que _area_expr_reserva)
+    if user.carrera_id and user.carrera.area_id:
+        return user.carrera.area.nombre
+    if user.area_id:
+        return user.area.nombre
+    return "Sin Área"
+
+
+def carrera_nombre(user) -> str:
+    return user.carrera.nombre if user.carrera_id else "Sin Carrera"
+
+
+def solicitante_nombre(user) -> str:
+    return user.get_full_name() or user.email
+
+
+# -----------------------------
+# Recursos de una reserva
+# -----------------------------
+
+def recursos(reserva) -> list:
+    return list(reserva.recursos_asociados.all())
+
+
+def total_recursos(reserva) -> int:
+    return sum(int(x.cantidad or 0) for x in reserva.recursos_asociados.all())
+
+
+def recursos_texto(reserva) -> str:
+    return ", ".join(f"{x.cantidad}x {x.recurso.nombre}" for x in reserva.recursos_asociados.all())
+
+
+# -----------------------------
+# Fila completa de una reserva
+# -----------------------------
+
+def fila_reserva(r) -> dict:
+    """
+    Mismas claves que reportes.views._detalle_reservas() (calculado en la BD),
+    pero desde una Reserva de reservas_con_relaciones(), más motivo, fecha de
+    solicitud y los recursos (objetos) de la reserva.
+    """
+    lista = recursos(r)
+    return {
+        "id": r.id,
+        "fecha": r.fecha,
+        "hora_inicio": r.hora_inicio,
+        "hora_fin": r.hora_fin,
+        "estado": r.estado,
+        "espacio__nombre": r.espacio.nombre,
+        "area_nombre": area_nombre(r.solicitante),
+        "carrera_nombre": carrera_nombre(r.solicitante),
+        "solicitante_nombre": solicitante_nombre(r.solicitante),
+        "duracion": timedelta(minutes=minutos_reservados(r.hora_inicio, r.hora_fin)),
+        "total_recursos": sum(int(x.cantidad or 0) for x in lista),
+        "recursos_texto": ", ".join(f"{x.cantidad}x {x.recurso.nombre}" for x in lista),
+        "motivo": r.motivo,
+        "fecha_solicitud": r.fecha_solicitud,
+        "recursos": lista,
+    }
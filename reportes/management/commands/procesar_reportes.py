@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes.trabajos import procesar, reencolar_abandonados, tomar_siguiente
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de reportes: genera los TrabajoReporte pendientes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina.")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos de espera con la cola vacía.")
+
+    def handle(self, *args, **opts):
+        reencolados = reencolar_abandonados()
+        if reencolados:
+            self.stdout.write(self.style.WARNING(f"{reencolados} trabajo(s) abandonados vueltos a la cola."))
+
+        while True:
+            trabajo = tomar_siguiente()
+            if trabajo is None:
+                if opts["una_vez"]:
+                    return
+                time.sleep(opts["intervalo"])
+                continue
+
+            t0 = time.perf_counter()
+            procesar(trabajo)
+            estilo = self.style.SUCCESS if trabajo.estado == "LISTO" else self.style.ERROR
+            self.stdout.write(estilo(
+                f"#{trabajo.pk} {trabajo.reporte} {trabajo.parametros}: {trabajo.estado} "
+                f"en {time.perf_counter() - t0:.1f} s."
+            ))
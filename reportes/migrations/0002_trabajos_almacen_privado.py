@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:48
+
+import reportes.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_trabajos_reporte'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trabajoreporte',
+            name='archivo',
+            field=models.FileField(blank=True, null=True, storage=reportes.models.almacen_reportes, upload_to='%Y/%m/'),
+        ),
+    ]
@@ -1,3 +1,82 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
 
-# Create your models here.
+
+def almacen_reportes():
+    # Fuera de MEDIA_ROOT: los archivos solo se descargan por la vista (con permisos)
+    return FileSystemStorage(location=Path(settings.REPORTES_DIR) / "trabajos")
+
+
+# ==============================================================================
+# VERSIÓN DE DATOS (invalida artefactos de reportes ya generados)
+# ==============================================================================
+class VersionDatos(models.Model):
+    """
+    Contador que sube cada vez que cambian datos que salen en los reportes
+    (reservas, recursos pedidos, usuarios, áreas, carreras, espacios, recursos).
+    Ver reportes.versionado y reportes.signals.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    valor = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Versión de datos"
+        verbose_name_plural = "Versiones de datos"
+
+    def __str__(self):
+        return f"{self.nombre} v{self.valor}"
+
+
+# ==============================================================================
+# TRABAJOS DE REPORTE (cola en la BD, sin broker externo)
+# ==============================================================================
+class TrabajoReporte(models.Model):
+    """
+    Un reporte pedido para generarse en segundo plano.
+    La vista lo encola, `python manage.py procesar_reportes` lo construye y deja
+    el archivo en `archivo`. Se reutiliza para los mismos parámetros mientras
+    `version_datos` siga siendo la versión vigente (ver reportes.trabajos).
+    """
+    ESTADOS = (
+        ('PENDIENTE', 'En cola'),
+        ('EN_PROCESO', 'Generando'),
+        ('LISTO', 'Listo'),
+        ('ERROR', 'Error'),
+    )
+
+    reporte = models.CharField(max_length=10)
+    parametros = models.JSONField(default=dict)
+    # Hash de (reporte, parametros): identifica pedidos equivalentes
+    clave = models.CharField(max_length=64, db_index=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
+    version_datos = models.PositiveBigIntegerField(default=0)
+
+    archivo = models.FileField(upload_to='%Y/%m/', storage=almacen_reportes, blank=True, null=True)
+    nombre_archivo = models.CharField(max_length=150, blank=True, default="")
+    error = models.TextField(blank=True, default="")
+
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos_reporte'
+    )
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(blank=True, null=True)
+    terminado = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-creado']
+        verbose_name = "Trabajo de reporte"
+        verbose_name_plural = "Trabajos de reporte"
+        indexes = [
+            # El worker toma los pendientes más antiguos
+            models.Index(fields=['estado', 'creado'], name='trabajo_estado_creado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.reporte} {self.parametros} ({self.estado})"
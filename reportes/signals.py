@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Area, Carrera
+from inventario.models import Espacio, Recurso
+from reservas.derivados import dias_recalculados
+from reservas.models import RecursoReserva
+
+from .versionado import incrementar
+
+# Reserva no va en la lista: sus signals ya pasan por recalcular_dias(),
+# que avisa con dias_recalculados (igual que las operaciones masivas).
+MODELOS_REPORTADOS = (RecursoReserva, get_user_model(), Area, Carrera, Espacio, Recurso)
+
+# Guardados que no cambian nada de lo reportado (p. ej. el login actualiza last_login)
+CAMPOS_SIN_EFECTO = {"last_login", "password"}
+
+
+# =============================================================================
+# VERSIÓN DE DATOS: cualquier cambio que aparezca en un reporte la sube
+# =============================================================================
+def _nueva_version():
+    # Al confirmar (como las cachés de core.signals): el UPDATE sobre la fila única
+    # de VersionDatos dentro de la transacción de quien escribe serializaría todas las escrituras
+    transaction.on_commit(incrementar)
+
+
+def _dato_guardado(sender, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and set(update_fields) <= CAMPOS_SIN_EFECTO):
+        return
+    _nueva_version()
+
+
+def _dato_eliminado(sender, **kwargs):
+    _nueva_version()
+
+
+for _modelo in MODELOS_REPORTADOS:
+    post_save.connect(_dato_guardado, sender=_modelo, dispatch_uid=f"reportes_version_save_{_modelo.__name__}")
+    post_delete.connect(_dato_eliminado, sender=_modelo, dispatch_uid=f"reportes_version_delete_{_modelo.__name__}")
+
+
+@receiver(dias_recalculados)
+def reservas_recalculadas(sender, pares, **kwargs):
+    if pares:
+        _nueva_version()
@@ -1,3 +1,426 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import date, time
+from pathlib import Path
+from unittest import skipIf, skipUnless
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase, override_settings
+from openpyxl import load_workbook
+from django.urls import reverse
+
+from core.models import Area, Carrera, User
+from inventario.models import Espacio, Recurso
+from reservas.models import RecursoReserva, Reserva
+
+from .cache import archivo_reporte
+from .columnar import PARQUET_DISPONIBLE
+from .excel import guardar_en_temporal
+from .filas import area_nombre, recursos_texto, reservas_con_relaciones, total_recursos
+from .models import TrabajoReporte
+from .trabajos import encolar, procesar_pendientes
+from .versionado import incrementar, version_actual
+from .views import (
+    REPORTES_ADMIN, REPORTES_PACK, construir_pack, construir_r3, construir_r4, construir_r5, construir_r6, construir_r7,
+    _periodo_from_request, construir_r1, construir_u1, construir_u2, construir_u3, filas_auditoria, filas_hechos,
+)
+
+REPORTES_TEMPORAL = tempfile.mkdtemp()
+
+
+class _LibroQueBorraSuCarpeta:
+    """Mientras se guarda, otro proceso (simulado) sube la versión y limpia las carpetas viejas."""
+
+    def save(self, archivo):
+        incrementar()
+        shutil.rmtree(Path(REPORTES_TEMPORAL) / "cache", ignore_errors=True)
+
+ANIO_2030 = (date(2030, 1, 1), date(2030, 12, 31))
+PARAMS_2030 = {"desde": "2030-01-01", "hasta": "2030-12-31"}
+PARAMS_2031 = {"desde": "2031-01-01", "hasta": "2031-12-31"}
+
+
+@override_settings(REPORTES_DIR=REPORTES_TEMPORAL)
+class TrabajoReporteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        carrera = Carrera.objects.create(nombre="Informática", codigo="INF", area=Area.objects.create(nombre="TI"))
+        cls.admin = User.objects.create_user(
+            email="admin@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN", carrera=carrera,
+        )
+        cls.espacio = Espacio.objects.create(nombre="Sala 1", ubicacion="A", capacidad=30)
+        cls.reserva = Reserva.objects.create(
+            solicitante=cls.admin, espacio=cls.espacio, fecha="2030-03-04",
+            hora_inicio=time(9), hora_fin=time(10), motivo="x", estado="APROBADA",
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(REPORTES_TEMPORAL, ignore_errors=True)
+
+    def test_encolar_procesar_y_descargar(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse("reportes:encolar_reporte", args=["r8"]) + "?year=2030")
+        trabajo = TrabajoReporte.objects.get()
+        self.assertRedirects(response, reverse("reportes:trabajo_reporte", args=[trabajo.pk]))
+        self.assertEqual(trabajo.estado, "PENDIENTE")
+
+        self.assertEqual(procesar_pendientes(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, "LISTO", trabajo.error)
+
+        estado = self.client.get(reverse("reportes:trabajo_reporte", args=[trabajo.pk]), {"formato": "json"}).json()
+        self.assertTrue(estado["listo"])
+
+        descarga = self.client.get(reverse("reportes:descargar_trabajo_reporte", args=[trabajo.pk]))
+        self.assertEqual(descarga.status_code, 200)
+        self.assertTrue(b"".join(descarga.streaming_content).startswith(b"PK"))
+
+    def test_artefacto_se_reutiliza_hasta_que_cambian_los_datos(self):
+        primero = encolar("r3", PARAMS_2030)
+        self.assertEqual(encolar("r3", PARAMS_2030).pk, primero.pk)
+        procesar_pendientes()
+        self.assertEqual(encolar("r3", PARAMS_2030).pk, primero.pk)
+        self.assertNotEqual(encolar("r3", PARAMS_2031).pk, primero.pk)
+
+        version = version_actual()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reserva.estado = "PENDIENTE"
+            self.reserva.save()
+            # La versión sube al confirmar, no dentro de la transacción de quien escribe
+            self.assertEqual(version_actual(), version)
+        self.assertGreater(version_actual(), version)
+
+        nuevo = encolar("r3", PARAMS_2030)
+        self.assertNotEqual(nuevo.pk, primero.pk)
+        procesar_pendientes()
+        # El archivo anterior de los mismos parámetros se descarta
+        self.assertFalse(TrabajoReporte.objects.filter(pk=primero.pk).exists())
+
+    def test_solo_admin(self):
+        solicitante = User.objects.create_user(email="doc@test.cl", password="x", first_name="D", last_name="C")
+        self.client.force_login(solicitante)
+        self.client.post(reverse("reportes:encolar_reporte", args=["r1"]))
+        self.assertFalse(TrabajoReporte.objects.exists())
+
+
+@override_settings(REPORTES_DIR=REPORTES_TEMPORAL)
+class CacheReportesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email="admin@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN",
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(REPORTES_TEMPORAL, ignore_errors=True)
+
+    def setUp(self):
+        # La versión de datos vuelve atrás con cada test (rollback): los archivos no
+        shutil.rmtree(Path(REPORTES_TEMPORAL) / "cache", ignore_errors=True)
+
+    def test_se_construye_una_vez_por_version(self):
+        llamadas = []
+
+        def construir():
+            llamadas.append(1)
+            return construir_r7(*ANIO_2030)
+
+        primera = archivo_reporte("r7", PARAMS_2030, "admin", construir)
+        self.assertEqual(archivo_reporte("r7", PARAMS_2030, "admin", construir), primera)
+        self.assertEqual(len(llamadas), 1)
+
+        # Otro alcance u otros parámetros no comparten archivo
+        archivo_reporte("r7", PARAMS_2030, "u1", construir)
+        archivo_reporte("r7", PARAMS_2031, "admin", construir)
+        self.assertEqual(len(llamadas), 3)
+
+        # Datos nuevos: se reconstruye; la versión inmediatamente anterior se conserva
+        # (puede tener escrituras en curso) y las más viejas se borran
+        incrementar()
+        nueva = archivo_reporte("r7", PARAMS_2030, "admin", construir)
+        self.assertEqual(len(llamadas), 4)
+        self.assertNotEqual(nueva, primera)
+        self.assertTrue(primera.exists())
+
+        incrementar()
+        archivo_reporte("r7", PARAMS_2030, "admin", construir)
+        self.assertFalse(primera.exists())
+        self.assertTrue(nueva.exists())
+
+    def test_carpeta_borrada_mientras_se_escribe_se_reconstruye(self):
+        llamadas = []
+
+        def construir():
+            llamadas.append(1)
+            if len(llamadas) == 1:
+                return _LibroQueBorraSuCarpeta(), "R7.xlsx"
+            return construir_r7(*ANIO_2030)
+
+        ruta = archivo_reporte("r7", PARAMS_2030, "admin", construir)
+        self.assertEqual(len(llamadas), 2)
+        self.assertTrue(ruta.exists())
+        self.assertIn(f"v{version_actual()}", ruta.parts)
+
+    def test_vista_usa_la_cache(self):
+        self.client.force_login(self.admin)
+        url = reverse("reportes:r7_estados_por_area_excel") + "?year=2030"
+        primero = b"".join(self.client.get(url).streaming_content)
+        with self.assertNumQueries(3):  # sesión + usuario + versión de datos
+            segundo = b"".join(self.client.get(url).streaming_content)
+        self.assertEqual(primero, segundo)
+
+
+class ReportesAgregadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        carrera = Carrera.objects.create(nombre="Informática", codigo="INF", area=Area.objects.create(nombre="TI"))
+        usuario = User.objects.create_user(
+            email="doc@test.cl", password="x", first_name="Ana", last_name="Pérez", carrera=carrera,
+        )
+        espacio = Espacio.objects.create(nombre="Sala 1", ubicacion="A", capacidad=30)
+        for dia in range(1, 7):
+            Reserva.objects.create(
+                solicitante=usuario, espacio=espacio, fecha=f"2030-03-{dia:02d}",
+                hora_inicio=time(9), hora_fin=time(10, 30), motivo="x", estado="APROBADA",
+            )
+        pendiente = Reserva.objects.create(
+            solicitante=usuario, espacio=espacio, fecha="2030-04-01",
+            hora_inicio=time(9), hora_fin=time(10), motivo="x", estado="PENDIENTE",
+        )
+        proyector = Recurso.objects.create(nombre="Proyector", stock=5)
+        RecursoReserva.objects.create(reserva=Reserva.objects.filter(estado="APROBADA").first(), recurso=proyector, cantidad=2)
+        RecursoReserva.objects.create(reserva=pendiente, recurso=proyector, cantidad=1)
+
+    def _detalle(self, construir):
+        with self.assertNumQueries(2):  # resumen (tabla de hechos) + detalle (iterator)
+            wb, _nombre = construir(*ANIO_2030)
+            with guardar_en_temporal(wb) as tmp:
+                hoja = load_workbook(tmp)["Detalle"]
+                return list(hoja.iter_rows(min_row=5, values_only=True))
+
+    def test_r3_a_r6_consultas_fijas_y_detalle_calculado_en_bd(self):
+        filas = self._detalle(construir_r3)
+        self.assertEqual(len(filas), 6)
+        self.assertEqual(filas[0][4:9], (1.5, "Sala 1", "Ana Pérez", "TI", "Informática"))
+
+        for construir in (construir_r4, construir_r5, construir_r6):
+            self.assertEqual(len(self._detalle(construir)), 6)
+
+    def _hojas(self, wb):
+        with guardar_en_temporal(wb) as tmp:
+            libro = load_workbook(tmp)
+            return {hoja.title: list(hoja.iter_rows(min_row=5, values_only=True)) for hoja in libro}
+
+    def test_pack_una_pasada_con_los_mismos_resumenes(self):
+        with self.assertNumQueries(3):  # reservas (iterator) + recursos precargados + tabla de hechos
+            wb, nombre = construir_pack(*ANIO_2030)
+        self.assertEqual(nombre, "Pack_reportes_admin_2030.xlsx")
+        pack = self._hojas(wb)
+        self.assertEqual(len(pack), 16)
+
+        for rep in REPORTES_PACK:
+            _titulo, construir = REPORTES_ADMIN[rep]
+            suelto = self._hojas(construir(*ANIO_2030)[0])
+            self.assertEqual(pack[f"{rep.upper()} Resumen"], suelto["Resumen"], rep)
+            self.assertCountEqual(pack[f"{rep.upper()} Detalle"], suelto["Detalle"], rep)
+
+    def _assert_pack_igual_a_sueltos(self):
+        pack = self._hojas(construir_pack(*ANIO_2030)[0])
+        for rep in REPORTES_PACK:
+            _titulo, construir = REPORTES_ADMIN[rep]
+            suelto = self._hojas(construir(*ANIO_2030)[0])
+            self.assertEqual(pack[f"{rep.upper()} Resumen"], suelto["Resumen"], rep)
+            self.assertCountEqual(pack[f"{rep.upper()} Detalle"], suelto["Detalle"], rep)
+        return pack
+
+    def test_pack_y_sueltos_coinciden_tras_cambiar_carrera_o_area(self):
+        usuario = User.objects.get(email="doc@test.cl")
+        salud = Area.objects.create(nombre="Salud")
+        usuario.carrera = Carrera.objects.create(nombre="Enfermería", codigo="ENF", area=salud)
+        usuario.save()
+        pack = self._assert_pack_igual_a_sueltos()
+        self.assertEqual([f[:2] for f in pack["R5 Resumen"]], [("Salud", 6)])
+
+        # Cambia el área de la carrera (no el usuario)
+        carrera = usuario.carrera
+        carrera.area = Area.objects.create(nombre="Educación")
+        carrera.save()
+        pack = self._assert_pack_igual_a_sueltos()
+        self.assertEqual([f[:2] for f in pack["R5 Resumen"]], [("Educación", 6)])
+        self.assertEqual({f[0] for f in pack["R7 Resumen"]}, {"Educación"})
+
+    def test_periodo_de_varios_years_con_el_mismo_costo(self):
+        Reserva.objects.create(
+            solicitante=User.objects.get(email="doc@test.cl"), espacio=Espacio.objects.get(), fecha="2032-07-01",
+            hora_inicio=time(9), hora_fin=time(10), motivo="x", estado="APROBADA",
+        )
+        periodo = (date(2028, 1, 1), date(2032, 12, 31))
+        with self.assertNumQueries(2):  # igual que un año: tabla de hechos + detalle
+            wb, nombre = construir_r6(*periodo)
+        self.assertEqual(nombre, "R6_tendencia_mensual_por_area_2028_2032.xlsx")
+        with guardar_en_temporal(wb) as tmp:
+            hoja = load_workbook(tmp)["Resumen"]
+            encabezado = next(hoja.iter_rows(min_row=4, max_row=4, values_only=True))
+            fila = next(hoja.iter_rows(min_row=5, max_row=5, values_only=True))
+        # Una columna por mes del período, con el año
+        self.assertEqual(len(encabezado), 1 + 60 + 1)
+        self.assertEqual(encabezado[1], "Ene 2028")
+        self.assertEqual(fila[encabezado.index("Mar 2030")], 6)
+        self.assertEqual(fila[encabezado.index("Jul 2032")], 1)
+        self.assertEqual(fila[-1], 7)
+
+        # El pack da los mismos resúmenes para el mismo período
+        pack = self._hojas(construir_pack(*periodo)[0])
+        for rep in REPORTES_PACK:
+            _titulo, construir = REPORTES_ADMIN[rep]
+            self.assertEqual(pack[f"{rep.upper()} Resumen"], self._hojas(construir(*periodo)[0])["Resumen"], rep)
+
+    def test_periodo_parcial(self):
+        # Del 3 al 5 de marzo: 3 de las 6 reservas aprobadas
+        wb, nombre = construir_r1(date(2030, 3, 3), date(2030, 3, 5))
+        self.assertEqual(nombre, "R1_recursos_global_2030-03-03_2030-03-05.xlsx")
+        hojas = self._hojas(construir_r7(date(2030, 3, 3), date(2030, 3, 5))[0])
+        self.assertEqual(hojas["Resumen"][0][:2], ("TI", 3))
+        self._hojas(wb)
+
+    def test_periodo_desde_request(self):
+        def periodo(**params):
+            return _periodo_from_request(RequestFactory().get("/", params))
+
+        self.assertEqual(periodo(year="2030"), ANIO_2030)
+        self.assertEqual(periodo(desde="2030-03-01", hasta="2030-07-31"), (date(2030, 3, 1), date(2030, 7, 31)))
+        # Solo una punta: se completa hasta fin/inicio de ese año; invertido se ordena
+        self.assertEqual(periodo(desde="2030-03-01"), (date(2030, 3, 1), date(2030, 12, 31)))
+        self.assertEqual(periodo(desde="2030-07-31", hasta="2030-03-01"), (date(2030, 3, 1), date(2030, 7, 31)))
+        # Fecha inválida: se ignora (queda el año de ?year)
+        self.assertEqual(periodo(year="2030", desde="2030-02-30"), ANIO_2030)
+        # Más de RANGO_MAX_YEARS: se recorta a los últimos años
+        self.assertEqual(periodo(desde="2001-01-01", hasta="2030-12-31")[0], date(2021, 1, 1))
+
+
+class PresupuestoConsultasTests(TestCase):
+    """
+    Consultas por reporte: fijas, sin importar cuántas filas tenga.
+    Si una fila vuelve a consultar (relación sin select_related, .exists() sobre
+    un prefetch...) el reporte se pasa del presupuesto.
+    """
+    # Admin: resumen + detalle; r8 además los recursos precargados; el pack: reservas + recursos + hechos
+    PRESUPUESTO_ADMIN = {"r8": 3, "pack": 3}
+    # u1: reservas + recursos + usuario con área/carrera; u2: resumen + detalle; u3: reservas + recursos
+    PRESUPUESTO_PERSONAL = {"u1": 3, "u2": 2, "u3": 2}
+
+    @classmethod
+    def setUpTestData(cls):
+        area = Area.objects.create(nombre="TI")
+        carrera = Carrera.objects.create(nombre="Informática", codigo="INF", area=area)
+        cls.usuario = User.objects.create_user(
+            email="doc@test.cl", password="x", first_name="Ana", last_name="Pérez", carrera=carrera,
+        )
+        legacy = User.objects.create_user(email="legacy@test.cl", password="x")
+        User.objects.filter(pk=legacy.pk).update(carrera=None, area=Area.objects.create(nombre="Ciencias"))
+        legacy.refresh_from_db()
+
+        espacios = [Espacio.objects.create(nombre=f"Sala {i}", ubicacion="A", capacidad=30) for i in range(3)]
+        recursos = [Recurso.objects.create(nombre=f"Recurso {i}", stock=10) for i in range(3)]
+        for dia in range(1, 13):
+            for i, solicitante in enumerate((cls.usuario, legacy)):
+                reserva = Reserva.objects.create(
+                    solicitante=solicitante, espacio=espacios[(dia + i) % 3], fecha=f"2030-{dia:02d}-10",
+                    hora_inicio=time(9 + 2 * i), hora_fin=time(10 + 2 * i), motivo="x",
+                    estado="APROBADA" if dia % 3 else "RECHAZADA",
+                )
+                for recurso in recursos[: dia % 3 + 1]:
+                    RecursoReserva.objects.create(reserva=reserva, recurso=recurso, cantidad=dia % 2 + 1)
+
+    def _cerrar(self, wb):
+        # Un libro write-only sin guardar deja sus temporales abiertos
+        with guardar_en_temporal(wb):
+            pass
+
+    def test_reportes_admin(self):
+        for reporte, (_titulo, construir) in REPORTES_ADMIN.items():
+            with self.subTest(reporte):
+                with self.assertNumQueries(self.PRESUPUESTO_ADMIN.get(reporte, 2)):
+                    wb, _nombre = construir(*ANIO_2030)
+                self._cerrar(wb)
+
+    def test_reportes_personales(self):
+        for reporte, construir in (("u1", construir_u1), ("u2", construir_u2), ("u3", construir_u3)):
+            # Como request.user: sin área/carrera cargadas
+            usuario = User.objects.get(pk=self.usuario.pk)
+            with self.subTest(reporte):
+                with self.assertNumQueries(self.PRESUPUESTO_PERSONAL[reporte]):
+                    wb, _nombre = construir(usuario, *ANIO_2030)
+                self._cerrar(wb)
+
+    def test_filas_solo_usan_datos_precargados(self):
+        reservas = list(reservas_con_relaciones(Reserva.objects.all()))
+        with self.assertNumQueries(0):
+            textos = [recursos_texto(r) for r in reservas]
+            self.assertEqual(sum(total_recursos(r) for r in reservas), 72)
+            self.assertEqual({area_nombre(r.solicitante) for r in reservas}, {"TI", "Ciencias"})
+        self.assertIn("1x Recurso 0", textos)
+
+
+@override_settings(REPORTES_DIR=REPORTES_TEMPORAL)
+class ParquetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email="admin@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN",
+        )
+        espacio = Espacio.objects.create(nombre="Sala 1", ubicacion="A", capacidad=30)
+        proyector = Recurso.objects.create(nombre="Proyector", stock=5)
+        notebook = Recurso.objects.create(nombre="Notebook", stock=5)
+        for year in (2030, 2031):
+            con_recursos = Reserva.objects.create(
+                solicitante=cls.admin, espacio=espacio, fecha=f"{year}-03-04",
+                hora_inicio=time(9), hora_fin=time(10, 30), motivo="x", estado="APROBADA",
+            )
+            RecursoReserva.objects.create(reserva=con_recursos, recurso=proyector, cantidad=2)
+            RecursoReserva.objects.create(reserva=con_recursos, recurso=notebook, cantidad=1)
+            Reserva.objects.create(
+                solicitante=cls.admin, espacio=espacio, fecha=f"{year}-03-05",
+                hora_inicio=time(9), hora_fin=time(10), motivo="y", estado="PENDIENTE",
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(REPORTES_TEMPORAL, ignore_errors=True)
+
+    def test_filas_por_periodo(self):
+        # Hechos: una fila por recurso; la reserva sin recursos va igual (recurso nulo)
+        hechos = list(filas_hechos(*ANIO_2030))
+        self.assertEqual(len(hechos), 3)
+        self.assertEqual(sorted(str(h["recurso"]) for h in hechos), ["None", "Notebook", "Proyector"])
+        self.assertEqual(hechos[0]["minutos"], 90)
+
+        dos_years = (date(2030, 1, 1), date(2031, 12, 31))
+        self.assertEqual(len(list(filas_hechos(*dos_years))), 6)
+        auditoria = list(filas_auditoria(*dos_years))
+        self.assertEqual(len(auditoria), 4)
+        self.assertEqual(auditoria[-1]["detalle_recursos"], "2x Proyector, 1x Notebook")
+
+    @skipUnless(PARQUET_DISPONIBLE, "pyarrow no instalado")
+    def test_descarga_parquet_tipada(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("reportes:hechos_reservas_parquet"), {"desde": "2030-01-01", "hasta": "2031-12-31"})
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet")
+        with tempfile.TemporaryFile() as tmp:
+            tmp.write(b"".join(response.streaming_content))
+            tabla = pq.read_table(tmp)
+        self.assertEqual(tabla.num_rows, 6)
+        self.assertEqual(tabla.schema.field("fecha").type, pa.date32())
+
+    @skipIf(PARQUET_DISPONIBLE, "pyarrow instalado")
+    def test_sin_pyarrow_avisa(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("reportes:r8_auditoria_parquet"), {"year": 2030})
+        self.assertRedirects(response, reverse("reportes:home") + "?year=2030")
@@ -0,0 +1,160 @@
+"""
+Cola de reportes en segundo plano, guardada en la misma base de datos (sin broker).
+
+Flujo:
+1) La vista llama a encolar(): si ya hay un archivo LISTO para los mismos
+   parámetros y la versión de datos no cambió, se reutiliza; si hay uno en
+   cola/generándose, se devuelve ese; si no, se crea un TrabajoReporte PENDIENTE.
+2) `python manage.py procesar_reportes` toma los pendientes (UPDATE condicional:
+   con varios workers, cada trabajo lo gana uno solo), construye el Excel y lo
+   guarda en el FileField.
+3) La página consulta estado_trabajo() hasta que queda LISTO y descarga el archivo.
+"""
+import hashlib
+import json
+import traceback
+from datetime import date, timedelta
+
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from .excel import guardar_en_temporal
+from .models import TrabajoReporte
+from .versionado import version_actual
+
+# Un trabajo EN_PROCESO más viejo que esto se considera abandonado (worker caído)
+MINUTOS_ABANDONO = 30
+
+
+def _registro() -> dict:
+    # Import diferido: views importa este módulo
+    from .views import REPORTES_ADMIN
+    return REPORTES_ADMIN
+
+
+def argumentos_construir(parametros: dict) -> dict:
+    """parametros (JSON) -> argumentos de construir(): el período viene en ISO."""
+    if "year" in parametros:  # trabajos encolados antes de los períodos: año completo
+        year = int(parametros["year"])
+        return {"desde": date(year, 1, 1), "hasta": date(year, 12, 31)}
+    return {
+        clave: date.fromisoformat(valor) if clave in ("desde", "hasta") else valor
+        for clave, valor in parametros.items()
+    }
+
+
+def clave_trabajo(reporte: str, parametros: dict) -> str:
+    crudo = json.dumps([reporte, parametros], sort_keys=True, default=str)
+    return hashlib.sha256(crudo.encode()).hexdigest()
+
+
+def encolar(reporte: str, parametros: dict, usuario=None) -> TrabajoReporte:
+    """Trabajo para (reporte, parametros): uno vigente si existe, o uno nuevo en cola."""
+    if reporte not in _registro():
+        raise ValueError(f"Reporte desconocido: {reporte}")
+
+    clave = clave_trabajo(reporte, parametros)
+    version = version_actual()
+
+    # PENDIENTE sirve siempre (todavía no leyó datos); EN_PROCESO/LISTO solo si la versión es la vigente
+    existente = (
+        TrabajoReporte.objects.filter(clave=clave)
+        .filter(Q(estado="PENDIENTE") | Q(estado__in=["EN_PROCESO", "LISTO"], version_datos=version))
+        .order_by("-creado")
+        .first()
+    )
+    if existente:
+        return existente
+
+    return TrabajoReporte.objects.create(
+        reporte=reporte,
+        parametros=parametros,
+        clave=clave,
+        version_datos=version,
+        solicitado_por=usuario,
+    )
+
+
+def estado_trabajo(trabajo: TrabajoReporte) -> dict:
+    return {
+        "id": trabajo.pk,
+        "reporte": trabajo.reporte,
+        "estado": trabajo.estado,
+        "estado_display": trabajo.get_estado_display(),
+        "listo": trabajo.estado == "LISTO",
+        "error": trabajo.estado == "ERROR",
+    }
+
+
+def tomar_siguiente():
+    """Marca EN_PROCESO el pendiente más antiguo que logre tomar (o None si no hay)."""
+    candidatos = (
+        TrabajoReporte.objects.filter(estado="PENDIENTE")
+        .order_by("creado")
+        .values_list("pk", flat=True)[:20]
+    )
+    for pk in candidatos:
+        tomado = TrabajoReporte.objects.filter(pk=pk, estado="PENDIENTE").update(
+            estado="EN_PROCESO", iniciado=timezone.now(),
+        )
+        if tomado:
+            return TrabajoReporte.objects.get(pk=pk)
+    return None
+
+
+def procesar(trabajo: TrabajoReporte) -> TrabajoReporte:
+    """Construye el archivo del trabajo y lo deja LISTO (o ERROR con el traceback)."""
+    _titulo, construir = _registro()[trabajo.reporte]
+
+    # La versión se lee ANTES de construir: si los datos cambian a mitad,
+    # el archivo queda con la versión vieja y el próximo pedido lo regenera.
+    version = version_actual()
+    try:
+        wb, nombre = construir(**argumentos_construir(trabajo.parametros))
+        with guardar_en_temporal(wb) as tmp:
+            trabajo.archivo.save(nombre, File(tmp), save=False)
+    except Exception:
+        trabajo.estado = "ERROR"
+        trabajo.error = traceback.format_exc()
+    else:
+        trabajo.estado = "LISTO"
+        trabajo.nombre_archivo = nombre
+        trabajo.version_datos = version
+        trabajo.error = ""
+
+    trabajo.terminado = timezone.now()
+    trabajo.save()
+
+    if trabajo.estado == "LISTO":
+        _borrar_anteriores(trabajo)
+    return trabajo
+
+
+def _borrar_anteriores(trabajo: TrabajoReporte) -> None:
+    """Los archivos anteriores de los mismos parámetros ya no se van a servir."""
+    anteriores = TrabajoReporte.objects.filter(clave=trabajo.clave, estado="LISTO").exclude(pk=trabajo.pk)
+    for viejo in anteriores:
+        if viejo.archivo:
+            viejo.archivo.delete(save=False)
+    anteriores.delete()
+
+
+def reencolar_abandonados(minutos: int = MINUTOS_ABANDONO) -> int:
+    """Devuelve a la cola los trabajos que quedaron EN_PROCESO (worker caído)."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TrabajoReporte.objects.filter(estado="EN_PROCESO", iniciado__lt=limite).update(
+        estado="PENDIENTE", iniciado=None,
+    )
+
+
+def procesar_pendientes(limite: int | None = None) -> int:
+    """Procesa pendientes hasta vaciar la cola (o llegar a `limite`). Devuelve cuántos procesó."""
+    procesados = 0
+    while limite is None or procesados < limite:
+        trabajo = tomar_siguiente()
+        if trabajo is None:
+            break
+        procesar(trabajo)
+        procesados += 1
+    return procesados
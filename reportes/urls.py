@@ -20,4 +20,14 @@ urlpatterns = [
     path("r6-tendencia-mensual-por-area.xlsx", views.r6_tendencia_mensual_por_area_excel, name="r6_tendencia_mensual_por_area_excel"),
     path("r7-estados-por-area.xlsx", views.r7_estados_por_area_excel, name="r7_estados_por_area_excel"),
     path("r8-auditoria-detallada.xlsx", views.r8_auditoria_detallada_excel, name="r8_auditoria_detallada_excel"),
+    path("pack-reportes-admin.xlsx", views.pack_admin_excel, name="pack_admin_excel"),
+
+    # ===================== ADMIN: datasets Parquet (análisis) =====================
+    path("r8-auditoria.parquet", views.r8_auditoria_parquet, name="r8_auditoria_parquet"),
+    path("hechos-reservas-recursos.parquet", views.hechos_reservas_parquet, name="hechos_reservas_parquet"),
+
+    # ===================== ADMIN: generación en segundo plano =====================
+    path("generar/<str:reporte>/", views.encolar_reporte, name="encolar_reporte"),
+    path("trabajos/<int:trabajo_id>/", views.trabajo_reporte, name="trabajo_reporte"),
+    path("trabajos/<int:trabajo_id>/descargar/", views.descargar_trabajo_reporte, name="descargar_trabajo_reporte"),
 ]
@@ -0,0 +1,25 @@
+"""
+Versión de los datos que alimentan los reportes.
+
+Un contador por nombre (VersionDatos) que sube con cada cambio relevante
+(ver reportes.signals). Un artefacto generado con la versión N sigue siendo
+válido mientras la versión vigente sea N: leerla es una consulta por PK única.
+"""
+from django.db.models import F
+
+DATOS_RESERVAS = "reservas"
+
+
+def version_actual(nombre: str = DATOS_RESERVAS) -> int:
+    from .models import VersionDatos
+
+    valor = VersionDatos.objects.filter(nombre=nombre).values_list("valor", flat=True).first()
+    return valor or 0
+
+
+def incrementar(nombre: str = DATOS_RESERVAS) -> None:
+    from .models import VersionDatos
+
+    # UPDATE atómico: no se pierden incrementos con varios procesos
+    if not VersionDatos.objects.filter(nombre=nombre).update(valor=F("valor") + 1):
+        VersionDatos.objects.get_or_create(nombre=nombre, defaults={"valor": 1})
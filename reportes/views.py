@@ -1,39 +1,49 @@
 from __future__ import annotations
 
-from io import BytesIO
-from datetime import datetime, date, time as time_cls
+from datetime import datetime, date
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum, Value, F
-from django.db.models.functions import Coalesce
-from django.http import HttpResponse
-from django.shortcuts import render, redirect
+from django.db.models import CharField, Count, DurationField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, TruncMonth, Trim
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.utils import timezone
-
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
 
 from core.views import admin_required
-from reservas.models import Reserva, RecursoReserva
+from reservas.estadisticas import minutos_reservados
+from reservas.models import Reserva, RecursoReserva, ResumenDiarioReserva
+
+from .cache import respuesta_reporte
+from .columnar import PARQUET_CONTENT_TYPE, PARQUET_DISPONIBLE, TablaParquet
+from .excel import TablaEnStreaming, escribir_tabla, nuevo_libro, respuesta_archivo
+from .filas import (
+    area_nombre, carrera_nombre, fila_reserva, recursos_texto, reservas_con_relaciones, total_recursos,
+    usuario_con_relaciones,
+)
+from .models import TrabajoReporte
+from .trabajos import argumentos_construir, encolar, estado_trabajo
 
 
 # ==============================================================================
 # Helpers (Excel + cálculos)
 # ==============================================================================
 
-HEADER_FILL = PatternFill("solid", fgColor="D71920")  # Rojo INACAP
-HEADER_FONT = Font(color="FFFFFF", bold=True)
-THIN = Side(style="thin", color="CCCCCC")
-BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
-
 MESES = ["Ene", "Feb", "Mar", "Abr", "May", "Jun", "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
 
 # ✅ Para reportes 1–6: solo APROBADA (así no aparece FINALIZADA si no la usas)
 OK_STATES = ["APROBADA"]
 
+# Filas por lote al recorrer detalles grandes con .iterator()
+CHUNK_DETALLE = 2000
+
+# Un período más largo se recorta a los últimos N años
+RANGO_MAX_YEARS = 10
+
 
 def _duration_hours(h_inicio, h_fin) -> float:
     """Calcula duración en horas (float) para métricas."""
@@ -59,6 +69,79 @@ def _year_from_request(request) -> int:
     return year
 
 
+def _fecha_param(request, nombre: str):
+    try:
+        fecha = parse_date(request.GET.get(nombre) or "")
+    except ValueError:  # bien formada pero inexistente (ej. 2025-02-30)
+        return None
+    if fecha and 2000 <= fecha.year <= 2100:
+        return fecha
+    return None
+
+
+def _periodo_from_request(request) -> tuple[date, date]:
+    """
+    Período del reporte: ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD (un semestre, varios años...).
+    Sin fechas se usa el año completo de ?year=YYYY, como siempre.
+    """
+    desde = _fecha_param(request, "desde")
+    hasta = _fecha_param(request, "hasta")
+    if not desde and not hasta:
+        year = _year_from_request(request)
+        return date(year, 1, 1), date(year, 12, 31)
+
+    desde = desde or date(hasta.year, 1, 1)
+    hasta = hasta or date(desde.year, 12, 31)
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    if hasta.year - desde.year >= RANGO_MAX_YEARS:
+        desde = date(hasta.year - RANGO_MAX_YEARS + 1, 1, 1)
+    return desde, hasta
+
+
+def _es_year_completo(desde: date, hasta: date) -> bool:
+    return (desde.month, desde.day) == (1, 1) and (hasta.month, hasta.day) == (12, 31)
+
+
+def _parametros_periodo(desde: date, hasta: date) -> dict:
+    # Para la caché y la cola (JSON): fechas en ISO
+    return {"desde": desde.isoformat(), "hasta": hasta.isoformat()}
+
+
+def _periodo_qs(desde: date, hasta: date) -> str:
+    """Query string del período para los links (?year=YYYY si es un año completo)."""
+    if desde.year == hasta.year and _es_year_completo(desde, hasta):
+        return urlencode({"year": desde.year})
+    return urlencode(_parametros_periodo(desde, hasta))
+
+
+def _texto_periodo(desde: date, hasta: date) -> str:
+    if _es_year_completo(desde, hasta):
+        return f"Año {desde.year}" if desde.year == hasta.year else f"Años {desde.year}–{hasta.year}"
+    return f"Del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}"
+
+
+def _sufijo_periodo(desde: date, hasta: date) -> str:
+    """Para el nombre del archivo: 2025, 2023_2025 o 2025-03-01_2025-07-31."""
+    if _es_year_completo(desde, hasta):
+        return str(desde.year) if desde.year == hasta.year else f"{desde.year}_{hasta.year}"
+    return f"{desde.isoformat()}_{hasta.isoformat()}"
+
+
+def _meses_periodo(desde: date, hasta: date) -> list:
+    """Primer día de cada mes del período (columnas de R6)."""
+    meses = []
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        meses.append(mes)
+        mes = date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+    return meses
+
+
+def _etiqueta_mes(fecha: date, con_year: bool) -> str:
+    return f"{MESES[fecha.month - 1]} {fecha.year}" if con_year else MESES[fecha.month - 1]
+
+
 # -----------------------------
 # Expresiones BD (Área/Carrera)
 # -----------------------------
@@ -80,6 +163,11 @@ def _area_expr_recurso_reserva():
     )
 
 
+def _area_expr_resumen():
+    # En la tabla de hechos el área ya viene resuelta (carrera.area o legacy)
+    return Coalesce(F("area__nombre"), Value("Sin Área"))
+
+
 def _carrera_expr_reserva():
     return Coalesce(
         F("solicitante__carrera__nombre"),
@@ -87,6 +175,12 @@ def _carrera_expr_reserva():
     )
 
 
+def _solicitante_expr_reserva():
+    # Igual que get_full_name() or email
+    nombre = Trim(Concat(F("solicitante__first_name"), Value(" "), F("solicitante__last_name")))
+    return Coalesce(NullIf(nombre, Value("")), F("solicitante__email"), output_field=CharField())
+
+
 def _carrera_expr_recurso_reserva():
     return Coalesce(
         F("reserva__solicitante__carrera__nombre"),
@@ -94,140 +188,69 @@ def _carrera_expr_recurso_reserva():
     )
 
 
-# -----------------------------
-# Excel helpers
-# -----------------------------
-
-def _auto_fit(ws, min_w: int = 12, max_w: int = 48) -> None:
-    """Ajusta el ancho de columnas según el contenido."""
-    for col in range(1, ws.max_column + 1):
-        letter = get_column_letter(col)
-        max_len = 0
-        for row in range(1, ws.max_row + 1):
-            val = ws.cell(row=row, column=col).value
-            if val is None:
-                continue
-            max_len = max(max_len, len(str(val)))
-        ws.column_dimensions[letter].width = max(min_w, min(max_w, max_len + 2))
-
-
-def _safe_table_name(ws_title: str, header_row: int) -> str:
-    """
-    Nombre de tabla Excel:
-    - Debe empezar con letra
-    - Solo letras/números/underscore
-    - Debe ser único por workbook
-    """
-    base = "".join(ch if ch.isalnum() else "_" for ch in ws_title)
-    base = base.strip("_") or "Sheet"
-    name = f"T_{base}_{header_row}"
-    if not name[0].isalpha():
-        name = "T_" + name
-    return name[:60]
+def _solicitante_expr_recurso_reserva():
+    nombre = Trim(Concat(F("reserva__solicitante__first_name"), Value(" "), F("reserva__solicitante__last_name")))
+    return Coalesce(NullIf(nombre, Value("")), F("reserva__solicitante__email"), output_field=CharField())
 
 
-def _write_table(ws, title: str, subtitle: str, columns: list[str], rows: list[list]) -> None:
+def _resumen_qs(desde: date, hasta: date, estados=None):
     """
-    Escribe una hoja con:
-    - Título + subtítulo
-    - Encabezados estilo INACAP
-    - Tabla Excel (con flechas de filtro/ordenamiento)
-    - Freeze panes
-    - Bordes
+    Filas de ResumenDiarioReserva del período (para las hojas 'Resumen').
+    Son pocas filas por día, así un rango de varios años sigue siendo barato.
     """
-    ws["A1"] = title
-    ws["A1"].font = Font(bold=True, size=14)
-
-    ws["A2"] = subtitle
-    ws["A2"].font = Font(color="666666")
-
-    ws.append([])
-
-    header_row = ws.max_row + 1
-    ws.append(columns)
-
-    # Encabezado
-    for c in range(1, len(columns) + 1):
-        cell = ws.cell(row=header_row, column=c)
-        cell.fill = HEADER_FILL
-        cell.font = HEADER_FONT
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-        cell.border = BORDER
-
-    # Datos
-    for r in rows:
-        ws.append(r)
-
-    # Estilo celdas
-    for row_i in range(header_row + 1, ws.max_row + 1):
-        for c in range(1, len(columns) + 1):
-            cell = ws.cell(row=row_i, column=c)
-            cell.border = BORDER
-            cell.alignment = Alignment(vertical="top", wrap_text=True)
-
-            # Tipos: fechas/horas reales para ordenamiento correcto
-            val = cell.value
-            if isinstance(val, datetime):
-                cell.number_format = "yyyy-mm-dd hh:mm"
-            elif isinstance(val, date) and not isinstance(val, datetime):
-                cell.number_format = "yyyy-mm-dd"
-            elif isinstance(val, time_cls):
-                cell.number_format = "hh:mm"
-
-    # Congelar encabezado
-    ws.freeze_panes = ws[f"A{header_row + 1}"]
-
-    # Crear Tabla Excel con filtros (flechas) y estilo
-    last_col = get_column_letter(len(columns))
-    table_ref = f"A{header_row}:{last_col}{ws.max_row}"
-    table = Table(displayName=_safe_table_name(ws.title, header_row), ref=table_ref)
-    style = TableStyleInfo(
-        name="TableStyleMedium9",
-        showFirstColumn=False,
-        showLastColumn=False,
-        showRowStripes=True,
-        showColumnStripes=False,
-    )
-    table.tableStyleInfo = style
-    ws.add_table(table)
+    qs = ResumenDiarioReserva.objects.filter(fecha__range=(desde, hasta))
+    if estados is not None:
+        qs = qs.filter(estado__in=estados)
+    return qs
 
-    _auto_fit(ws)
 
-
-def _excel_response(wb: Workbook, filename: str) -> HttpResponse:
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-    resp = HttpResponse(
-        bio.getvalue(),
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-    return resp
+def _horas(minutos) -> float:
+    return round(int(minutos or 0) / 60.0, 2)
 
 
-def _get_total_recursos_reserva(reserva: Reserva) -> int:
-    return sum(int(x.cantidad or 0) for x in reserva.recursos_asociados.all())
+def _horas_duracion(duracion) -> float:
+    """timedelta (hora_fin - hora_inicio calculado en la BD) -> horas, igual que _duration_hours."""
+    if not duracion:
+        return 0.0
+    return round(max(duracion.total_seconds(), 0) / 3600.0, 2)
 
 
-def _recursos_texto(reserva: Reserva) -> str:
-    if not reserva.recursos_asociados.exists():
-        return ""
-    return ", ".join([f"{x.cantidad}x {x.recurso.nombre}" for x in reserva.recursos_asociados.all()])
+def _detalle_reservas(qs):
+    """
+    Filas (dict) para las hojas Detalle, calculadas en la BD: área, carrera,
+    solicitante, duración y total de recursos. Se leen por lotes con .iterator(),
+    así la hoja se escribe con memoria acotada aunque el año tenga muchas reservas.
+    """
+    return (
+        qs.annotate(
+            area_nombre=_area_expr_reserva(),
+            carrera_nombre=_carrera_expr_reserva(),
+            solicitante_nombre=_solicitante_expr_reserva(),
+            duracion=ExpressionWrapper(F("hora_fin") - F("hora_inicio"), output_field=DurationField()),
+            total_recursos=Coalesce(Sum("recursos_asociados__cantidad"), 0),
+        )
+        .values(
+            "id", "fecha", "hora_inicio", "hora_fin", "estado", "espacio__nombre",
+            "area_nombre", "carrera_nombre", "solicitante_nombre", "duracion", "total_recursos",
+        )
+        .order_by("-fecha", "-hora_inicio")
+        .iterator(chunk_size=CHUNK_DETALLE)
+    )
 
 
-def _area_name_from_user(user) -> str:
-    if getattr(user, "carrera", None) and getattr(user.carrera, "area", None):
-        return user.carrera.area.nombre
-    if getattr(user, "area", None):
-        return user.area.nombre
-    return "Sin Área"
+def _excel_admin(request, reporte: str, construir):
+    """Reporte del pack admin: mismo archivo para todos los admins (caché por versión de datos)."""
+    desde, hasta = _periodo_from_request(request)
+    return respuesta_reporte(reporte, _parametros_periodo(desde, hasta), "admin", lambda: construir(desde, hasta))
 
 
-def _carrera_name_from_user(user) -> str:
-    if getattr(user, "carrera", None):
-        return user.carrera.nombre
-    return "Sin Carrera"
+def _excel_personal(request, reporte: str, construir):
+    """Reporte personal: la caché se separa por usuario."""
+    desde, hasta = _periodo_from_request(request)
+    return respuesta_reporte(
+        reporte, _parametros_periodo(desde, hasta), f"u{request.user.pk}",
+        lambda: construir(request.user, desde, hasta),
+    )
 
 
 # ==============================================================================
@@ -241,7 +264,17 @@ def reportes_home(request):
         messages.error(request, "No tienes permisos para ver reportes.")
         return redirect("home")
 
-    return render(request, "reportes/reportes_home.html", {"year": _year_from_request(request)})
+    desde, hasta = _periodo_from_request(request)
+    year_completo = desde.year == hasta.year and _es_year_completo(desde, hasta)
+    return render(request, "reportes/reportes_home.html", {
+        "year": desde.year,
+        # Las fechas solo se muestran si el período no es un año completo
+        "desde": None if year_completo else desde,
+        "hasta": None if year_completo else hasta,
+        "periodo": _texto_periodo(desde, hasta),
+        "periodo_qs": _periodo_qs(desde, hasta),
+        "parquet_disponible": PARQUET_DISPONIBLE,
+    })
 
 
 # ==============================================================================
@@ -249,18 +282,10 @@ def reportes_home(request):
 # Filtran por solicitante=request.user, así siempre son "mis datos"
 # ==============================================================================
 
-@login_required
-def u1_mis_reservas_excel(request):
-    year = _year_from_request(request)
-
-    reservas = (
-        Reserva.objects.filter(solicitante=request.user, fecha__year=year)
-        .select_related("espacio", "solicitante", "solicitante__carrera", "solicitante__carrera__area", "solicitante__area")
-        .prefetch_related("recursos_asociados__recurso")
-        .order_by("-fecha", "-hora_inicio")
-    )
+def construir_u1(usuario, desde: date, hasta: date):
+    reservas = reservas_con_relaciones(Reserva.objects.filter(solicitante=usuario, fecha__range=(desde, hasta)))
 
-    total = reservas.count()
+    total = 0
     total_horas = 0.0
     total_rec = 0
     estado_counts = {k: 0 for k, _ in Reserva.ESTADOS}
@@ -268,54 +293,50 @@ def u1_mis_reservas_excel(request):
     detalle_rows = []
     for r in reservas:
         dur = _duration_hours(r.hora_inicio, r.hora_fin)
-        rec_total = _get_total_recursos_reserva(r)
+        rec_total = total_recursos(r)
 
+        total += 1
         total_horas += dur
         total_rec += rec_total
         estado_counts[r.estado] = estado_counts.get(r.estado, 0) + 1
 
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
-
         detalle_rows.append([
             r.id,
             r.fecha,                 # date real
             r.hora_inicio,           # time real
             r.hora_fin,              # time real
             dur,
-            area,
-            carrera,
-            r.espacio.nombre if r.espacio_id else "",
+            area_nombre(r.solicitante),
+            carrera_nombre(r.solicitante),
+            r.espacio.nombre,
             r.estado,
             rec_total,
-            _recursos_texto(r),
+            recursos_texto(r),
             r.motivo or "",
         ])
 
+    usuario = usuario_con_relaciones(usuario)
     resumen_rows = [
         ["Total reservas", total],
         ["Total horas", round(total_horas, 2)],
         ["Total recursos solicitados", int(total_rec)],
-        ["Área", _area_name_from_user(request.user)],
-        ["Carrera", _carrera_name_from_user(request.user)],
+        ["Área", area_nombre(usuario)],
+        ["Carrera", carrera_nombre(usuario)],
     ]
     for k, _label in Reserva.ESTADOS:
         resumen_rows.append([f"Reservas {k}", estado_counts.get(k, 0)])
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
+    wb = nuevo_libro()
+    escribir_tabla(
+        wb, "Resumen",
         title="U1) Mis Reservas (Resumen)",
-        subtitle=f"Año {year} | Usuario: {request.user.email}",
+        subtitle=f"{_texto_periodo(desde, hasta)} | Usuario: {usuario.email}",
         columns=["Indicador", "Valor"],
         rows=resumen_rows,
     )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
+    escribir_tabla(
+        wb, "Detalle",
         title="U1) Mis Reservas (Detalle pivot)",
         subtitle="Tabla plana para pivots",
         columns=[
@@ -326,17 +347,19 @@ def u1_mis_reservas_excel(request):
         rows=detalle_rows,
     )
 
-    return _excel_response(wb, f"U1_mis_reservas_{year}.xlsx")
+    return wb, f"U1_mis_reservas_{_sufijo_periodo(desde, hasta)}.xlsx"
 
 
 @login_required
-def u2_mis_recursos_excel(request):
-    year = _year_from_request(request)
+def u1_mis_reservas_excel(request):
+    return _excel_personal(request, "u1", construir_u1)
 
+
+def construir_u2(usuario, desde: date, hasta: date):
     qs = (
         RecursoReserva.objects.filter(
-            reserva__solicitante=request.user,
-            reserva__fecha__year=year,
+            reserva__solicitante=usuario,
+            reserva__fecha__range=(desde, hasta),
             reserva__estado__in=OK_STATES,
         )
         .values("recurso__nombre")
@@ -353,74 +376,76 @@ def u2_mis_recursos_excel(request):
 
     detalle_qs = (
         RecursoReserva.objects.filter(
-            reserva__solicitante=request.user,
-            reserva__fecha__year=year,
+            reserva__solicitante=usuario,
+            reserva__fecha__range=(desde, hasta),
             reserva__estado__in=OK_STATES,
         )
-        .select_related("recurso", "reserva", "reserva__espacio", "reserva__solicitante", "reserva__solicitante__carrera", "reserva__solicitante__carrera__area", "reserva__solicitante__area")
+        .annotate(area_nombre=_area_expr_recurso_reserva(), carrera_nombre=_carrera_expr_recurso_reserva())
+        .values(
+            "reserva_id", "reserva__fecha", "reserva__espacio__nombre", "area_nombre", "carrera_nombre",
+            "recurso__nombre", "cantidad", "reserva__estado",
+        )
         .order_by("-reserva__fecha", "-reserva__hora_inicio")
     )
 
-    detalle_rows = []
-    for rr in detalle_qs:
-        area = _area_name_from_user(rr.reserva.solicitante)
-        carrera = _carrera_name_from_user(rr.reserva.solicitante)
-
-        detalle_rows.append([
-            rr.reserva.id,
-            rr.reserva.fecha,
-            rr.reserva.espacio.nombre if rr.reserva.espacio_id else "",
-            area,
-            carrera,
-            rr.recurso.nombre,
-            int(rr.cantidad or 0),
-            rr.reserva.estado,
-        ])
+    detalle_rows = [
+        [
+            d["reserva_id"],
+            d["reserva__fecha"],
+            d["reserva__espacio__nombre"],
+            d["area_nombre"],
+            d["carrera_nombre"],
+            d["recurso__nombre"],
+            int(d["cantidad"] or 0),
+            d["reserva__estado"],
+        ]
+        for d in detalle_qs
+    ]
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
+    wb = nuevo_libro()
+    escribir_tabla(
+        wb, "Resumen",
         title="U2) Mis Recursos Solicitados (Resumen)",
-        subtitle=f"Año {year} | Estados considerados: {', '.join(OK_STATES)}",
+        subtitle=f"{_texto_periodo(desde, hasta)} | Estados considerados: {', '.join(OK_STATES)}",
         columns=["Recurso", "Cantidad total", "N° reservas", "% del total"],
         rows=resumen_rows,
     )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
+    escribir_tabla(
+        wb, "Detalle",
         title="U2) Mis Recursos (Detalle pivot)",
         subtitle="Tabla plana para pivots",
         columns=["ID Reserva", "Fecha", "Espacio", "Área", "Carrera", "Recurso", "Cantidad", "Estado"],
         rows=detalle_rows,
     )
 
-    return _excel_response(wb, f"U2_mis_recursos_{year}.xlsx")
+    return wb, f"U2_mis_recursos_{_sufijo_periodo(desde, hasta)}.xlsx"
 
 
 @login_required
-def u3_mis_espacios_excel(request):
-    year = _year_from_request(request)
+def u2_mis_recursos_excel(request):
+    return _excel_personal(request, "u2", construir_u2)
+
 
+def construir_u3(usuario, desde: date, hasta: date):
     reservas = (
         Reserva.objects.filter(
-            solicitante=request.user,
-            fecha__year=year,
+            solicitante=usuario,
+            fecha__range=(desde, hasta),
             estado__in=OK_STATES,
         )
-        .select_related("espacio", "solicitante", "solicitante__carrera", "solicitante__carrera__area", "solicitante__area")
+        .select_related("espacio")
         .prefetch_related("recursos_asociados")
         .order_by("-fecha", "-hora_inicio")
     )
 
-    total = reservas.count()
+    total = 0
     stats = {}
     detalle_rows = []
 
     for r in reservas:
-        espacio = r.espacio.nombre if r.espacio_id else "Sin espacio"
+        total += 1
+        espacio = r.espacio.nombre
         dur = _duration_hours(r.hora_inicio, r.hora_fin)
         d = stats.setdefault(espacio, {"reservas": 0, "horas": 0.0})
         d["reservas"] += 1
@@ -433,7 +458,7 @@ def u3_mis_espacios_excel(request):
             r.hora_fin,
             dur,
             espacio,
-            _get_total_recursos_reserva(r),
+            total_recursos(r),
         ])
 
     resumen_rows = []
@@ -444,637 +469,751 @@ def u3_mis_espacios_excel(request):
         prom = round(horas / reservas_n, 2) if reservas_n else 0
         resumen_rows.append([espacio, reservas_n, pct, horas, prom])
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
+    wb = nuevo_libro()
+    escribir_tabla(
+        wb, "Resumen",
         title="U3) Mis Espacios más usados (Resumen)",
-        subtitle=f"Año {year} | Estados considerados: {', '.join(OK_STATES)}",
+        subtitle=f"{_texto_periodo(desde, hasta)} | Estados considerados: {', '.join(OK_STATES)}",
         columns=["Espacio", "N° reservas", "% del total", "Total horas", "Prom. horas/reserva"],
         rows=resumen_rows,
     )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
+    escribir_tabla(
+        wb, "Detalle",
         title="U3) Mis Espacios (Detalle pivot)",
         subtitle="Tabla plana para pivots",
         columns=["ID Reserva", "Fecha", "Hora inicio", "Hora fin", "Duración(h)", "Espacio", "Total recursos"],
         rows=detalle_rows,
     )
 
-    return _excel_response(wb, f"U3_mis_espacios_{year}.xlsx")
+    return wb, f"U3_mis_espacios_{_sufijo_periodo(desde, hasta)}.xlsx"
+
+
+@login_required
+def u3_mis_espacios_excel(request):
+    return _excel_personal(request, "u3", construir_u3)
 
 
 # ==============================================================================
 # ADMIN PACK 8 (2 hojas)
 # ==============================================================================
-
-@admin_required
-def r1_recursos_global_excel(request):
-    year = _year_from_request(request)
-
-    qs = (
-        RecursoReserva.objects.filter(
-            reserva__fecha__year=year,
-            reserva__estado__in=OK_STATES,
-        )
-        .values("recurso__nombre")
-        .annotate(cantidad_total=Sum("cantidad"), reservas=Count("reserva", distinct=True))
-        .order_by("-cantidad_total", "recurso__nombre")
+#
+# Cada reporte rN se arma con piezas que comparte con el pack completo
+# (construir_pack), así ambos dan exactamente los mismos números:
+# - HOJAS_ADMIN[rN]: título y columnas de sus hojas Resumen / Detalle
+# - _resumen_rN(datos): filas del Resumen desde datos agregados (dicts)
+# - _detalle_rN(d): fila del Detalle desde una fila dict (ver _detalle_reservas)
+
+ESTADOS_ORDEN = [k for k, _ in Reserva.ESTADOS]
+
+HOJAS_ADMIN = {
+    "r1": (
+        ("R1) Recursos más solicitados (Global)", ["Recurso", "Cantidad total", "N° reservas", "% del total"]),
+        ("R1) Recursos (Detalle pivot)", ["ID Reserva", "Fecha", "Hora inicio", "Hora fin", "Espacio", "Solicitante", "Área", "Carrera", "Recurso", "Cantidad", "Estado"]),
+    ),
+    "r2": (
+        ("R2) Recursos más solicitados por Área", ["Área", "Carrera", "Recurso", "Cantidad total", "N° reservas", "% dentro del Área"]),
+        ("R2) Recursos por Área (Detalle pivot)", ["Área", "Carrera", "ID Reserva", "Fecha", "Espacio", "Solicitante", "Recurso", "Cantidad", "Estado"]),
+    ),
+    "r3": (
+        ("R3) Espacios más usados (Global)", ["Espacio", "N° reservas", "% del total", "Total horas", "Prom. horas/reserva"]),
+        ("R3) Reservas por espacio (Detalle pivot)", ["ID", "Fecha", "Hora inicio", "Hora fin", "Duración(h)", "Espacio", "Solicitante", "Área", "Carrera", "Estado", "Total recursos"]),
+    ),
+    "r4": (
+        ("R4) Espacios más usados por Área", ["Área", "Espacio", "N° reservas", "% dentro del Área", "Total horas", "Prom. horas/reserva"]),
+        ("R4) Área/Espacio (Detalle pivot)", ["Área", "Carrera", "ID", "Fecha", "Espacio", "Hora inicio", "Hora fin", "Duración(h)", "Solicitante", "Estado", "Total recursos"]),
+    ),
+    "r5": (
+        ("R5) Uso por Área (ranking + %)", ["Área", "N° reservas", "% del total", "Total horas", "Prom. horas/reserva", "Total recursos solicitados"]),
+        ("R5) Reservas por Área (Detalle pivot)", ["ID", "Fecha", "Área", "Carrera", "Espacio", "Hora inicio", "Hora fin", "Duración(h)", "Solicitante", "Estado", "Total recursos"]),
+    ),
+    "r6": (
+        # Las columnas de meses salen del período (ver _columnas_resumen)
+        ("R6) Tendencia mensual por Área (N° reservas)", ["Área"] + MESES + ["Total"]),
+        ("R6) Área/Mes (Detalle pivot)", ["Área", "Carrera", "Mes", "ID", "Fecha", "Espacio", "Hora inicio", "Hora fin", "Duración(h)", "Total recursos", "Solicitante"]),
+    ),
+    "r7": (
+        ("R7) Estados por Área (% aprobación)", ["Área", "Total"] + ESTADOS_ORDEN + ["% aprobación (sobre total)"]),
+        ("R7) Reservas por Área/Estado (Detalle pivot)", ["ID", "Fecha", "Hora inicio", "Hora fin", "Espacio", "Solicitante", "Área", "Carrera", "Estado"]),
+    ),
+    "r8": (
+        ("R8) Auditoría - Resumen por Área", ["Área", "Total"] + ESTADOS_ORDEN + ["% aprobación", "Total horas", "Total recursos (cant.)"]),
+        ("R8) Auditoría - Detalle pivot", [
+            "ID", "Fecha", "Hora inicio", "Hora fin", "Duración (h)", "Estado", "Espacio", "Solicitante",
+            "Área", "Carrera", "Total recursos", "Detalle recursos", "Motivo/Actividad", "Fecha solicitud",
+        ]),
+    ),
+}
+
+# R7 y R8 incluyen todos los estados; el resto solo OK_STATES
+TODOS_LOS_ESTADOS = {"r7", "r8"}
+
+
+def _subtitulo_admin(reporte: str, desde: date, hasta: date) -> str:
+    if reporte in TODOS_LOS_ESTADOS:
+        return f"{_texto_periodo(desde, hasta)} | Incluye TODOS los estados"
+    return f"{_texto_periodo(desde, hasta)} | Estados: {', '.join(OK_STATES)}"
+
+
+def _columnas_resumen(reporte: str, desde: date, hasta: date) -> list:
+    (_titulo, columnas), _detalle = HOJAS_ADMIN[reporte]
+    if reporte == "r6":
+        # Una columna por mes del período (con el año si abarca más de uno)
+        con_year = desde.year != hasta.year
+        return ["Área"] + [_etiqueta_mes(m, con_year) for m in _meses_periodo(desde, hasta)] + ["Total"]
+    return columnas
+
+
+def _abrir_hojas_admin(wb, reporte: str, desde: date, hasta: date, prefijo: str = ""):
+    """(Resumen, Detalle) del reporte como TablaEnStreaming, en ese orden dentro del libro."""
+    (t_resumen, _columnas), (t_detalle, c_detalle) = HOJAS_ADMIN[reporte]
+    resumen = TablaEnStreaming(
+        wb, f"{prefijo}Resumen", t_resumen, _subtitulo_admin(reporte, desde, hasta),
+        _columnas_resumen(reporte, desde, hasta),
     )
+    detalle = TablaEnStreaming(wb, f"{prefijo}Detalle", t_detalle, "Tabla plana (ideal para pivots)", c_detalle)
+    return resumen, detalle
 
-    total = sum(int(x["cantidad_total"] or 0) for x in qs) or 0
-    resumen_rows = []
-    for x in qs:
-        cant = int(x["cantidad_total"] or 0)
-        pct = round((cant / total) * 100, 2) if total else 0
-        resumen_rows.append([x["recurso__nombre"], cant, int(x["reservas"] or 0), pct])
 
-    detalle_qs = (
-        RecursoReserva.objects.filter(
-            reserva__fecha__year=year,
-            reserva__estado__in=OK_STATES,
-        )
-        .annotate(area=_area_expr_recurso_reserva())
-        .annotate(carrera=_carrera_expr_recurso_reserva())
-        .select_related("recurso", "reserva", "reserva__espacio", "reserva__solicitante")
-        .order_by("-reserva__fecha", "-reserva__hora_inicio")
-    )
+def _libro_admin(reporte: str, desde: date, hasta: date, resumen_rows, detalle_rows):
+    wb = nuevo_libro()
+    resumen, detalle = _abrir_hojas_admin(wb, reporte, desde, hasta)
+    for fila in resumen_rows:
+        resumen.agregar(fila)
+    resumen.cerrar()
+    for fila in detalle_rows:
+        detalle.agregar(fila)
+    detalle.cerrar()
+    return wb
 
-    detalle_rows = []
-    for rr in detalle_qs:
-        detalle_rows.append([
-            rr.reserva.id,
-            rr.reserva.fecha,
-            rr.reserva.hora_inicio,
-            rr.reserva.hora_fin,
-            rr.reserva.espacio.nombre if rr.reserva.espacio_id else "",
-            rr.reserva.solicitante.get_full_name() or rr.reserva.solicitante.email,
-            rr.area,
-            rr.carrera,
-            rr.recurso.nombre,
-            int(rr.cantidad or 0),
-            rr.reserva.estado,
-        ])
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R1) Recursos más solicitados (Global)",
-        subtitle=f"Año {year} | Estados: {', '.join(OK_STATES)}",
-        columns=["Recurso", "Cantidad total", "N° reservas", "% del total"],
-        rows=resumen_rows,
-    )
+def _pct(parte, total) -> float:
+    return round((parte / total) * 100, 2) if total else 0
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R1) Recursos (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["ID Reserva", "Fecha", "Hora inicio", "Hora fin", "Espacio", "Solicitante", "Área", "Carrera", "Recurso", "Cantidad", "Estado"],
-        rows=detalle_rows,
-    )
 
-    return _excel_response(wb, f"R1_recursos_global_{year}.xlsx")
+# -----------------------------
+# Resumen (datos agregados -> filas)
+# -----------------------------
 
+def _resumen_r1(datos) -> list:
+    """datos: {recurso__nombre, cantidad_total, reservas}"""
+    datos = sorted(datos, key=lambda x: (-int(x["cantidad_total"] or 0), x["recurso__nombre"]))
+    total = sum(int(x["cantidad_total"] or 0) for x in datos)
+    return [
+        [x["recurso__nombre"], int(x["cantidad_total"] or 0), int(x["reservas"] or 0), _pct(int(x["cantidad_total"] or 0), total)]
+        for x in datos
+    ]
 
-@admin_required
-def r2_recursos_por_area_excel(request):
-    year = _year_from_request(request)
-
-    qs = (
-        RecursoReserva.objects.filter(
-            reserva__fecha__year=year,
-            reserva__estado__in=OK_STATES,
-        )
-        .annotate(area=_area_expr_recurso_reserva())
-        .annotate(carrera=_carrera_expr_recurso_reserva())
-        .values("area", "carrera", "recurso__nombre")
-        .annotate(cantidad_total=Sum("cantidad"), reservas=Count("reserva", distinct=True))
-        .order_by("area", "carrera", "-cantidad_total", "recurso__nombre")
-    )
 
+def _resumen_r2(datos) -> list:
+    """datos: {area_nombre, carrera_nombre, recurso__nombre, cantidad_total, reservas}"""
+    datos = sorted(datos, key=lambda x: (x["area_nombre"], x["carrera_nombre"], -int(x["cantidad_total"] or 0), x["recurso__nombre"]))
     tot_area = {}
-    for x in qs:
-        tot_area[x["area"]] = tot_area.get(x["area"], 0) + int(x["cantidad_total"] or 0)
+    for x in datos:
+        tot_area[x["area_nombre"]] = tot_area.get(x["area_nombre"], 0) + int(x["cantidad_total"] or 0)
 
-    resumen_rows = []
-    for x in qs:
-        area = x["area"]
+    filas = []
+    for x in datos:
         cant = int(x["cantidad_total"] or 0)
-        pct = round((cant / tot_area[area]) * 100, 2) if tot_area.get(area) else 0
-        resumen_rows.append([area, x["carrera"], x["recurso__nombre"], cant, int(x["reservas"] or 0), pct])
+        filas.append([
+            x["area_nombre"], x["carrera_nombre"], x["recurso__nombre"],
+            cant, int(x["reservas"] or 0), _pct(cant, tot_area.get(x["area_nombre"])),
+        ])
+    return filas
 
-    detalle_qs = (
-        RecursoReserva.objects.filter(
-            reserva__fecha__year=year,
-            reserva__estado__in=OK_STATES,
-        )
-        .annotate(area=_area_expr_recurso_reserva())
-        .annotate(carrera=_carrera_expr_recurso_reserva())
-        .select_related("recurso", "reserva", "reserva__espacio", "reserva__solicitante")
-        .order_by("area", "carrera", "-reserva__fecha", "-reserva__hora_inicio")
-    )
 
-    detalle_rows = []
-    for rr in detalle_qs:
-        detalle_rows.append([
-            rr.area,
-            rr.carrera,
-            rr.reserva.id,
-            rr.reserva.fecha,
-            rr.reserva.espacio.nombre if rr.reserva.espacio_id else "",
-            rr.reserva.solicitante.get_full_name() or rr.reserva.solicitante.email,
-            rr.recurso.nombre,
-            int(rr.cantidad or 0),
-            rr.reserva.estado,
-        ])
+def _resumen_r3(datos) -> list:
+    """datos: {espacio__nombre, reservas, minutos}"""
+    total_reservas = sum(int(x["reservas"] or 0) for x in datos)
+    filas = []
+    for d in sorted(datos, key=lambda x: (-x["reservas"], x["espacio__nombre"])):
+        reservas_n = int(d["reservas"] or 0)
+        horas = _horas(d["minutos"])
+        prom = round(horas / reservas_n, 2) if reservas_n else 0
+        filas.append([d["espacio__nombre"], reservas_n, _pct(reservas_n, total_reservas), horas, prom])
+    return filas
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R2) Recursos más solicitados por Área",
-        subtitle=f"Año {year} | Estados: {', '.join(OK_STATES)}",
-        columns=["Área", "Carrera", "Recurso", "Cantidad total", "N° reservas", "% dentro del Área"],
-        rows=resumen_rows,
-    )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R2) Recursos por Área (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["Área", "Carrera", "ID Reserva", "Fecha", "Espacio", "Solicitante", "Recurso", "Cantidad", "Estado"],
-        rows=detalle_rows,
-    )
+def _resumen_r4(datos) -> list:
+    """datos: {area_nombre, espacio__nombre, reservas, minutos}"""
+    total_por_area = {}
+    for d in datos:
+        total_por_area[d["area_nombre"]] = total_por_area.get(d["area_nombre"], 0) + int(d["reservas"] or 0)
+
+    filas = []
+    for d in sorted(datos, key=lambda x: (x["area_nombre"], -x["reservas"], x["espacio__nombre"])):
+        area = d["area_nombre"]
+        reservas_n = int(d["reservas"] or 0)
+        horas = _horas(d["minutos"])
+        prom = round(horas / reservas_n, 2) if reservas_n else 0
+        filas.append([area, d["espacio__nombre"], reservas_n, _pct(reservas_n, total_por_area.get(area)), horas, prom])
+    return filas
 
-    return _excel_response(wb, f"R2_recursos_por_area_{year}.xlsx")
 
+def _resumen_r5(datos) -> list:
+    """datos: {area_nombre, reservas, minutos, recursos}"""
+    total_reservas = sum(int(x["reservas"] or 0) for x in datos)
+    filas = []
+    for d in sorted(datos, key=lambda x: (-x["reservas"], x["area_nombre"])):
+        reservas_n = int(d["reservas"] or 0)
+        horas = _horas(d["minutos"])
+        prom = round(horas / reservas_n, 2) if reservas_n else 0
+        filas.append([d["area_nombre"], reservas_n, _pct(reservas_n, total_reservas), horas, prom, int(d["recursos"] or 0)])
+    return filas
 
-@admin_required
-def r3_espacios_global_excel(request):
-    year = _year_from_request(request)
 
-    reservas = (
-        Reserva.objects.filter(fecha__year=year, estado__in=OK_STATES)
-        .select_related("espacio", "solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area")
-        .prefetch_related("recursos_asociados")
-        .order_by("-fecha", "-hora_inicio")
-    )
+def _resumen_r6(datos, meses) -> list:
+    """datos: {area_nombre, mes (primer día del mes), reservas}; meses: _meses_periodo()"""
+    columna = {mes: i for i, mes in enumerate(meses)}
+    reservas_mes = {}
+    for x in datos:
+        reservas_mes.setdefault(x["area_nombre"], [0] * len(meses))[columna[x["mes"]]] += int(x["reservas"] or 0)
+    return [[area] + reservas_mes[area] + [sum(reservas_mes[area])] for area in sorted(reservas_mes)]
 
-    total_reservas = reservas.count()
-    space_stats = {}
-    detalle_rows = []
 
-    for r in reservas:
-        espacio = r.espacio.nombre if r.espacio_id else "Sin espacio"
-        dur = _duration_hours(r.hora_inicio, r.hora_fin)
-        space = space_stats.setdefault(espacio, {"reservas": 0, "horas": 0.0})
-        space["reservas"] += 1
-        space["horas"] += dur
+def _resumen_r7(datos) -> list:
+    """datos: {area_nombre, estado, reservas}"""
+    data = {}
+    for x in datos:
+        data.setdefault(x["area_nombre"], {})[x["estado"]] = int(x["reservas"] or 0)
+
+    filas = []
+    for area in sorted(data):
+        total = sum(data[area].get(e, 0) for e in ESTADOS_ORDEN)
+        pct_aprob = _pct(data[area].get("APROBADA", 0), total)
+        filas.append([area, total] + [data[area].get(e, 0) for e in ESTADOS_ORDEN] + [pct_aprob])
+    return filas
+
+
+def _resumen_r8(datos) -> list:
+    """datos: {area_nombre, estado, reservas, minutos, recursos}"""
+    area_counts, area_minutos, area_tot, recursos_map = {}, {}, {}, {}
+    for x in datos:
+        area = x["area_nombre"]
+        area_tot[area] = area_tot.get(area, 0) + int(x["reservas"] or 0)
+        area_minutos[area] = area_minutos.get(area, 0) + int(x["minutos"] or 0)
+        recursos_map[area] = recursos_map.get(area, 0) + int(x["recursos"] or 0)
+        area_counts.setdefault(area, {})[x["estado"]] = int(x["reservas"] or 0)
+
+    filas = []
+    for area in sorted(area_tot):
+        total_area = area_tot[area]
+        pct_aprob = _pct(area_counts.get(area, {}).get("APROBADA", 0), total_area)
+        fila_estados = [area_counts.get(area, {}).get(e, 0) for e in ESTADOS_ORDEN]
+        filas.append([area, total_area, *fila_estados, pct_aprob, _horas(area_minutos[area]), recursos_map[area]])
+    return filas
 
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
 
-        detalle_rows.append([
-            r.id,
-            r.fecha,
-            r.hora_inicio,
-            r.hora_fin,
-            dur,
-            espacio,
-            r.solicitante.get_full_name() or r.solicitante.email,
-            area,
-            carrera,
-            r.estado,
-            _get_total_recursos_reserva(r),
-        ])
+# -----------------------------
+# Detalle (fila dict -> fila Excel)
+# -----------------------------
 
-    resumen_rows = []
-    for espacio, d in sorted(space_stats.items(), key=lambda x: (-x[1]["reservas"], x[0])):
-        reservas_n = d["reservas"]
-        horas = round(d["horas"], 2)
-        pct = round((reservas_n / total_reservas) * 100, 2) if total_reservas else 0
-        prom = round(horas / reservas_n, 2) if reservas_n else 0
-        resumen_rows.append([espacio, reservas_n, pct, horas, prom])
+def _detalle_r1(d) -> list:
+    return [
+        d["reserva_id"], d["reserva__fecha"], d["reserva__hora_inicio"], d["reserva__hora_fin"],
+        d["reserva__espacio__nombre"], d["solicitante_nombre"], d["area_nombre"], d["carrera_nombre"],
+        d["recurso__nombre"], int(d["cantidad"] or 0), d["reserva__estado"],
+    ]
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R3) Espacios más usados (Global)",
-        subtitle=f"Año {year} | Estados: {', '.join(OK_STATES)}",
-        columns=["Espacio", "N° reservas", "% del total", "Total horas", "Prom. horas/reserva"],
-        rows=resumen_rows,
-    )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R3) Reservas por espacio (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["ID", "Fecha", "Hora inicio", "Hora fin", "Duración(h)", "Espacio", "Solicitante", "Área", "Carrera", "Estado", "Total recursos"],
-        rows=detalle_rows,
-    )
+def _detalle_r2(d) -> list:
+    return [
+        d["area_nombre"], d["carrera_nombre"], d["reserva_id"], d["reserva__fecha"],
+        d["reserva__espacio__nombre"], d["solicitante_nombre"], d["recurso__nombre"],
+        int(d["cantidad"] or 0), d["reserva__estado"],
+    ]
 
-    return _excel_response(wb, f"R3_espacios_global_{year}.xlsx")
 
+def _detalle_r3(d) -> list:
+    return [
+        d["id"], d["fecha"], d["hora_inicio"], d["hora_fin"], _horas_duracion(d["duracion"]),
+        d["espacio__nombre"], d["solicitante_nombre"], d["area_nombre"], d["carrera_nombre"],
+        d["estado"], d["total_recursos"],
+    ]
 
-@admin_required
-def r4_espacios_por_area_excel(request):
-    year = _year_from_request(request)
 
-    reservas = (
-        Reserva.objects.filter(fecha__year=year, estado__in=OK_STATES)
-        .select_related("espacio", "solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area")
-        .prefetch_related("recursos_asociados")
-        .order_by("-fecha", "-hora_inicio")
-    )
+def _detalle_r4(d) -> list:
+    return [
+        d["area_nombre"], d["carrera_nombre"], d["id"], d["fecha"], d["espacio__nombre"],
+        d["hora_inicio"], d["hora_fin"], _horas_duracion(d["duracion"]), d["solicitante_nombre"],
+        d["estado"], d["total_recursos"],
+    ]
 
-    area_space = {}
-    total_por_area = {}
-    detalle_rows = []
 
-    for r in reservas:
-        espacio = r.espacio.nombre if r.espacio_id else "Sin espacio"
-        dur = _duration_hours(r.hora_inicio, r.hora_fin)
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
+def _detalle_r5(d) -> list:
+    return [
+        d["id"], d["fecha"], d["area_nombre"], d["carrera_nombre"], d["espacio__nombre"],
+        d["hora_inicio"], d["hora_fin"], _horas_duracion(d["duracion"]), d["solicitante_nombre"],
+        d["estado"], d["total_recursos"],
+    ]
 
-        key = (area, espacio)
-        d = area_space.setdefault(key, {"reservas": 0, "horas": 0.0})
-        d["reservas"] += 1
-        d["horas"] += dur
-        total_por_area[area] = total_por_area.get(area, 0) + 1
 
-        detalle_rows.append([
-            area,
-            carrera,
-            r.id,
-            r.fecha,
-            espacio,
-            r.hora_inicio,
-            r.hora_fin,
-            dur,
-            r.solicitante.get_full_name() or r.solicitante.email,
-            r.estado,
-            _get_total_recursos_reserva(r),
-        ])
+def _detalle_r6(d, con_year: bool = False) -> list:
+    return [
+        d["area_nombre"], d["carrera_nombre"], _etiqueta_mes(d["fecha"], con_year), d["id"], d["fecha"],
+        d["espacio__nombre"], d["hora_inicio"], d["hora_fin"], _horas_duracion(d["duracion"]),
+        d["total_recursos"], d["solicitante_nombre"],
+    ]
 
-    resumen_rows = []
-    for (area, espacio), d in sorted(area_space.items(), key=lambda x: (x[0][0], -x[1]["reservas"], x[0][1])):
-        reservas_n = d["reservas"]
-        horas = round(d["horas"], 2)
-        pct = round((reservas_n / total_por_area.get(area, 1)) * 100, 2) if total_por_area.get(area) else 0
-        prom = round(horas / reservas_n, 2) if reservas_n else 0
-        resumen_rows.append([area, espacio, reservas_n, pct, horas, prom])
-
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R4) Espacios más usados por Área",
-        subtitle=f"Año {year} | Estados: {', '.join(OK_STATES)}",
-        columns=["Área", "Espacio", "N° reservas", "% dentro del Área", "Total horas", "Prom. horas/reserva"],
-        rows=resumen_rows,
-    )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R4) Área/Espacio (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["Área", "Carrera", "ID", "Fecha", "Espacio", "Hora inicio", "Hora fin", "Duración(h)", "Solicitante", "Estado", "Total recursos"],
-        rows=detalle_rows,
+def _detalle_r7(d) -> list:
+    return [
+        d["id"], d["fecha"], d["hora_inicio"], d["hora_fin"], d["espacio__nombre"],
+        d["solicitante_nombre"], d["area_nombre"], d["carrera_nombre"], d["estado"],
+    ]
+
+
+def _detalle_r8(d) -> list:
+    return [
+        d["id"], d["fecha"], d["hora_inicio"], d["hora_fin"], _horas_duracion(d["duracion"]),
+        d["estado"], d["espacio__nombre"], d["solicitante_nombre"], d["area_nombre"], d["carrera_nombre"],
+        d["total_recursos"], d["recursos_texto"], d["motivo"] or "", d["fecha_solicitud"],
+    ]
+
+
+# -----------------------------
+# Consultas de cada reporte
+# -----------------------------
+
+def _detalle_recursos(qs, *orden):
+    """Filas (dict) de RecursoReserva para R1/R2, calculadas en la BD y leídas por lotes."""
+    return (
+        qs.annotate(
+            area_nombre=_area_expr_recurso_reserva(),
+            carrera_nombre=_carrera_expr_recurso_reserva(),
+            solicitante_nombre=_solicitante_expr_recurso_reserva(),
+        )
+        .values(
+            "reserva_id", "reserva__fecha", "reserva__hora_inicio", "reserva__hora_fin", "reserva__estado",
+            "reserva__espacio__nombre", "recurso__nombre", "cantidad",
+            "area_nombre", "carrera_nombre", "solicitante_nombre",
+        )
+        .order_by(*orden)
+        .iterator(chunk_size=CHUNK_DETALLE)
     )
 
-    return _excel_response(wb, f"R4_espacios_por_area_{year}.xlsx")
 
+def _recursos_ok(desde: date, hasta: date):
+    return RecursoReserva.objects.filter(reserva__fecha__range=(desde, hasta), reserva__estado__in=OK_STATES)
 
-@admin_required
-def r5_uso_por_area_excel(request):
-    year = _year_from_request(request)
 
-    reservas = (
-        Reserva.objects.filter(fecha__year=year, estado__in=OK_STATES)
-        .select_related("espacio", "solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area")
-        .prefetch_related("recursos_asociados")
+def construir_r1(desde: date, hasta: date):
+    datos = (
+        _recursos_ok(desde, hasta)
+        .values("recurso__nombre")
+        .annotate(cantidad_total=Sum("cantidad"), reservas=Count("reserva", distinct=True))
     )
+    detalle = _detalle_recursos(_recursos_ok(desde, hasta), "-reserva__fecha", "-reserva__hora_inicio")
+    wb = _libro_admin("r1", desde, hasta, _resumen_r1(datos), map(_detalle_r1, detalle))
+    return wb, f"R1_recursos_global_{_sufijo_periodo(desde, hasta)}.xlsx"
 
-    total_reservas = reservas.count()
 
-    recursos_por_area = (
-        RecursoReserva.objects.filter(reserva__fecha__year=year, reserva__estado__in=OK_STATES)
-        .annotate(area=_area_expr_recurso_reserva())
-        .values("area")
-        .annotate(total_recursos=Sum("cantidad"))
+def construir_r2(desde: date, hasta: date):
+    datos = (
+        _recursos_ok(desde, hasta)
+        .annotate(area_nombre=_area_expr_recurso_reserva(), carrera_nombre=_carrera_expr_recurso_reserva())
+        .values("area_nombre", "carrera_nombre", "recurso__nombre")
+        .annotate(cantidad_total=Sum("cantidad"), reservas=Count("reserva", distinct=True))
+    )
+    detalle = _detalle_recursos(
+        _recursos_ok(desde, hasta), "area_nombre", "carrera_nombre", "-reserva__fecha", "-reserva__hora_inicio",
     )
-    recursos_map = {x["area"]: int(x["total_recursos"] or 0) for x in recursos_por_area}
+    wb = _libro_admin("r2", desde, hasta, _resumen_r2(datos), map(_detalle_r2, detalle))
+    return wb, f"R2_recursos_por_area_{_sufijo_periodo(desde, hasta)}.xlsx"
 
-    area_stats = {}
-    detalle_rows = []
 
-    for r in reservas:
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
-        dur = _duration_hours(r.hora_inicio, r.hora_fin)
+def _reservas_periodo(desde: date, hasta: date):
+    return Reserva.objects.filter(fecha__range=(desde, hasta))
 
-        d = area_stats.setdefault(area, {"reservas": 0, "horas": 0.0})
-        d["reservas"] += 1
-        d["horas"] += dur
 
-        detalle_rows.append([
-            r.id,
-            r.fecha,
-            area,
-            carrera,
-            r.espacio.nombre if r.espacio_id else "",
-            r.hora_inicio,
-            r.hora_fin,
-            dur,
-            r.solicitante.get_full_name() or r.solicitante.email,
-            r.estado,
-            _get_total_recursos_reserva(r),
-        ])
+def _reservas_ok(desde: date, hasta: date):
+    return _reservas_periodo(desde, hasta).filter(estado__in=OK_STATES)
 
-    resumen_rows = []
-    for area, d in sorted(area_stats.items(), key=lambda x: (-x[1]["reservas"], x[0])):
-        reservas_n = d["reservas"]
-        horas = round(d["horas"], 2)
-        pct = round((reservas_n / total_reservas) * 100, 2) if total_reservas else 0
-        prom = round(horas / reservas_n, 2) if reservas_n else 0
-        total_rec = recursos_map.get(area, 0)
-        resumen_rows.append([area, reservas_n, pct, horas, prom, total_rec])
-
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R5) Uso por Área (ranking + %)",
-        subtitle=f"Año {year} | Estados: {', '.join(OK_STATES)}",
-        columns=["Área", "N° reservas", "% del total", "Total horas", "Prom. horas/reserva", "Total recursos solicitados"],
-        rows=resumen_rows,
-    )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R5) Reservas por Área (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["ID", "Fecha", "Área", "Carrera", "Espacio", "Hora inicio", "Hora fin", "Duración(h)", "Solicitante", "Estado", "Total recursos"],
-        rows=detalle_rows,
+def construir_r3(desde: date, hasta: date):
+    # Resumen: desde la tabla de hechos (una fila por espacio)
+    datos = list(
+        _resumen_qs(desde, hasta, OK_STATES)
+        .values("espacio__nombre")
+        .annotate(reservas=Sum("reservas"), minutos=Sum("minutos"))
+    )
+    detalle = _detalle_reservas(_reservas_ok(desde, hasta))
+    wb = _libro_admin("r3", desde, hasta, _resumen_r3(datos), map(_detalle_r3, detalle))
+    return wb, f"R3_espacios_global_{_sufijo_periodo(desde, hasta)}.xlsx"
+
+
+def construir_r4(desde: date, hasta: date):
+    # Resumen: desde la tabla de hechos (una fila por área/espacio)
+    datos = list(
+        _resumen_qs(desde, hasta, OK_STATES)
+        .annotate(area_nombre=_area_expr_resumen())
+        .values("area_nombre", "espacio__nombre")
+        .annotate(reservas=Sum("reservas"), minutos=Sum("minutos"))
+    )
+    detalle = _detalle_reservas(_reservas_ok(desde, hasta))
+    wb = _libro_admin("r4", desde, hasta, _resumen_r4(datos), map(_detalle_r4, detalle))
+    return wb, f"R4_espacios_por_area_{_sufijo_periodo(desde, hasta)}.xlsx"
+
+
+def construir_r5(desde: date, hasta: date):
+    # Resumen: desde la tabla de hechos (una fila por área, con horas y recursos)
+    datos = list(
+        _resumen_qs(desde, hasta, OK_STATES)
+        .annotate(area_nombre=_area_expr_resumen())
+        .values("area_nombre")
+        .annotate(reservas=Sum("reservas"), minutos=Sum("minutos"), recursos=Sum("recursos"))
+    )
+    detalle = _detalle_reservas(_reservas_ok(desde, hasta))
+    wb = _libro_admin("r5", desde, hasta, _resumen_r5(datos), map(_detalle_r5, detalle))
+    return wb, f"R5_uso_por_area_{_sufijo_periodo(desde, hasta)}.xlsx"
+
+
+def construir_r6(desde: date, hasta: date):
+    # Resumen: desde la tabla de hechos (área x mes del período)
+    datos = (
+        _resumen_qs(desde, hasta, OK_STATES)
+        .annotate(area_nombre=_area_expr_resumen(), mes=TruncMonth("fecha"))
+        .values("area_nombre", "mes")
+        .annotate(reservas=Sum("reservas"))
+    )
+    con_year = desde.year != hasta.year
+    detalle = (_detalle_r6(d, con_year) for d in _detalle_reservas(_reservas_ok(desde, hasta)))
+    wb = _libro_admin("r6", desde, hasta, _resumen_r6(datos, _meses_periodo(desde, hasta)), detalle)
+    return wb, f"R6_tendencia_mensual_por_area_{_sufijo_periodo(desde, hasta)}.xlsx"
+
+
+def construir_r7(desde: date, hasta: date):
+    # Resumen: desde la tabla de hechos (área x estado, todos los estados)
+    datos = (
+        _resumen_qs(desde, hasta)
+        .annotate(area_nombre=_area_expr_resumen())
+        .values("area_nombre", "estado")
+        .annotate(reservas=Sum("reservas"))
+    )
+    detalle = _detalle_reservas(_reservas_periodo(desde, hasta))
+    wb = _libro_admin("r7", desde, hasta, _resumen_r7(datos), map(_detalle_r7, detalle))
+    return wb, f"R7_estados_por_area_{_sufijo_periodo(desde, hasta)}.xlsx"
+
+
+def construir_r8(desde: date, hasta: date):
+    # Resumen: desde la tabla de hechos (área x estado, con minutos y recursos)
+    datos = (
+        _resumen_qs(desde, hasta)
+        .annotate(area_nombre=_area_expr_resumen())
+        .values("area_nombre", "estado")
+        .annotate(reservas=Sum("reservas"), minutos=Sum("minutos"), recursos=Sum("recursos"))
     )
+    # Detalle: se genera fila a fila mientras se escribe (memoria constante)
+    reservas = reservas_con_relaciones(_reservas_periodo(desde, hasta))
+    detalle = (_detalle_r8(fila_reserva(r)) for r in reservas.iterator(chunk_size=CHUNK_DETALLE))
+    wb = _libro_admin("r8", desde, hasta, _resumen_r8(datos), detalle)
+    return wb, f"R8_auditoria_{_sufijo_periodo(desde, hasta)}.xlsx"
 
-    return _excel_response(wb, f"R5_uso_por_area_{year}.xlsx")
+
+@admin_required
+def r1_recursos_global_excel(request):
+    return _excel_admin(request, "r1", construir_r1)
 
 
 @admin_required
-def r6_tendencia_mensual_por_area_excel(request):
-    year = _year_from_request(request)
+def r2_recursos_por_area_excel(request):
+    return _excel_admin(request, "r2", construir_r2)
 
-    reservas = (
-        Reserva.objects.filter(fecha__year=year, estado__in=OK_STATES)
-        .select_related("solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area", "espacio")
-        .prefetch_related("recursos_asociados")
-    )
 
-    reservas_mes = {}
-    detalle_rows = []
+@admin_required
+def r3_espacios_global_excel(request):
+    return _excel_admin(request, "r3", construir_r3)
 
-    for r in reservas:
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
-        m = r.fecha.month
-        dur = _duration_hours(r.hora_inicio, r.hora_fin)
-        total_rec = _get_total_recursos_reserva(r)
 
-        reservas_mes.setdefault(area, [0] * 12)[m - 1] += 1
+@admin_required
+def r4_espacios_por_area_excel(request):
+    return _excel_admin(request, "r4", construir_r4)
 
-        detalle_rows.append([
-            area,
-            carrera,
-            MESES[m - 1],
-            r.id,
-            r.fecha,
-            r.espacio.nombre if r.espacio_id else "",
-            r.hora_inicio,
-            r.hora_fin,
-            dur,
-            total_rec,
-            r.solicitante.get_full_name() or r.solicitante.email,
-        ])
 
-    resumen_rows = []
-    for area in sorted(reservas_mes.keys()):
-        fila = [area] + reservas_mes[area] + [sum(reservas_mes[area])]
-        resumen_rows.append(fila)
-
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R6) Tendencia mensual por Área (N° reservas)",
-        subtitle=f"Año {year} | Estados: {', '.join(OK_STATES)}",
-        columns=["Área"] + MESES + ["Total"],
-        rows=resumen_rows,
-    )
+@admin_required
+def r5_uso_por_area_excel(request):
+    return _excel_admin(request, "r5", construir_r5)
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R6) Área/Mes (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["Área", "Carrera", "Mes", "ID", "Fecha", "Espacio", "Hora inicio", "Hora fin", "Duración(h)", "Total recursos", "Solicitante"],
-        rows=detalle_rows,
-    )
 
-    return _excel_response(wb, f"R6_tendencia_mensual_por_area_{year}.xlsx")
+@admin_required
+def r6_tendencia_mensual_por_area_excel(request):
+    return _excel_admin(request, "r6", construir_r6)
 
 
 @admin_required
 def r7_estados_por_area_excel(request):
-    year = _year_from_request(request)
+    return _excel_admin(request, "r7", construir_r7)
 
-    qs = (
-        Reserva.objects.filter(fecha__year=year)
-        .annotate(area=_area_expr_reserva())
-        .values("area", "estado")
-        .annotate(total=Count("id"))
+
+@admin_required
+def r8_auditoria_detallada_excel(request):
+    return _excel_admin(request, "r8", construir_r8)
+
+
+# ==============================================================================
+# PACK COMPLETO: R1–R8 en un solo libro con UNA pasada por las reservas
+# ==============================================================================
+#
+# Los reportes sueltos hacen ~2 consultas cada uno sobre el período (16 en total).
+# El pack recorre una sola vez las reservas del período (con recursos precargados
+# por lote) y con cada reserva alimenta:
+# - las 8 hojas Detalle (se escriben intercaladas, en streaming)
+# - los acumuladores de recursos de R1/R2 (mismo origen que sus reportes sueltos).
+# Los Resumen de R3–R8 salen, como en los sueltos, de la tabla de hechos: una
+# consulta agrupada por (área, espacio, estado, mes) que se reagrupa en memoria
+# para cada hoja. Así el pack y los sueltos leen siempre el mismo origen.
+# Todas las hojas Detalle quedan ordenadas por fecha descendente.
+
+REPORTES_PACK = ("r1", "r2", "r3", "r4", "r5", "r6", "r7", "r8")
+
+
+def _agrupar(filas, claves, metricas) -> list:
+    """Como .values(*claves).annotate(Sum(m) ...) pero sobre dicts en memoria."""
+    grupos = {}
+    for f in filas:
+        clave = tuple(f[c] for c in claves)
+        acumulado = grupos.setdefault(clave, dict(zip(claves, clave), **{m: 0 for m in metricas}))
+        for m in metricas:
+            acumulado[m] += f[m]
+    return list(grupos.values())
+
+
+def _hechos_periodo(desde: date, hasta: date) -> list:
+    """Tabla de hechos del período por (área, espacio, estado, mes): base de los Resumen R3–R8 del pack."""
+    return list(
+        _resumen_qs(desde, hasta)
+        .annotate(area_nombre=_area_expr_resumen(), mes=TruncMonth("fecha"))
+        .values("area_nombre", "espacio__nombre", "estado", "mes")
+        .annotate(reservas=Sum("reservas"), minutos=Sum("minutos"), recursos=Sum("recursos"))
     )
 
-    data = {}
-    for x in qs:
-        area = x["area"]
-        estado = x["estado"]
-        data.setdefault(area, {})[estado] = int(x["total"] or 0)
 
-    estados_orden = [k for k, _ in Reserva.ESTADOS]
+def construir_pack(desde: date, hasta: date):
+    wb = nuevo_libro()
+    hojas = {rep: _abrir_hojas_admin(wb, rep, desde, hasta, prefijo=f"{rep.upper()} ") for rep in REPORTES_PACK}
+    con_year = desde.year != hasta.year
+
+    # Acumulador (área, carrera, recurso) de OK_STATES
+    recursos = {}
+
+    reservas = reservas_con_relaciones(_reservas_periodo(desde, hasta))
+    for r in reservas.iterator(chunk_size=CHUNK_DETALLE):
+        d = fila_reserva(r)
+
+        hojas["r7"][1].agregar(_detalle_r7(d))
+        hojas["r8"][1].agregar(_detalle_r8(d))
+        if d["estado"] not in OK_STATES:
+            continue
+
+        for rep, fila in (("r3", _detalle_r3), ("r4", _detalle_r4), ("r5", _detalle_r5)):
+            hojas[rep][1].agregar(fila(d))
+        hojas["r6"][1].agregar(_detalle_r6(d, con_year))
+
+        vistos = set()
+        for rr in d["recursos"]:
+            drr = {
+                "reserva_id": d["id"], "reserva__fecha": d["fecha"],
+                "reserva__hora_inicio": d["hora_inicio"], "reserva__hora_fin": d["hora_fin"],
+                "reserva__estado": d["estado"], "reserva__espacio__nombre": d["espacio__nombre"],
+                "recurso__nombre": rr.recurso.nombre, "cantidad": rr.cantidad,
+                "area_nombre": d["area_nombre"], "carrera_nombre": d["carrera_nombre"],
+                "solicitante_nombre": d["solicitante_nombre"],
+            }
+            hojas["r1"][1].agregar(_detalle_r1(drr))
+            hojas["r2"][1].agregar(_detalle_r2(drr))
+
+            acumulado = recursos.setdefault((d["area_nombre"], d["carrera_nombre"], rr.recurso.nombre), [0, 0])
+            acumulado[0] += int(rr.cantidad or 0)
+            # N° reservas = reservas distintas (como Count("reserva", distinct=True))
+            if rr.recurso.nombre not in vistos:
+                vistos.add(rr.recurso.nombre)
+                acumulado[1] += 1
+
+    filas_hechos = _hechos_periodo(desde, hasta)
+    ok = [f for f in filas_hechos if f["estado"] in OK_STATES]
+    filas_recursos = [
+        {"area_nombre": area, "carrera_nombre": carrera, "recurso__nombre": recurso, "cantidad_total": cant, "reservas": n}
+        for (area, carrera, recurso), (cant, n) in recursos.items()
+    ]
 
-    resumen_rows = []
-    for area in sorted(data.keys()):
-        total = sum(data[area].get(e, 0) for e in estados_orden)
-        aprob = data[area].get("APROBADA", 0)
-        pct_aprob = round((aprob / total) * 100, 2) if total else 0
-        fila = [area, total] + [data[area].get(e, 0) for e in estados_orden] + [pct_aprob]
-        resumen_rows.append(fila)
+    resumenes = {
+        "r1": _resumen_r1(_agrupar(filas_recursos, ["recurso__nombre"], ["cantidad_total", "reservas"])),
+        "r2": _resumen_r2(filas_recursos),
+        "r3": _resumen_r3(_agrupar(ok, ["espacio__nombre"], ["reservas", "minutos"])),
+        "r4": _resumen_r4(_agrupar(ok, ["area_nombre", "espacio__nombre"], ["reservas", "minutos"])),
+        "r5": _resumen_r5(_agrupar(ok, ["area_nombre"], ["reservas", "minutos", "recursos"])),
+        "r6": _resumen_r6(_agrupar(ok, ["area_nombre", "mes"], ["reservas"]), _meses_periodo(desde, hasta)),
+        "r7": _resumen_r7(_agrupar(filas_hechos, ["area_nombre", "estado"], ["reservas"])),
+        "r8": _resumen_r8(_agrupar(filas_hechos, ["area_nombre", "estado"], ["reservas", "minutos", "recursos"])),
+    }
+    for rep in REPORTES_PACK:
+        resumen, detalle = hojas[rep]
+        for fila in resumenes[rep]:
+            resumen.agregar(fila)
+        resumen.cerrar()
+        detalle.cerrar()
+
+    return wb, f"Pack_reportes_admin_{_sufijo_periodo(desde, hasta)}.xlsx"
 
-    detalle_qs = (
-        Reserva.objects.filter(fecha__year=year)
-        .select_related("solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area", "espacio")
-        .order_by("-fecha", "-hora_inicio")
-    )
 
-    detalle_rows = []
-    for r in detalle_qs:
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
-        detalle_rows.append([
-            r.id,
-            r.fecha,
-            r.hora_inicio,
-            r.hora_fin,
-            r.espacio.nombre if r.espacio_id else "",
-            r.solicitante.get_full_name() or r.solicitante.email,
-            area,
-            carrera,
-            r.estado,
-        ])
+@admin_required
+def pack_admin_excel(request):
+    return _excel_admin(request, "pack", construir_pack)
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R7) Estados por Área (% aprobación)",
-        subtitle=f"Año {year} | Incluye TODOS los estados",
-        columns=["Área", "Total"] + estados_orden + ["% aprobación (sobre total)"],
-        rows=resumen_rows,
-    )
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R7) Reservas por Área/Estado (Detalle pivot)",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=["ID", "Fecha", "Hora inicio", "Hora fin", "Espacio", "Solicitante", "Área", "Carrera", "Estado"],
-        rows=detalle_rows,
+# ==============================================================================
+# DATASETS PARQUET (análisis; requiere pyarrow, opcional)
+# ==============================================================================
+#
+# El Detalle de R8 y un dataset crudo reserva x recurso, en Parquet con columnas
+# tipadas (ver reportes.columnar), para cualquier período (ej. varios años).
+
+COLUMNAS_AUDITORIA = [
+    ("id", "int64"), ("fecha", "date"), ("hora_inicio", "time"), ("hora_fin", "time"),
+    ("duracion_h", "float64"), ("estado", "string"), ("espacio", "string"), ("solicitante", "string"),
+    ("area", "string"), ("carrera", "string"), ("total_recursos", "int64"), ("detalle_recursos", "string"),
+    ("motivo", "string"), ("fecha_solicitud", "timestamp"),
+]
+
+# Una fila por recurso pedido; las reservas sin recursos van con recurso/cantidad nulos
+COLUMNAS_HECHOS = [
+    ("reserva_id", "int64"), ("fecha", "date"), ("hora_inicio", "time"), ("hora_fin", "time"),
+    ("minutos", "int32"), ("estado", "string"), ("espacio_id", "int64"), ("espacio", "string"),
+    ("solicitante_id", "int64"), ("area", "string"), ("carrera", "string"),
+    ("recurso_id", "int64"), ("recurso", "string"), ("cantidad", "int32"), ("fecha_solicitud", "timestamp"),
+]
+
+
+def filas_auditoria(desde: date, hasta: date):
+    """Mismas filas que la hoja Detalle de R8, como dicts con los nombres de COLUMNAS_AUDITORIA."""
+    nombres = [nombre for nombre, _tipo in COLUMNAS_AUDITORIA]
+    reservas = reservas_con_relaciones(_reservas_periodo(desde, hasta))
+    for r in reservas.iterator(chunk_size=CHUNK_DETALLE):
+        yield dict(zip(nombres, _detalle_r8(fila_reserva(r))))
+
+
+def filas_hechos(desde: date, hasta: date):
+    """Reserva x recurso en UNA consulta (LEFT JOIN a los recursos), leída por lotes."""
+    qs = (
+        _reservas_periodo(desde, hasta)
+        .annotate(area_nombre=_area_expr_reserva(), carrera_nombre=_carrera_expr_reserva())
+        .values_list(
+            "id", "fecha", "hora_inicio", "hora_fin", "estado", "espacio_id", "espacio__nombre",
+            "solicitante_id", "area_nombre", "carrera_nombre",
+            "recursos_asociados__recurso_id", "recursos_asociados__recurso__nombre", "recursos_asociados__cantidad",
+            "fecha_solicitud",
+        )
+        .order_by("fecha", "hora_inicio", "id")
+    )
+    for (
+        reserva_id, fecha, hora_inicio, hora_fin, estado, espacio_id, espacio, solicitante_id, area, carrera,
+        recurso_id, recurso, cantidad, fecha_solicitud,
+    ) in qs.iterator(chunk_size=CHUNK_DETALLE):
+        yield {
+            "reserva_id": reserva_id,
+            "fecha": fecha,
+            "hora_inicio": hora_inicio,
+            "hora_fin": hora_fin,
+            "minutos": minutos_reservados(hora_inicio, hora_fin),
+            "estado": estado,
+            "espacio_id": espacio_id,
+            "espacio": espacio,
+            "solicitante_id": solicitante_id,
+            "area": area,
+            "carrera": carrera,
+            "recurso_id": recurso_id,
+            "recurso": recurso,
+            "cantidad": cantidad,
+            "fecha_solicitud": fecha_solicitud,
+        }
+
+
+def construir_auditoria_parquet(desde: date, hasta: date):
+    tabla = TablaParquet(COLUMNAS_AUDITORIA, filas_auditoria(desde, hasta))
+    return tabla, f"R8_auditoria_{_sufijo_periodo(desde, hasta)}.parquet"
+
+
+def construir_hechos_parquet(desde: date, hasta: date):
+    tabla = TablaParquet(COLUMNAS_HECHOS, filas_hechos(desde, hasta))
+    return tabla, f"Hechos_reservas_recursos_{_sufijo_periodo(desde, hasta)}.parquet"
+
+
+def _parquet_admin(request, reporte: str, construir):
+    desde, hasta = _periodo_from_request(request)
+    if not PARQUET_DISPONIBLE:
+        messages.error(request, "La exportación Parquet no está disponible en este servidor (falta instalar pyarrow).")
+        return redirect(f"{reverse('reportes:home')}?{_periodo_qs(desde, hasta)}")
+
+    return respuesta_reporte(
+        reporte, _parametros_periodo(desde, hasta), "admin",
+        lambda: construir(desde, hasta), content_type=PARQUET_CONTENT_TYPE,
     )
 
-    return _excel_response(wb, f"R7_estados_por_area_{year}.xlsx")
+
+@admin_required
+def r8_auditoria_parquet(request):
+    return _parquet_admin(request, "r8_parquet", construir_auditoria_parquet)
 
 
 @admin_required
-def r8_auditoria_detallada_excel(request):
-    year = _year_from_request(request)
+def hechos_reservas_parquet(request):
+    return _parquet_admin(request, "hechos_parquet", construir_hechos_parquet)
 
-    reservas = (
-        Reserva.objects.filter(fecha__year=year)
-        .select_related("espacio", "solicitante", "solicitante__area", "solicitante__carrera", "solicitante__carrera__area")
-        .prefetch_related("recursos_asociados__recurso")
-        .order_by("-fecha", "-hora_inicio")
-    )
 
-    estados_orden = [k for k, _ in Reserva.ESTADOS]
+# ==============================================================================
+# Registro de reportes admin (los usa la cola de reportes.trabajos)
+# ==============================================================================
 
-    area_counts = {}
-    area_horas = {}
-    area_tot = {}
+REPORTES_ADMIN = {
+    "r1": ("R1 Recursos (Global)", construir_r1),
+    "r2": ("R2 Recursos por Área", construir_r2),
+    "r3": ("R3 Espacios (Global)", construir_r3),
+    "r4": ("R4 Espacios por Área", construir_r4),
+    "r5": ("R5 Uso por Área", construir_r5),
+    "r6": ("R6 Tendencia mensual", construir_r6),
+    "r7": ("R7 Estados por Área", construir_r7),
+    "r8": ("R8 Auditoría detallada", construir_r8),
+    "pack": ("Pack completo R1–R8", construir_pack),
+}
 
-    detalle_rows = []
-    for r in reservas:
-        area = _area_name_from_user(r.solicitante)
-        carrera = _carrera_name_from_user(r.solicitante)
-        dur = _duration_hours(r.hora_inicio, r.hora_fin)
-        rec_total = _get_total_recursos_reserva(r)
 
-        area_tot[area] = area_tot.get(area, 0) + 1
-        area_horas[area] = round(area_horas.get(area, 0.0) + dur, 2)
-        area_counts.setdefault(area, {})
-        area_counts[area][r.estado] = area_counts[area].get(r.estado, 0) + 1
+# ==============================================================================
+# Reportes en segundo plano (encolar -> worker -> descargar)
+# ==============================================================================
 
-        detalle_rows.append([
-            r.id,
-            r.fecha,
-            r.hora_inicio,
-            r.hora_fin,
-            dur,
-            r.estado,
-            r.espacio.nombre if r.espacio_id else "",
-            r.solicitante.get_full_name() or r.solicitante.email,
-            area,
-            carrera,
-            rec_total,
-            _recursos_texto(r),
-            r.motivo or "",
-            r.fecha_solicitud if r.fecha_solicitud else None,
-        ])
+@admin_required
+@require_POST
+def encolar_reporte(request, reporte):
+    if reporte not in REPORTES_ADMIN:
+        raise Http404("Reporte desconocido")
 
-    rr_area = (
-        RecursoReserva.objects.filter(reserva__fecha__year=year)
-        .annotate(area=_area_expr_recurso_reserva())
-        .values("area")
-        .annotate(total_recursos=Sum("cantidad"))
-    )
-    recursos_map = {x["area"]: int(x["total_recursos"] or 0) for x in rr_area}
+    desde, hasta = _periodo_from_request(request)
+    trabajo = encolar(reporte, _parametros_periodo(desde, hasta), usuario=request.user)
+    return redirect("reportes:trabajo_reporte", trabajo_id=trabajo.pk)
 
-    resumen_rows = []
-    for area in sorted(area_tot.keys()):
-        total_area = area_tot.get(area, 0)
-        aprob = area_counts.get(area, {}).get("APROBADA", 0)
-        pct_aprob = round((aprob / total_area) * 100, 2) if total_area else 0
-        fila_estados = [area_counts.get(area, {}).get(e, 0) for e in estados_orden]
-        resumen_rows.append([
-            area,
-            total_area,
-            *fila_estados,
-            pct_aprob,
-            area_horas.get(area, 0.0),
-            recursos_map.get(area, 0),
-        ])
 
-    wb = Workbook()
-    ws1 = wb.active
-    ws1.title = "Resumen"
-    _write_table(
-        ws1,
-        title="R8) Auditoría - Resumen por Área",
-        subtitle=f"Año {year} | Incluye TODOS los estados",
-        columns=["Área", "Total"] + estados_orden + ["% aprobación", "Total horas", "Total recursos (cant.)"],
-        rows=resumen_rows,
-    )
+@admin_required
+def trabajo_reporte(request, trabajo_id):
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id)
 
-    ws2 = wb.create_sheet("Detalle")
-    _write_table(
-        ws2,
-        title="R8) Auditoría - Detalle pivot",
-        subtitle="Tabla plana (ideal para pivots)",
-        columns=[
-            "ID",
-            "Fecha",
-            "Hora inicio",
-            "Hora fin",
-            "Duración (h)",
-            "Estado",
-            "Espacio",
-            "Solicitante",
-            "Área",
-            "Carrera",
-            "Total recursos",
-            "Detalle recursos",
-            "Motivo/Actividad",
-            "Fecha solicitud",
-        ],
-        rows=detalle_rows,
-    )
+    # La página consulta ?formato=json cada pocos segundos hasta que queda LISTO
+    if request.GET.get("formato") == "json":
+        return JsonResponse(estado_trabajo(trabajo))
+
+    titulo = REPORTES_ADMIN.get(trabajo.reporte, (trabajo.reporte,))[0]
+    argumentos = argumentos_construir(trabajo.parametros)
+    desde, hasta = argumentos["desde"], argumentos["hasta"]
+    return render(request, "reportes/trabajo_reporte.html", {
+        "trabajo": trabajo,
+        "titulo": titulo,
+        "periodo": _texto_periodo(desde, hasta),
+        "periodo_qs": _periodo_qs(desde, hasta),
+    })
 
-    return _excel_response(wb, f"R8_auditoria_{year}.xlsx")
+
+@admin_required
+def descargar_trabajo_reporte(request, trabajo_id):
+    trabajo = get_object_or_404(TrabajoReporte, pk=trabajo_id, estado="LISTO")
+    if not trabajo.archivo:
+        raise Http404("Archivo no disponible")
+    return respuesta_archivo(trabajo.archivo.open("rb"), trabajo.nombre_archivo)
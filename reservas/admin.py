@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Reserva, RecursoReserva
+from .models import Reserva, RecursoReserva, OcupacionEspacio, ResumenDiarioReserva, ReservaEliminada
 
 # Configuración para editar los recursos DENTRO de la pantalla de reserva
 class RecursoReservaInline(admin.TabularInline):
@@ -33,4 +33,27 @@ class RecursoReservaAdmin(admin.ModelAdmin):
     # Esto permite ver y buscar en la tabla intermedia directamente si fuera necesario
     list_display = ('id', 'reserva', 'recurso', 'cantidad')
     search_fields = ('reserva__id', 'recurso__nombre')
-    list_filter = ('recurso',)
\ No newline at end of file
+    list_filter = ('recurso',)
+
+@admin.register(OcupacionEspacio)
+class OcupacionEspacioAdmin(admin.ModelAdmin):
+    # Grilla materializada: solo lectura (se mantiene sola vía signals)
+    list_display = ('espacio', 'fecha', 'aprobadas', 'pendientes')
+    list_filter = ('espacio',)
+    date_hierarchy = 'fecha'
+    readonly_fields = ('espacio', 'fecha', 'aprobadas', 'pendientes')
+
+@admin.register(ResumenDiarioReserva)
+class ResumenDiarioReservaAdmin(admin.ModelAdmin):
+    # Tabla de hechos: solo lectura (se mantiene sola vía signals)
+    list_display = ('fecha', 'espacio', 'area', 'carrera', 'estado', 'reservas', 'minutos', 'recursos')
+    list_filter = ('estado', 'espacio')
+    date_hierarchy = 'fecha'
+    readonly_fields = ('fecha', 'espacio', 'area', 'carrera', 'estado', 'reservas', 'minutos', 'recursos')
+
+@admin.register(ReservaEliminada)
+class ReservaEliminadaAdmin(admin.ModelAdmin):
+    # Lápidas para la sincronización del calendario: solo lectura
+    list_display = ('reserva_id', 'eliminada')
+    date_hierarchy = 'eliminada'
+    readonly_fields = ('reserva_id', 'eliminada')
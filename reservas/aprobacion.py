@@ -0,0 +1,222 @@
+"""
+Aprobación / rechazo masivo de solicitudes (gestión de reservas del admin).
+
+En vez de procesar una reserva por POST (consultas de conflicto, competencia y
+stock por cada una, y un save() por cada rechazo con su pre_save), el lote:
+
+1) trae en pocas consultas las candidatas, todo lo activo de sus (espacio, fecha),
+   los recursos pedidos, el stock físico y los eventos aprobados de esos recursos;
+2) resuelve en memoria, por orden de llegada (fecha_solicitud), qué se aprueba,
+   qué se rechaza por competencia y qué queda pendiente (choque con una aprobada
+   previa, stock insuficiente o competencia sin confirmar: igual que la
+   aprobación individual, rechazar pendientes que compiten exige confirmado=True);
+3) aplica todos los cambios en una transacción con bulk_update, recalcula la
+   grilla de ocupación y el resumen diario, y envía las notificaciones con un
+   solo bulk_create.
+
+Las reservas se leen con select_for_update (solo las filas de Reserva, no sus
+joins): una aprobación, cancelación u otro lote simultáneo espera a que este
+termine, y el bulk_update nunca pisa un estado que cambió después de leerlo.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventario.models import Recurso
+
+from .availability import ESTADOS_ACTIVOS
+from .models import Reserva, RecursoReserva
+from .derivados import recalcular_dias
+from .stock import pico_concurrente
+
+_CAMPOS = ("id", "solicitante_id", "espacio_id", "espacio__nombre", "espacio__ubicacion",
+           "fecha", "hora_inicio", "hora_fin", "estado", "motivo_cancelacion")
+
+
+def _se_cruzan(a_ini, a_fin, b_ini, b_fin):
+    return a_ini < b_fin and a_fin > b_ini
+
+
+def _cargar_activas(pares):
+    """Reservas PENDIENTE/APROBADA de los (espacio, fecha) dados, agrupadas por par (bloqueadas)."""
+    if not pares:
+        return {}
+    qs = (
+        Reserva.objects.select_for_update(of=("self",)).filter(
+            espacio_id__in={e for e, _ in pares},
+            fecha__in={f for _, f in pares},
+            estado__in=list(ESTADOS_ACTIVOS),
+        )
+        .select_related("espacio")
+        .only(*_CAMPOS)
+        .order_by("fecha_solicitud", "id")
+    )
+    por_par = defaultdict(list)
+    for r in qs:
+        if (r.espacio_id, r.fecha) in pares:
+            por_par[(r.espacio_id, r.fecha)].append(r)
+    return por_par
+
+
+def _competidoras(r, reservas, decididas):
+    """Pendientes (del lote o no) que chocan con `r` y todavía no tienen resultado."""
+    return [
+        otra for otra in reservas
+        if otra.id != r.id
+        and otra.estado == "PENDIENTE"
+        and otra.id not in decididas
+        and _se_cruzan(r.hora_inicio, r.hora_fin, otra.hora_inicio, otra.hora_fin)
+    ]
+
+
+def aprobar_lote(ids, confirmado=False):
+    """
+    Aprueba las reservas PENDIENTES indicadas resolviendo conflictos entre ellas
+    y contra las ya aprobadas.
+
+    Cada id queda en UNA sola lista:
+    - aprobadas: [reserva, ...]
+    - rechazadas: [reserva, ...] pendientes que competían con una aprobada (solo con confirmado=True)
+    - omitidas: [(reserva, motivo), ...] siguen pendientes (espacio ocupado o sin stock)
+    - por_confirmar: [(reserva, [ids competidoras]), ...] siguen pendientes: aprobarlas
+      rechazaría otras solicitudes y no se confirmó
+    - no_pendientes: [id, ...] ids que no existen o ya no están PENDIENTES
+    """
+    ids = {int(i) for i in ids}
+    resultado = {"aprobadas": [], "rechazadas": [], "omitidas": [], "por_confirmar": [], "no_pendientes": []}
+    if not ids:
+        return resultado
+
+    with transaction.atomic():
+        # Solo las que siguen PENDIENTES una vez bloqueadas
+        pendientes = {
+            pk: (espacio_id, fecha)
+            for pk, espacio_id, fecha in Reserva.objects.select_for_update()
+            .filter(pk__in=ids, estado="PENDIENTE")
+            .values_list("id", "espacio_id", "fecha")
+            .order_by("id")
+        }
+        resultado["no_pendientes"] = sorted(ids - pendientes.keys())
+        ids = set(pendientes)
+        pares = set(pendientes.values())
+        activas = _cargar_activas(pares)
+
+        # Recursos pedidos por las candidatas + stock físico (bloqueado) + eventos aprobados
+        pedidos = defaultdict(list)
+        for reserva_id, recurso_id, cantidad in RecursoReserva.objects.filter(
+            reserva_id__in=ids
+        ).values_list("reserva_id", "recurso_id", "cantidad"):
+            pedidos[reserva_id].append((recurso_id, cantidad))
+
+        recurso_ids = {rid for items in pedidos.values() for rid, _ in items}
+        recursos = {}
+        eventos = defaultdict(list)
+        if recurso_ids:
+            recursos = {
+                r.id: r for r in Recurso.objects.select_for_update().filter(id__in=recurso_ids).only("id", "nombre", "stock")
+            }
+            for fecha, recurso_id, ini, fin, cant in RecursoReserva.objects.filter(
+                recurso_id__in=recurso_ids,
+                reserva__fecha__in={f for _, f in pares},
+                reserva__estado="APROBADA",
+            ).values_list("reserva__fecha", "recurso_id", "reserva__hora_inicio", "reserva__hora_fin", "cantidad"):
+                eventos[fecha].append((recurso_id, ini, fin, cant))
+
+        por_actualizar = {}
+        omitidas = {}  # id -> (reserva, motivo); una omitida puede terminar rechazada por competencia
+        for par, reservas in activas.items():
+            aprobadas = [r for r in reservas if r.estado == "APROBADA"]
+            candidatas = [r for r in reservas if r.estado == "PENDIENTE" and r.id in ids]
+
+            for r in candidatas:
+                if r.id in por_actualizar:
+                    continue  # ya rechazada por competencia dentro del lote
+
+                choque = next(
+                    (a for a in aprobadas if _se_cruzan(r.hora_inicio, r.hora_fin, a.hora_inicio, a.hora_fin)),
+                    None,
+                )
+                if choque is not None:
+                    omitidas[r.id] = (r, f"el espacio ya está ocupado por la reserva #{choque.id}")
+                    continue
+
+                pico = pico_concurrente(eventos.get(r.fecha, ()), r.hora_inicio, r.hora_fin)
+                sin_stock = [
+                    recursos[rid].nombre
+                    for rid, cant in pedidos.get(r.id, ())
+                    if int(recursos[rid].stock or 0) - pico.get(rid, 0) < cant
+                ]
+                if sin_stock:
+                    omitidas[r.id] = (r, "stock insuficiente para " + ", ".join(sin_stock))
+                    continue
+
+                # Competencia: pendientes que se rechazarían al aprobar esta
+                competidoras = _competidoras(r, reservas, por_actualizar)
+                if competidoras and not confirmado:
+                    resultado["por_confirmar"].append((r, [otra.id for otra in competidoras]))
+                    continue
+
+                r.estado = "APROBADA"
+                aprobadas.append(r)
+                por_actualizar[r.id] = r
+                resultado["aprobadas"].append(r)
+                for rid, cant in pedidos.get(r.id, ()):
+                    eventos[r.fecha].append((rid, r.hora_inicio, r.hora_fin, cant))
+
+                for otra in competidoras:
+                    otra.estado = "RECHAZADA"
+                    otra.motivo_cancelacion = f"Sistema: Se aprobó una solicitud prioritaria (ID #{r.id})."
+                    por_actualizar[otra.id] = otra
+                    omitidas.pop(otra.id, None)
+                    resultado["rechazadas"].append(otra)
+
+        resultado["omitidas"] = list(omitidas.values())
+        _aplicar(por_actualizar.values(), pares)
+
+    return resultado
+
+
+def rechazar_lote(ids, motivo=None):
+    """Rechaza las reservas PENDIENTES indicadas. Devuelve la lista de rechazadas."""
+    ids = {int(i) for i in ids}
+    if not ids:
+        return []
+
+    with transaction.atomic():
+        reservas = list(
+            Reserva.objects.select_for_update(of=("self",))
+            .filter(pk__in=ids, estado="PENDIENTE")
+            .select_related("espacio")
+            .only(*_CAMPOS)
+            .order_by("id")
+        )
+        for r in reservas:
+            r.estado = "RECHAZADA"
+            if motivo:
+                r.motivo_cancelacion = motivo
+        _aplicar(reservas, {(r.espacio_id, r.fecha) for r in reservas})
+
+    return reservas
+
+
+def _aplicar(reservas, pares):
+    """bulk_update + tablas derivadas + notificaciones (bulk_update no dispara signals)."""
+    from notificaciones.signals import _reserva_detalle_url, mensaje_cambio_estado
+    from notificaciones.utils import notificar_lote
+
+    reservas = list(reservas)
+    if not reservas:
+        return
+
+    ahora = timezone.now()  # bulk_update tampoco aplica auto_now
+    for r in reservas:
+        r.actualizado = ahora
+    Reserva.objects.bulk_update(reservas, ["estado", "motivo_cancelacion", "actualizado"], batch_size=500)
+    recalcular_dias(pares)
+
+    filas = []
+    for r in reservas:
+        titulo, mensaje, level = mensaje_cambio_estado(r)
+        filas.append((r.solicitante_id, titulo, mensaje, level, _reserva_detalle_url(r)))
+    notificar_lote(filas)
@@ -0,0 +1,259 @@
+"""
+Servicio de disponibilidad de espacios.
+
+Responde "¿está libre el espacio X entre A y B el día D?" con UNA consulta
+por rango (espacio + fecha + estado + cruce de horas) en vez de traer todas
+las reservas del día y recorrerlas en Python.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from inventario.models import Espacio, Recurso
+
+from .models import Reserva, RecursoReserva
+from .ocupacion import HORA_APERTURA, HORA_CIERRE, libre_segun_grilla
+
+# Estados que ocupan un espacio (las solicitudes en revisión también bloquean)
+ESTADOS_ACTIVOS = ("PENDIENTE", "APROBADA")
+
+# Colchón obligatorio entre reservas del mismo espacio
+MARGEN_ENTRE_RESERVAS = timedelta(hours=1)
+
+
+def rango_con_margen(fecha, hora_inicio, hora_fin, margen):
+    """Amplía [hora_inicio, hora_fin) con el margen, sin pasar de medianoche."""
+    if not margen:
+        return hora_inicio, hora_fin
+
+    inicio = datetime.combine(fecha, hora_inicio) - margen
+    fin = datetime.combine(fecha, hora_fin) + margen
+
+    desde = inicio.time() if inicio.date() == fecha else time.min
+    hasta = fin.time() if fin.date() == fecha else time.max
+    return desde, hasta
+
+
+def conflictos_espacio(espacio, fecha, hora_inicio, hora_fin, estados=ESTADOS_ACTIVOS, margen=None, excluir_id=None):
+    """
+    QuerySet de reservas del espacio que se cruzan con el bloque pedido.
+
+    - estados: qué estados cuentan como ocupación.
+    - margen: timedelta de colchón alrededor del bloque (None = cruce exacto).
+    - excluir_id: id de la reserva que se está editando/aprobando.
+    """
+    desde, hasta = rango_con_margen(fecha, hora_inicio, hora_fin, margen)
+
+    qs = Reserva.objects.filter(
+        espacio=espacio,
+        fecha=fecha,
+        estado__in=list(estados),
+        hora_inicio__lt=hasta,
+        hora_fin__gt=desde,
+    )
+    if excluir_id:
+        qs = qs.exclude(pk=excluir_id)
+    return qs
+
+
+def _libre_segun_grilla(espacio, fecha, hora_inicio, hora_fin, estados, margen):
+    desde, hasta = rango_con_margen(fecha, hora_inicio, hora_fin, margen)
+    return libre_segun_grilla(getattr(espacio, "pk", espacio), fecha, desde, hasta, estados)
+
+
+def primer_conflicto(espacio, fecha, hora_inicio, hora_fin, estados=ESTADOS_ACTIVOS, margen=None, excluir_id=None):
+    """
+    Devuelve la primera reserva que choca (o None).
+    Primero mira la grilla de ocupación (una fila); solo si hay bloques ocupados
+    hace la consulta exacta con LIMIT 1.
+    """
+    if _libre_segun_grilla(espacio, fecha, hora_inicio, hora_fin, estados, margen):
+        return None
+    return (
+        conflictos_espacio(espacio, fecha, hora_inicio, hora_fin, estados, margen, excluir_id)
+        .only("id", "hora_inicio", "hora_fin", "estado")
+        .order_by("hora_inicio")
+        .first()
+    )
+
+
+def espacio_disponible(espacio, fecha, hora_inicio, hora_fin, estados=ESTADOS_ACTIVOS, margen=MARGEN_ENTRE_RESERVAS, excluir_id=None) -> bool:
+    """True si el espacio está libre en el bloque (incluyendo el colchón entre reservas)."""
+    if _libre_segun_grilla(espacio, fecha, hora_inicio, hora_fin, estados, margen):
+        return True
+    return not conflictos_espacio(
+        espacio, fecha, hora_inicio, hora_fin, estados, margen, excluir_id
+    ).exists()
+
+
+def bloques_ocupados(estados=("APROBADA",), espacio=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Bloques ocupados como diccionarios planos (para calendarios/APIs).
+    Trae el nombre del espacio en la misma consulta (sin N+1).
+    """
+    qs = Reserva.objects.filter(estado__in=list(estados))
+    if espacio is not None:
+        qs = qs.filter(espacio=espacio)
+    if fecha_desde is not None:
+        qs = qs.filter(fecha__gte=fecha_desde)
+    if fecha_hasta is not None:
+        qs = qs.filter(fecha__lte=fecha_hasta)
+
+    return (
+        qs.annotate(espacio_nombre=F("espacio__nombre"))
+        .values("id", "espacio_id", "espacio_nombre", "fecha", "hora_inicio", "hora_fin", "estado")
+        .order_by("fecha", "hora_inicio")
+    )
+
+
+# ==============================================================================
+# BÚSQUEDA DE BLOQUES LIBRES (todos los espacios activos)
+# ==============================================================================
+
+# Reglas de ReservaForm que la búsqueda también respeta
+ANTICIPACION_MINIMA = timedelta(hours=48)
+PASO_BUSQUEDA = timedelta(minutes=30)
+
+
+def _redondear_arriba(momento, paso):
+    """Siguiente múltiplo de `paso` contado desde medianoche (el mismo momento si ya cae justo)."""
+    resto = (momento - datetime.combine(momento.date(), time.min)) % paso
+    return momento + (paso - resto) if resto else momento
+
+
+def _fusionar(intervalos):
+    """Une intervalos (inicio, fin) que se tocan o se cruzan. Entrada en cualquier orden."""
+    fusion = []
+    for ini, fin in sorted(intervalos):
+        if fusion and ini <= fusion[-1][1]:
+            if fin > fusion[-1][1]:
+                fusion[-1][1] = fin
+        else:
+            fusion.append([ini, fin])
+    return fusion
+
+
+def _huecos(ocupados, apertura, cierre):
+    """Tramos libres dentro de [apertura, cierre) dados intervalos ocupados ya fusionados."""
+    huecos = []
+    cursor = apertura
+    for ini, fin in ocupados:
+        if ini > cursor:
+            huecos.append((cursor, min(ini, cierre)))
+        cursor = max(cursor, fin)
+        if cursor >= cierre:
+            break
+    if cursor < cierre:
+        huecos.append((cursor, cierre))
+    return [(a, b) for a, b in huecos if b > a]
+
+
+def buscar_bloques_libres(fecha_desde, fecha_hasta, duracion, capacidad_min=0, recursos_pedidos=None,
+                          margen=MARGEN_ENTRE_RESERVAS, ahora=None, limite=50):
+    """
+    Bloques libres de `duracion` en todos los espacios activos con capacidad >= capacidad_min.
+
+    - recursos_pedidos: {recurso_id: cantidad} que deben estar disponibles en el bloque.
+    - Respeta el horario 08:30-21:00, el colchón entre reservas y la anticipación mínima.
+
+    Consultas (fijas, sin importar cuántos espacios o días):
+    1) espacios candidatos, 2) reservas activas del rango, y si se piden recursos:
+    3) stock de esos recursos, 4) eventos de esos recursos en el rango.
+    El resto es fusión de intervalos en memoria.
+
+    Devuelve una lista ordenada (más temprano primero y, a igual hora, el espacio
+    cuya capacidad se ajusta mejor a lo pedido).
+    """
+    from .stock import pico_concurrente  # stock importa este módulo
+
+    ahora = ahora or timezone.localtime().replace(tzinfo=None)
+    # Alineado a la grilla de búsqueda: 10:07 -> 10:30, no bloques que empiecen a las 10:07
+    minimo_inicio = _redondear_arriba(ahora + ANTICIPACION_MINIMA, PASO_BUSQUEDA)
+    recursos_pedidos = {int(k): int(v) for k, v in (recursos_pedidos or {}).items() if int(v) > 0}
+
+    espacios = list(
+        Espacio.objects.filter(activo=True, capacidad__gte=capacidad_min or 0)
+        .values("id", "nombre", "ubicacion", "capacidad")
+        .order_by("capacidad", "nombre")
+    )
+    if not espacios or fecha_hasta < fecha_desde:
+        return []
+
+    # --- 1 sola consulta: todo lo ocupado en el rango, agrupado en memoria ---
+    ocupado = defaultdict(list)
+    filas = Reserva.objects.filter(
+        espacio_id__in=[e["id"] for e in espacios],
+        fecha__gte=fecha_desde,
+        fecha__lte=fecha_hasta,
+        estado__in=list(ESTADOS_ACTIVOS),
+    ).values_list("espacio_id", "fecha", "hora_inicio", "hora_fin").order_by()
+
+    for espacio_id, fecha, ini, fin in filas:
+        ocupado[(espacio_id, fecha)].append((
+            datetime.combine(fecha, ini) - margen,
+            datetime.combine(fecha, fin) + margen,
+        ))
+
+    # --- Recursos: stock físico + eventos del rango (2 consultas) ---
+    stock_total = {}
+    eventos_por_dia = defaultdict(list)
+    if recursos_pedidos:
+        stock_total = dict(
+            Recurso.objects.filter(id__in=list(recursos_pedidos)).values_list("id", "stock")
+        )
+        if set(recursos_pedidos) - set(stock_total):
+            return []
+        eventos = RecursoReserva.objects.filter(
+            recurso_id__in=list(recursos_pedidos),
+            reserva__fecha__gte=fecha_desde,
+            reserva__fecha__lte=fecha_hasta,
+            reserva__estado__in=list(ESTADOS_ACTIVOS),
+        ).values_list("reserva__fecha", "recurso_id", "reserva__hora_inicio", "reserva__hora_fin", "cantidad")
+        for fecha, recurso_id, ini, fin, cantidad in eventos:
+            eventos_por_dia[fecha].append((recurso_id, ini, fin, cantidad))
+
+    def _recursos_ok(fecha, ini, fin):
+        if not recursos_pedidos:
+            return True
+        pico = pico_concurrente(eventos_por_dia.get(fecha, ()), ini.time(), fin.time())
+        return all(
+            int(stock_total.get(rid) or 0) - pico.get(rid, 0) >= cant
+            for rid, cant in recursos_pedidos.items()
+        )
+
+    resultados = []
+    dia = fecha_desde
+    while dia <= fecha_hasta:
+        apertura = datetime.combine(dia, HORA_APERTURA)
+        cierre = datetime.combine(dia, HORA_CIERRE)
+        if minimo_inicio > apertura:
+            apertura = min(cierre, max(apertura, minimo_inicio))
+
+        for esp in espacios:
+            for hueco_ini, hueco_fin in _huecos(_fusionar(ocupado.get((esp["id"], dia), ())), apertura, cierre):
+                inicio = hueco_ini
+                # Se busca el primer inicio del hueco donde también alcancen los recursos
+                while inicio + duracion <= hueco_fin:
+                    fin = inicio + duracion
+                    if _recursos_ok(dia, inicio, fin):
+                        resultados.append({
+                            "espacio_id": esp["id"],
+                            "espacio": esp["nombre"],
+                            "ubicacion": esp["ubicacion"],
+                            "capacidad": esp["capacidad"],
+                            "fecha": dia,
+                            "inicio": inicio.time(),
+                            "fin": fin.time(),
+                            "libre_hasta": hueco_fin.time(),
+                            "_orden": (dia, inicio.time(), esp["capacidad"] - (capacidad_min or 0)),
+                        })
+                        break
+                    inicio += PASO_BUSQUEDA
+        dia += timedelta(days=1)
+
+    resultados.sort(key=lambda x: x["_orden"])
+    for r in resultados:
+        r.pop("_orden")
+    return resultados[:limite] if limite else resultados
@@ -0,0 +1,278 @@
+"""
+Feed de eventos para FullCalendar (reservas aprobadas), por ventana y cacheable.
+
+- FullCalendar pide solo lo visible: ?start=...&end=... (ISO, end exclusivo).
+  Sin parámetros se usa una ventana por defecto y nunca se devuelve "todo".
+- Filtros opcionales: ?espacio=<id> y ?area=<id> (área de la carrera del
+  solicitante o, si no tiene carrera con área, su área legacy; igual que
+  core.exportar).
+- Validadores: una sola agregación sobre la ventana (todas las reservas, no
+  solo aprobadas, para notar cuando una deja de estarlo) da el ETag y el
+  Last-Modified. Si el navegador ya tiene esa versión responde 304 sin armar
+  los eventos; si no, los eventos salen de una consulta values().
+
+Sincronización incremental (cambios()): la primera llamada devuelve la ventana
+completa y un token; las siguientes, con ?token=..., solo las reservas creadas,
+modificadas o borradas desde entonces (eventos a reemplazar + ids a quitar).
+
+Reserva.actualizado (auto_now, indexado) es la marca de cambio: los updates
+masivos (QuerySet.update / bulk_update) lo pasan a mano. Los borrados quedan en
+ReservaEliminada. Renombrar un espacio no cambia las reservas, así que ese
+título se refresca recién con el próximo cambio en la ventana.
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, F, Max, Q
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+
+from .models import Reserva, ReservaEliminada
+
+# Estados que se muestran como "Ocupado"
+ESTADOS_CALENDARIO = ("APROBADA",)
+
+# Vista de mes = 6 semanas; se deja margen para vistas de lista más largas
+VENTANA_MAX_DIAS = 93
+VENTANA_DEFECTO_DIAS = 42
+
+# Subir si cambia el formato de los eventos (invalida los ETag ya emitidos)
+VERSION_FORMATO = 1
+
+# Tokens más viejos que esto piden la ventana completa (y las lápidas se purgan)
+RETENCION_CAMBIOS = timedelta(days=30)
+# Solape al leer cambios: cubre transacciones que terminan justo después del token
+MARGEN_SINCRONIZACION = timedelta(seconds=5)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ParametrosInvalidos(ValueError):
+    pass
+
+
+# -----------------------------
+# Parámetros
+# -----------------------------
+
+def _fecha_limite(valor: str, es_fin: bool):
+    """
+    Fecha (local) de un start/end de FullCalendar: '2030-03-02',
+    '2030-03-02T00:00:00' o '2030-03-02T00:00:00-03:00'.
+    El end es exclusivo: si cae justo a medianoche, el último día es el anterior.
+    """
+    try:
+        momento = parse_datetime(valor)
+        if momento is None:
+            dia = parse_date(valor)
+            if dia is None:
+                raise ValueError
+            return dia - timedelta(days=1) if es_fin else dia
+    except ValueError:
+        raise ParametrosInvalidos("Fecha inválida") from None
+
+    if timezone.is_aware(momento):
+        momento = timezone.localtime(momento)
+    if es_fin and momento.time() == time.min:
+        return momento.date() - timedelta(days=1)
+    return momento.date()
+
+
+def _id_opcional(params, clave):
+    valor = (params.get(clave) or "").strip()
+    if not valor:
+        return None
+    if not valor.isdigit():
+        raise ParametrosInvalidos(f"{clave} inválido")
+    return int(valor)
+
+
+def ventana_desde_request(params) -> dict:
+    """{desde, hasta, espacio, area} validados; ParametrosInvalidos si no se puede armar la ventana."""
+    start, end = params.get("start"), params.get("end")
+
+    if start:
+        desde = _fecha_limite(start, es_fin=False)
+    else:
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=hoy.weekday())  # lunes de esta semana
+    hasta = _fecha_limite(end, es_fin=True) if end else desde + timedelta(days=VENTANA_DEFECTO_DIAS - 1)
+
+    if hasta < desde:
+        raise ParametrosInvalidos("end debe ser posterior a start")
+    if (hasta - desde).days >= VENTANA_MAX_DIAS:
+        raise ParametrosInvalidos(f"La ventana no puede superar {VENTANA_MAX_DIAS} días")
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "espacio": _id_opcional(params, "espacio"),
+        "area": _id_opcional(params, "area"),
+    }
+
+
+# -----------------------------
+# Consultas
+# -----------------------------
+
+def reservas_ventana(ventana: dict):
+    """Reservas de la ventana (cualquier estado) con los filtros de espacio/área (y solicitante, si viene)."""
+    qs = Reserva.objects.filter(fecha__range=(ventana["desde"], ventana["hasta"]))
+    if ventana.get("solicitante") is not None:
+        qs = qs.filter(solicitante_id=ventana["solicitante"])
+    if ventana["espacio"] is not None:
+        qs = qs.filter(espacio_id=ventana["espacio"])
+    if ventana["area"] is not None:
+        qs = qs.filter(
+            Q(solicitante__carrera__area_id=ventana["area"])
+            | Q(solicitante__carrera__area__isnull=True, solicitante__area_id=ventana["area"])
+        )
+    return qs
+
+
+def validadores(ventana: dict, formato=VERSION_FORMATO):
+    """(etag, last_modified) de la ventana en UNA consulta. last_modified es None si no hay reservas."""
+    datos = reservas_ventana(ventana).aggregate(
+        visibles=Count("id", filter=Q(estado__in=ESTADOS_CALENDARIO)),
+        total=Count("id"),
+        ultimo=Max("actualizado"),
+    )
+    ultimo = datos["ultimo"]
+    firma = "|".join(str(x) for x in (
+        formato, ventana["desde"], ventana["hasta"], ventana["espacio"], ventana["area"], ventana.get("solicitante"),
+        datos["visibles"], datos["total"], ultimo.isoformat() if ultimo else "",
+    ))
+    etag = '"%s"' % hashlib.md5(firma.encode()).hexdigest()
+    return etag, ultimo
+
+
+def _eventos(qs) -> list:
+    filas = (
+        qs.filter(estado__in=ESTADOS_CALENDARIO)
+        .annotate(espacio_nombre=F("espacio__nombre"))
+        .values("id", "espacio_nombre", "fecha", "hora_inicio", "hora_fin")
+        .order_by("fecha", "hora_inicio")
+    )
+    return [
+        {
+            "id": r["id"],
+            "title": f"Ocupado: {r['espacio_nombre']}",
+            "start": f"{r['fecha']}T{r['hora_inicio']}",
+            "end": f"{r['fecha']}T{r['hora_fin']}",
+            "color": "#D71920",
+            "allDay": False,
+        }
+        for r in filas
+    ]
+
+
+def eventos(ventana: dict) -> list:
+    """Eventos de FullCalendar de la ventana (una consulta, sin N+1)."""
+    return _eventos(reservas_ventana(ventana))
+
+
+# -----------------------------
+# Sincronización incremental
+# -----------------------------
+
+def token_de(momento) -> str:
+    """Token opaco para el cliente: microsegundos desde epoch (UTC)."""
+    return str((momento - _EPOCH) // timedelta(microseconds=1))
+
+
+def momento_de_token(token: str):
+    token = (token or "").strip()
+    if not token.isdigit():
+        raise ParametrosInvalidos("token inválido")
+    try:
+        return _EPOCH + timedelta(microseconds=int(token))
+    except OverflowError:
+        raise ParametrosInvalidos("token inválido") from None
+
+
+def cambios(ventana: dict, token=None) -> dict:
+    """
+    {token, completo, eventos, eliminados}.
+
+    - completo=True (sin token o token vencido): `eventos` es la ventana entera
+      y el cliente reemplaza todo lo que tenía.
+    - completo=False: `eventos` son las reservas visibles cambiadas desde el
+      token (reemplazar por id) y `eliminados` los ids a quitar: borradas,
+      o cambiadas que ya no se ven (otro estado, fuera de la ventana o de los
+      filtros). Puede traer ids que el cliente nunca tuvo; se ignoran.
+    """
+    desde = momento_de_token(token) if token else None
+    ahora = timezone.now()
+    respuesta = {"token": token_de(ahora)}
+
+    if desde is None or desde < ahora - RETENCION_CAMBIOS:
+        return {**respuesta, "completo": True, "eventos": eventos(ventana), "eliminados": []}
+
+    corte = desde - MARGEN_SINCRONIZACION
+    visibles = _eventos(reservas_ventana(ventana).filter(actualizado__gte=corte))
+
+    eliminados = set(Reserva.objects.filter(actualizado__gte=corte).values_list("id", flat=True))
+    eliminados.difference_update(e["id"] for e in visibles)
+    eliminados.update(ReservaEliminada.objects.filter(eliminada__gte=corte).values_list("reserva_id", flat=True))
+
+    return {**respuesta, "completo": False, "eventos": visibles, "eliminados": sorted(eliminados)}
+
+
+def registrar_eliminacion(reserva_id) -> None:
+    """Lápida para cambios() (post_delete de Reserva); de paso purga las vencidas."""
+    ReservaEliminada.objects.create(reserva_id=reserva_id)
+    ReservaEliminada.objects.filter(eliminada__lt=timezone.now() - RETENCION_CAMBIOS).delete()
+
+
+# -----------------------------
+# Respuesta
+# -----------------------------
+
+def _con_validadores(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # El cliente guarda la respuesta pero revalida siempre (y es por usuario)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def respuesta_condicional(request, ventana: dict, construir, formato=VERSION_FORMATO):
+    """
+    304 si el cliente ya tiene la versión actual de la ventana; si no,
+    construir() (solo entonces se consultan los eventos). Ambas con ETag/Last-Modified.
+    """
+    etag, last_modified = validadores(ventana, formato)
+    no_modificado = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    return _con_validadores(no_modificado or construir(), etag, last_modified)
+
+
+def respuesta_calendario(request):
+    """GET del feed: 400 si los parámetros no sirven, 304 si no cambió nada, o la lista de eventos."""
+    try:
+        ventana = ventana_desde_request(request.GET)
+    except ParametrosInvalidos as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return respuesta_condicional(request, ventana, lambda: JsonResponse(eventos(ventana), safe=False))
+
+
+def respuesta_cambios(request):
+    """GET de la sincronización incremental (?token=... más los mismos parámetros del feed)."""
+    try:
+        ventana = ventana_desde_request(request.GET)
+        datos = cambios(ventana, request.GET.get("token"))
+    except ParametrosInvalidos as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response = JsonResponse(datos)
+    # Cada respuesta depende del token: no se guarda
+    patch_cache_control(response, private=True, no_store=True)
+    return response
@@ -0,0 +1,30 @@
+"""
+Tablas derivadas de Reserva que se mantienen por día de espacio:
+- OcupacionEspacio (reservas.ocupacion)
+- ResumenDiarioReserva (reservas.estadisticas)
+
+Las operaciones masivas (update/bulk_create/bulk_update) no disparan signals,
+así que después de ellas se llama a recalcular_dias() con los días tocados.
+
+Al terminar se envía la signal `dias_recalculados` (pares=..., origen=...), para
+que otras apps (p. ej. reportes) se enteren también de los cambios masivos.
+`origen` es la Reserva cuyo post_save/post_delete provocó el recálculo, o None
+en las operaciones masivas (quien escucha a Reserva directamente puede ignorarlo).
+"""
+from django.db import transaction
+from django.dispatch import Signal
+
+from .estadisticas import recalcular as recalcular_estadisticas
+from .ocupacion import recalcular as recalcular_ocupacion
+
+dias_recalculados = Signal()
+
+
+def recalcular_dias(pares, origen=None) -> None:
+    """Recalcula todas las tablas derivadas de los (espacio_id, fecha) indicados."""
+    pares = set(pares)
+    # Una transacción: el bloqueo de espacios de la grilla cubre también el resumen
+    with transaction.atomic():
+        recalcular_ocupacion(pares)
+        recalcular_estadisticas(pares)
+    dias_recalculados.send(sender=None, pares=pares, origen=origen)
@@ -0,0 +1,134 @@
+"""
+Tabla de hechos ResumenDiarioReserva.
+
+Una fila por (fecha, espacio, área, carrera, estado) con:
+- reservas: cantidad de reservas
+- minutos: minutos reservados (hora_fin - hora_inicio)
+- recursos: unidades de recursos pedidas
+
+Dashboards y reportes leen unos cientos de filas pre-agregadas en vez de
+recorrer Reserva -> User -> Carrera -> Area de todo un año en cada request.
+
+Se mantiene por día de espacio, igual que la grilla de ocupación: cuando cambia
+algo de un (espacio, fecha), se recalculan las filas de ese día con una consulta
+y se reemplazan en bloque.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def _modelos():
+    from .models import Reserva, ResumenDiarioReserva
+    return ResumenDiarioReserva, Reserva
+
+
+def minutos_reservados(hora_inicio, hora_fin) -> int:
+    """Minutos enteros entre hora_inicio y hora_fin (0 si faltan o están invertidas)."""
+    if not hora_inicio or not hora_fin:
+        return 0
+    base = date(2000, 1, 1)
+    segundos = (datetime.combine(base, hora_fin) - datetime.combine(base, hora_inicio)).total_seconds()
+    return max(int(segundos // 60), 0)
+
+
+def _filas_reservas(qs):
+    """(fecha, espacio_id, area_id, carrera_id, estado, hora_inicio, hora_fin, recursos) por reserva."""
+    return (
+        qs.annotate(
+            area_resumen=Coalesce(F("solicitante__carrera__area_id"), F("solicitante__area_id")),
+            recursos_resumen=Sum("recursos_asociados__cantidad"),
+        )
+        .values_list(
+            "fecha", "espacio_id", "area_resumen", "solicitante__carrera_id", "estado",
+            "hora_inicio", "hora_fin", "recursos_resumen",
+        )
+    )
+
+
+def agregar(filas) -> dict:
+    """{(fecha, espacio_id, area_id, carrera_id, estado): [reservas, minutos, recursos]}."""
+    resumen = defaultdict(lambda: [0, 0, 0])
+    for fecha, espacio_id, area_id, carrera_id, estado, hora_inicio, hora_fin, recursos in filas:
+        acumulado = resumen[(fecha, espacio_id, area_id, carrera_id, estado)]
+        acumulado[0] += 1
+        acumulado[1] += minutos_reservados(hora_inicio, hora_fin)
+        acumulado[2] += int(recursos or 0)
+    return resumen
+
+
+def _objetos(ResumenDiarioReserva, resumen):
+    return [
+        ResumenDiarioReserva(
+            fecha=fecha, espacio_id=espacio_id, area_id=area_id, carrera_id=carrera_id, estado=estado,
+            reservas=n, minutos=minutos, recursos=recursos,
+        )
+        for (fecha, espacio_id, area_id, carrera_id, estado), (n, minutos, recursos) in resumen.items()
+    ]
+
+
+def recalcular(pares) -> None:
+    """
+    Recalcula el resumen de los (espacio_id, fecha) indicados:
+    una consulta para leer las reservas, un DELETE y un INSERT masivo.
+    """
+    pares = {(e, f) for e, f in pares if e and f}
+    if not pares:
+        return
+
+    ResumenDiarioReserva, Reserva = _modelos()
+
+    filtro = Q()
+    for espacio_id, fecha in pares:
+        filtro |= Q(espacio_id=espacio_id, fecha=fecha)
+
+    resumen = agregar(_filas_reservas(Reserva.objects.filter(filtro).order_by()))
+    ResumenDiarioReserva.objects.filter(filtro).delete()
+    ResumenDiarioReserva.objects.bulk_create(_objetos(ResumenDiarioReserva, resumen))
+
+
+def reconstruir(batch_size: int = 5000) -> int:
+    """Borra y regenera el resumen completo a partir de Reserva. Devuelve filas creadas."""
+    ResumenDiarioReserva, Reserva = _modelos()
+    return reconstruir_con(ResumenDiarioReserva, Reserva, batch_size)
+
+
+def reconstruir_con(ResumenDiarioReserva, Reserva, batch_size: int = 5000) -> int:
+    """
+    Igual que reconstruir(), pero recibiendo los modelos.
+    Recorre las reservas ordenadas por fecha con un iterador y vuelca cada día
+    completo, así la memoria queda acotada a un día + un batch de filas.
+    """
+    ResumenDiarioReserva.objects.all().delete()
+
+    filas = _filas_reservas(Reserva.objects.order_by("fecha")).iterator(chunk_size=batch_size)
+
+    creadas = 0
+    pendientes_escritura = []
+    fecha_actual = None
+    dia = []
+
+    def _volcar():
+        nonlocal creadas, pendientes_escritura
+        pendientes_escritura.extend(_objetos(ResumenDiarioReserva, agregar(dia)))
+        if len(pendientes_escritura) >= batch_size:
+            ResumenDiarioReserva.objects.bulk_create(pendientes_escritura, batch_size=batch_size)
+            creadas += len(pendientes_escritura)
+            pendientes_escritura = []
+
+    for fila in filas:
+        if fila[0] != fecha_actual and dia:
+            _volcar()
+            dia = []
+        fecha_actual = fila[0]
+        dia.append(fila)
+
+    if dia:
+        _volcar()
+    if pendientes_escritura:
+        ResumenDiarioReserva.objects.bulk_create(pendientes_escritura, batch_size=batch_size)
+        creadas += len(pendientes_escritura)
+
+    return creadas
@@ -2,9 +2,22 @@ from django import forms
 from django.core.exceptions import ValidationError
 from datetime import timedelta, datetime, time
 from .models import Reserva
+from .availability import ESTADOS_ACTIVOS, MARGEN_ENTRE_RESERVAS, primer_conflicto
+from .series import REPETICIONES, PASO_REPETICION, MAX_OCURRENCIAS, expandir_fechas
 from inventario.models import Espacio
 
 class ReservaForm(forms.ModelForm):
+    # Serie opcional: repetir la misma reserva cada 1 o 2 semanas hasta una fecha
+    repeticion = forms.ChoiceField(
+        choices=[('', 'No se repite')] + list(REPETICIONES),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select', 'id': 'id_repeticion'}),
+    )
+    repetir_hasta = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control', 'id': 'id_repetir_hasta'}),
+    )
+
     class Meta:
         model = Reserva
         fields = ['espacio', 'fecha', 'hora_inicio', 'hora_fin', 'motivo', 'archivo_adjunto']
@@ -32,6 +45,26 @@ class ReservaForm(forms.ModelForm):
         if not (fecha and hora_inicio and hora_fin and espacio):
             return
 
+        # ==============================================================================
+        # Serie: fechas de todas las ocurrencias (la primera es 'fecha')
+        # ==============================================================================
+        repeticion = cleaned_data.get('repeticion')
+        repetir_hasta = cleaned_data.get('repetir_hasta')
+        cleaned_data['fechas_serie'] = [fecha]
+
+        if repeticion:
+            if not repetir_hasta:
+                self.add_error('repetir_hasta', "Indica hasta qué fecha se repite la reserva.")
+                return
+            if repetir_hasta <= fecha:
+                self.add_error('repetir_hasta', "La fecha de término de la serie debe ser posterior a la fecha de la reserva.")
+                return
+            fechas = expandir_fechas(fecha, repeticion, repetir_hasta)
+            if fechas[-1] + PASO_REPETICION[repeticion] <= repetir_hasta:
+                self.add_error('repetir_hasta', f"Una serie puede tener como máximo {MAX_OCURRENCIAS} reservas.")
+                return
+            cleaned_data['fechas_serie'] = fechas
+
         # ==============================================================================
         # 0. REGLA: Anticipación Mínima de 48 Horas
         # ==============================================================================
@@ -72,25 +105,21 @@ class ReservaForm(forms.ModelForm):
         # ==============================================================================
         # 3. REGLA: Colchón de 1 hora entre reservas (Buffer)
         # ==============================================================================
-        margen = timedelta(hours=1)
-        mi_inicio_real = datetime.combine(fecha, hora_inicio)
-        mi_fin_real = datetime.combine(fecha, hora_fin)
-        
-        rango_inicio_seguro = (mi_inicio_real - margen).time()
-        rango_fin_seguro = (mi_fin_real + margen).time()
-
-        reservas_conflicto = Reserva.objects.filter(
-            espacio=espacio,
-            fecha=fecha,
-            estado__in=['APROBADA', 'PENDIENTE']
-        ).exclude(pk=self.instance.pk)
-
-        for r in reservas_conflicto:
-            if r.hora_inicio < rango_fin_seguro and r.hora_fin > rango_inicio_seguro:
-                raise ValidationError(
-                    f"Conflicto de horario o margen de espera insuficiente. "
-                    f"Existe una reserva ocupando el bloque {r.hora_inicio} - {r.hora_fin}. "
-                    f"Recuerda que debe haber 1 hora de diferencia entre reservas."
-                )
+        conflicto = primer_conflicto(
+            espacio,
+            fecha,
+            hora_inicio,
+            hora_fin,
+            estados=ESTADOS_ACTIVOS,
+            margen=MARGEN_ENTRE_RESERVAS,
+            excluir_id=self.instance.pk,
+        )
+
+        if conflicto:
+            raise ValidationError(
+                f"Conflicto de horario o margen de espera insuficiente. "
+                f"Existe una reserva ocupando el bloque {conflicto.hora_inicio} - {conflicto.hora_fin}. "
+                f"Recuerda que debe haber 1 hora de diferencia entre reservas."
+            )
 
         return cleaned_data
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Feeds iCalendar (ICS) suscribibles: uno por espacio y uno por usuario.
+
+- URL con token firmado (django.core.signing): el cliente de calendario
+  (Google, Outlook, Apple...) no tiene sesión, así que la vista no toca
+  request.user ni la sesión. Quien tiene la URL ve el feed; se revocan todas
+  cambiando SECRET_KEY (o ICS_SALT).
+- Ventana fija alrededor de hoy (VENTANA_PASADO / VENTANA_FUTURO) y los
+  mismos validadores que el feed de FullCalendar (reservas.calendario): si
+  nada cambió en la ventana, 304 sin leer los eventos.
+- El cuerpo se genera en streaming desde un QuerySet.iterator(): la memoria
+  no crece con la cantidad de reservas.
+
+Feed de espacio: solo aprobadas, como "Ocupado" (igual que el calendario web).
+Feed de usuario: todas sus reservas; las rechazadas/canceladas van con
+STATUS:CANCELLED para que el cliente las saque.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+
+from inventario.models import Espacio
+
+from .calendario import ESTADOS_CALENDARIO, reservas_ventana, respuesta_condicional
+
+ICS_CONTENT_TYPE = "text/calendar; charset=utf-8"
+ICS_SALT = "reservas.ics"
+
+VENTANA_PASADO = timedelta(days=90)
+VENTANA_FUTURO = timedelta(days=365)
+
+# Entra en el ETag: subir si cambia el contenido de los VEVENT
+VERSION_ICS = "ics-1"
+
+# Cada cuánto se sugiere al cliente volver a pedir el feed
+REFRESCO = "PT1H"
+
+ESTADO_ICS = {
+    "PENDIENTE": "TENTATIVE",
+    "APROBADA": "CONFIRMED",
+    "FINALIZADA": "CONFIRMED",
+    "RECHAZADA": "CANCELLED",
+    "CANCELADA": "CANCELLED",
+}
+
+_CHUNK = 500
+
+
+# -----------------------------
+# Tokens
+# -----------------------------
+
+def _firmador(tipo):
+    return signing.Signer(salt=f"{ICS_SALT}.{tipo}")
+
+
+def token_espacio(espacio_id) -> str:
+    return _firmador("espacio").sign(str(espacio_id))
+
+
+def token_usuario(usuario_id) -> str:
+    return _firmador("usuario").sign(str(usuario_id))
+
+
+def _id_de_token(tipo, token) -> int:
+    try:
+        valor = _firmador(tipo).unsign(token)
+    except signing.BadSignature:
+        raise Http404("Feed no encontrado")
+    return int(valor)
+
+
+# -----------------------------
+# Formato (RFC 5545)
+# -----------------------------
+
+def _texto(valor) -> str:
+    return (
+        str(valor or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _plegar(linea: str) -> str:
+    """Líneas de máx. 75 octetos; las continuaciones empiezan con un espacio."""
+    datos = linea.encode("utf-8")
+    if len(datos) <= 75:
+        return linea + "\r\n"
+
+    partes, actual, limite = [], b"", 75
+    for caracter in linea:
+        b = caracter.encode("utf-8")
+        if len(actual) + len(b) > limite:
+            partes.append(actual.decode("utf-8"))
+            actual, limite = b"", 74
+        actual += b
+    partes.append(actual.decode("utf-8"))
+    return "\r\n ".join(partes) + "\r\n"
+
+
+def _utc(momento) -> str:
+    return momento.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _local(fecha, hora) -> str:
+    return _utc(timezone.make_aware(datetime.combine(fecha, hora)))
+
+
+def _cabecera(nombre) -> str:
+    lineas = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Reservas//Calendario//ES",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_texto(nombre)}",
+        f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+        f"REFRESH-INTERVAL;VALUE=DURATION:{REFRESCO}",
+        f"X-PUBLISHED-TTL:{REFRESCO}",
+    ]
+    return "".join(_plegar(x) for x in lineas)
+
+
+def _vevent(r, dominio, resumen, descripcion="", estado="CONFIRMED") -> str:
+    lineas = [
+        "BEGIN:VEVENT",
+        f"UID:reserva-{r['id']}@{dominio}",
+        f"DTSTAMP:{_utc(r['actualizado'])}",
+        f"LAST-MODIFIED:{_utc(r['actualizado'])}",
+        f"DTSTART:{_local(r['fecha'], r['hora_inicio'])}",
+        f"DTEND:{_local(r['fecha'], r['hora_fin'])}",
+        f"SUMMARY:{_texto(resumen)}",
+        f"LOCATION:{_texto(r['espacio__ubicacion'])}",
+        f"STATUS:{estado}",
+    ]
+    if descripcion:
+        lineas.append(f"DESCRIPTION:{_texto(descripcion)}")
+    lineas.append("END:VEVENT")
+    return "".join(_plegar(x) for x in lineas)
+
+
+def _stream(nombre, filas, vevent):
+    yield _cabecera(nombre)
+    for r in filas:
+        yield vevent(r)
+    yield "END:VCALENDAR\r\n"
+
+
+# -----------------------------
+# Feeds
+# -----------------------------
+
+def _ventana(**filtros) -> dict:
+    hoy = timezone.localdate()
+    return {
+        "desde": hoy - VENTANA_PASADO,
+        "hasta": hoy + VENTANA_FUTURO,
+        "espacio": None,
+        "area": None,
+        **filtros,
+    }
+
+
+def _filas(ventana, estados=None):
+    qs = reservas_ventana(ventana)
+    if estados is not None:
+        qs = qs.filter(estado__in=estados)
+    return (
+        qs.values("id", "fecha", "hora_inicio", "hora_fin", "estado", "motivo", "actualizado",
+                  "espacio__nombre", "espacio__ubicacion")
+        .order_by("fecha", "hora_inicio")
+        .iterator(chunk_size=_CHUNK)
+    )
+
+
+def _respuesta(request, ventana, nombre, archivo, filas, vevent):
+    def construir():
+        response = StreamingHttpResponse(_stream(nombre, filas(), vevent), content_type=ICS_CONTENT_TYPE)
+        response["Content-Disposition"] = f'inline; filename="{archivo}"'
+        return response
+
+    return respuesta_condicional(request, ventana, construir, formato=VERSION_ICS)
+
+
+def respuesta_espacio(request, token):
+    espacio_id = _id_de_token("espacio", token)
+    espacio = Espacio.objects.filter(pk=espacio_id).values("nombre").first()
+    if espacio is None:
+        raise Http404("Feed no encontrado")
+
+    dominio = request.get_host().split(":")[0]
+    ventana = _ventana(espacio=espacio_id)
+
+    def vevent(r):
+        return _vevent(r, dominio, f"Ocupado: {r['espacio__nombre']}")
+
+    return _respuesta(
+        request, ventana, f"Reservas {espacio['nombre']}", f"espacio-{espacio_id}.ics",
+        lambda: _filas(ventana, ESTADOS_CALENDARIO), vevent,
+    )
+
+
+def respuesta_usuario(request, token):
+    usuario_id = _id_de_token("usuario", token)
+    if not get_user_model().objects.filter(pk=usuario_id, is_active=True).exists():
+        raise Http404("Feed no encontrado")
+
+    dominio = request.get_host().split(":")[0]
+    ventana = _ventana(solicitante=usuario_id)
+
+    def vevent(r):
+        return _vevent(
+            r, dominio, f"Reserva: {r['espacio__nombre']}", r["motivo"], ESTADO_ICS.get(r["estado"], "CONFIRMED"),
+        )
+
+    return _respuesta(request, ventana, "Mis reservas", "mis-reservas.ics", lambda: _filas(ventana), vevent)
@@ -0,0 +1,243 @@
+"""
+Benchmark de los índices de reservas/notificaciones.
+
+Uso:
+    python manage.py benchmark_indices                 # 1.000.000 reservas
+    python manage.py benchmark_indices --reservas 200000
+
+Qué hace (TODO dentro de una transacción que se revierte al final):
+1) Siembra usuarios, espacios, recursos, reservas, recursos por reserva y notificaciones.
+2) Quita los índices declarados en Meta.indexes y mide las consultas "calientes"
+   (plan de ejecución + tiempo).
+3) Vuelve a crear los índices y repite las mediciones.
+
+No deja datos ni cambios de esquema en la base de datos.
+"""
+import random
+import time as time_mod
+from datetime import date, time, timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mide planes de ejecución y tiempos de las consultas principales con y sin índices."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reservas", type=int, default=1_000_000, help="Cantidad de reservas a sembrar.")
+        parser.add_argument("--usuarios", type=int, default=2_000)
+        parser.add_argument("--espacios", type=int, default=60)
+        parser.add_argument("--recursos", type=int, default=40)
+        parser.add_argument("--repeticiones", type=int, default=20, help="Ejecuciones por consulta.")
+        parser.add_argument("--batch", type=int, default=10_000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    # ------------------------------------------------------------------
+    # Modelos / índices
+    # ------------------------------------------------------------------
+    def _modelos_con_indices(self):
+        return [
+            apps.get_model("reservas", "Reserva"),
+            apps.get_model("reservas", "RecursoReserva"),
+            apps.get_model("notificaciones", "Notificacion"),
+        ]
+
+    def _editor(self):
+        # El schema_editor se usa sin "with": en SQLite su __enter__ exige salir de la
+        # transacción, y aquí queremos que el DDL también se revierta al final.
+        editor = connection.schema_editor(atomic=False)
+        editor.deferred_sql = []
+        return editor
+
+    def _quitar_indices(self):
+        editor = self._editor()
+        for model in self._modelos_con_indices():
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+
+    def _crear_indices(self):
+        editor = self._editor()
+        for model in self._modelos_con_indices():
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    # ------------------------------------------------------------------
+    # Siembra
+    # ------------------------------------------------------------------
+    def _sembrar(self, opts):
+        User = apps.get_model("core", "User")
+        Espacio = apps.get_model("inventario", "Espacio")
+        Recurso = apps.get_model("inventario", "Recurso")
+        Reserva = apps.get_model("reservas", "Reserva")
+        RecursoReserva = apps.get_model("reservas", "RecursoReserva")
+        Notificacion = apps.get_model("notificaciones", "Notificacion")
+
+        rnd = random.Random(opts["seed"])
+        batch = opts["batch"]
+
+        users = User.objects.bulk_create(
+            [
+                User(email=f"bench{i}@bench.local", first_name="Bench", last_name=str(i), password="!")
+                for i in range(opts["usuarios"])
+            ],
+            batch_size=batch,
+        )
+        espacios = Espacio.objects.bulk_create(
+            [Espacio(nombre=f"Sala {i}", ubicacion="Bench", capacidad=rnd.randint(10, 80)) for i in range(opts["espacios"])]
+        )
+        recursos = Recurso.objects.bulk_create(
+            [Recurso(nombre=f"Recurso {i}", codigo=f"B-{i}", stock=rnd.randint(5, 50)) for i in range(opts["recursos"])]
+        )
+
+        user_ids = [u.pk for u in users] or list(User.objects.values_list("pk", flat=True))
+        espacio_ids = [e.pk for e in espacios] or list(Espacio.objects.values_list("pk", flat=True))
+        recurso_ids = [r.pk for r in recursos] or list(Recurso.objects.values_list("pk", flat=True))
+
+        estados = ["PENDIENTE", "APROBADA", "APROBADA", "RECHAZADA", "FINALIZADA", "CANCELADA"]
+        base = date.today() - timedelta(days=365 * 2)
+
+        total = opts["reservas"]
+        creadas = 0
+        while creadas < total:
+            n = min(batch, total - creadas)
+            objs = []
+            for _ in range(n):
+                h = rnd.randint(9, 19)
+                objs.append(Reserva(
+                    solicitante_id=rnd.choice(user_ids),
+                    espacio_id=rnd.choice(espacio_ids),
+                    fecha=base + timedelta(days=rnd.randint(0, 365 * 3)),
+                    hora_inicio=time(h, 0),
+                    hora_fin=time(h + rnd.randint(1, 2), 0),
+                    motivo="bench",
+                    estado=rnd.choice(estados),
+                ))
+            Reserva.objects.bulk_create(objs, batch_size=batch)
+            creadas += n
+            self.stdout.write(f"  reservas: {creadas}/{total}", ending="\r")
+        self.stdout.write("")
+
+        # ~30% de las reservas piden recursos
+        reserva_ids = Reserva.objects.filter(motivo="bench").values_list("pk", flat=True).iterator(chunk_size=batch)
+        pendientes = []
+        for rid in reserva_ids:
+            if rnd.random() < 0.3:
+                for rec in rnd.sample(recurso_ids, k=min(len(recurso_ids), rnd.randint(1, 3))):
+                    pendientes.append(RecursoReserva(reserva_id=rid, recurso_id=rec, cantidad=rnd.randint(1, 4)))
+            if len(pendientes) >= batch:
+                RecursoReserva.objects.bulk_create(pendientes, batch_size=batch)
+                pendientes = []
+        if pendientes:
+            RecursoReserva.objects.bulk_create(pendientes, batch_size=batch)
+
+        notifs = []
+        for _ in range(total // 5):
+            notifs.append(Notificacion(
+                usuario_id=rnd.choice(user_ids), titulo="bench", mensaje="bench", leida=rnd.random() < 0.8,
+            ))
+            if len(notifs) >= batch:
+                Notificacion.objects.bulk_create(notifs, batch_size=batch)
+                notifs = []
+        if notifs:
+            Notificacion.objects.bulk_create(notifs, batch_size=batch)
+
+        return {
+            "usuario": user_ids[len(user_ids) // 2],
+            "espacio": espacio_ids[0],
+            "recursos": recurso_ids[:5],
+            "fecha": base + timedelta(days=400),
+        }
+
+    # ------------------------------------------------------------------
+    # Consultas a medir
+    # ------------------------------------------------------------------
+    def _consultas(self, muestra):
+        from reservas.availability import conflictos_espacio
+        from reservas.stock import eventos_en_bloque
+
+        Reserva = apps.get_model("reservas", "Reserva")
+        Notificacion = apps.get_model("notificaciones", "Notificacion")
+
+        fecha = muestra["fecha"]
+        return [
+            (
+                "Solapamiento espacio+fecha+estado (availability)",
+                lambda: conflictos_espacio(
+                    muestra["espacio"], fecha, time(10, 0), time(12, 0), margen=timedelta(hours=1)
+                ),
+            ),
+            (
+                "Estados del solicitante (home)",
+                lambda: Reserva.objects.filter(solicitante_id=muestra["usuario"], estado="PENDIENTE"),
+            ),
+            (
+                "Eventos de stock por bloque (stock)",
+                lambda: eventos_en_bloque(fecha, time(10, 0), time(12, 0), recurso_ids=muestra["recursos"]),
+            ),
+            (
+                "Aprobadas del mes por espacio (reportes)",
+                lambda: Reserva.objects.filter(
+                    fecha__gte=fecha, fecha__lt=fecha + timedelta(days=30), estado="APROBADA"
+                ).values("espacio_id").annotate(total=Count("id")),
+            ),
+            (
+                "No leídas del usuario (notificaciones)",
+                lambda: Notificacion.objects.filter(usuario_id=muestra["usuario"], leida=False),
+            ),
+        ]
+
+    def _medir(self, titulo, consultas, repeticiones):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {titulo} ==="))
+        resultados = {}
+        for nombre, fabrica in consultas:
+            qs = fabrica()
+            plan = qs.explain()
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time_mod.perf_counter()
+                list(fabrica())
+                tiempos.append((time_mod.perf_counter() - t0) * 1000)
+            tiempos.sort()
+            mediana = tiempos[len(tiempos) // 2]
+            resultados[nombre] = mediana
+            self.stdout.write(self.style.SUCCESS(f"\n-- {nombre}: mediana {mediana:.2f} ms"))
+            self.stdout.write(plan)
+        return resultados
+
+    # ------------------------------------------------------------------
+    def handle(self, *args, **opts):
+        t0 = time_mod.perf_counter()
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Sembrando {opts['reservas']} reservas...")
+                muestra = self._sembrar(opts)
+                self.stdout.write(f"Siembra lista en {time_mod.perf_counter() - t0:.1f} s")
+
+                consultas = self._consultas(muestra)
+
+                self._quitar_indices()
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+                antes = self._medir("SIN índices", consultas, opts["repeticiones"])
+
+                self._crear_indices()
+                despues = self._medir("CON índices", consultas, opts["repeticiones"])
+
+                self.stdout.write(self.style.MIGRATE_HEADING("\n=== Resumen (mediana ms) ==="))
+                for nombre, _ in consultas:
+                    a, d = antes[nombre], despues[nombre]
+                    factor = (a / d) if d else 0
+                    self.stdout.write(f"{nombre:<55} {a:>10.2f} -> {d:>10.2f}  (x{factor:.1f})")
+
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write(self.style.WARNING("\nTransacción revertida: la base de datos queda como estaba."))
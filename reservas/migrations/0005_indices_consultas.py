@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_recurso_codigo_alter_recurso_stock'),
+        ('reservas', '0004_alter_reserva_options_alter_reserva_archivo_adjunto_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recursoreserva',
+            index=models.Index(fields=['reserva', 'recurso', 'cantidad'], name='recres_reserva_recurso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recursoreserva',
+            index=models.Index(fields=['recurso', 'reserva'], name='recres_recurso_reserva_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['espacio', 'fecha', 'estado'], name='reserva_esp_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['solicitante', 'estado'], name='reserva_solic_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha', 'estado'], name='reserva_fecha_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'APROBADA'])), fields=['espacio', 'fecha', 'hora_inicio', 'hora_fin'], name='reserva_activa_bloque_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de reservas.ocupacion: la migración no debe depender del código
+# vivo, que puede cambiar (o desaparecer) después de que esta se escribió.
+APERTURA = 8 * 60 + 30  # 08:30 en minutos
+MINUTOS_BLOQUE = 30
+N_BLOQUES = 25  # 08:30 -> 21:00
+FUERA_DE_HORARIO = 1 << N_BLOQUES
+COLUMNA_POR_ESTADO = {'APROBADA': 'aprobadas', 'PENDIENTE': 'pendientes'}
+
+
+def _minutos(t):
+    return t.hour * 60 + t.minute + (1 if (t.second or t.microsecond) else 0)
+
+
+def _mascara(hora_inicio, hora_fin):
+    ini = _minutos(hora_inicio) - APERTURA
+    fin = _minutos(hora_fin) - APERTURA
+    total = N_BLOQUES * MINUTOS_BLOQUE
+
+    bits = FUERA_DE_HORARIO if ini < 0 or fin > total else 0
+    ini, fin = max(ini, 0), min(fin, total)
+    if fin <= ini:
+        return bits
+    for i in range(ini // MINUTOS_BLOQUE, (fin - 1) // MINUTOS_BLOQUE + 1):
+        bits |= 1 << i
+    return bits
+
+
+def construir_grilla(apps, schema_editor):
+    OcupacionEspacio = apps.get_model('reservas', 'OcupacionEspacio')
+    Reserva = apps.get_model('reservas', 'Reserva')
+
+    grilla = {}
+    filas = (
+        Reserva.objects.filter(estado__in=list(COLUMNA_POR_ESTADO))
+        .values_list('espacio_id', 'fecha', 'estado', 'hora_inicio', 'hora_fin')
+        .iterator(chunk_size=5000)
+    )
+    for espacio_id, fecha, estado, hora_inicio, hora_fin in filas:
+        if not hora_inicio or not hora_fin:
+            continue
+        dia = grilla.setdefault((espacio_id, fecha), {'aprobadas': 0, 'pendientes': 0})
+        dia[COLUMNA_POR_ESTADO[estado]] |= _mascara(hora_inicio, hora_fin)
+
+    OcupacionEspacio.objects.bulk_create(
+        [OcupacionEspacio(espacio_id=e, fecha=f, **bits) for (e, f), bits in grilla.items()],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_recurso_codigo_alter_recurso_stock'),
+        ('reservas', '0005_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionEspacio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('aprobadas', models.PositiveIntegerField(default=0, help_text='Bloques ocupados por reservas APROBADAS')),
+                ('pendientes', models.PositiveIntegerField(default=0, help_text='Bloques ocupados por reservas PENDIENTES')),
+                ('espacio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocupacion', to='inventario.espacio')),
+            ],
+            options={
+                'verbose_name': 'Ocupación de Espacio',
+                'verbose_name_plural': 'Ocupación de Espacios',
+                'constraints': [models.UniqueConstraint(fields=('espacio', 'fecha'), name='ocupacion_espacio_fecha_uniq')],
+            },
+        ),
+        migrations.RunPython(construir_grilla, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0006_ocupacionespacio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='serie',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True, verbose_name='Serie'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:39
+
+from datetime import date, datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+
+# Copia congelada de reservas.estadisticas: la migración no debe depender del
+# código vivo, que puede cambiar (o desaparecer) después de que esta se escribió.
+def _minutos(hora_inicio, hora_fin):
+    if not hora_inicio or not hora_fin:
+        return 0
+    base = date(2000, 1, 1)
+    segundos = (datetime.combine(base, hora_fin) - datetime.combine(base, hora_inicio)).total_seconds()
+    return max(int(segundos // 60), 0)
+
+
+def construir_resumen(apps, schema_editor):
+    ResumenDiarioReserva = apps.get_model('reservas', 'ResumenDiarioReserva')
+    Reserva = apps.get_model('reservas', 'Reserva')
+
+    resumen = {}
+    filas = (
+        Reserva.objects.annotate(
+            area_resumen=Coalesce(F('solicitante__carrera__area_id'), F('solicitante__area_id')),
+            recursos_resumen=Sum('recursos_asociados__cantidad'),
+        )
+        .values_list(
+            'fecha', 'espacio_id', 'area_resumen', 'solicitante__carrera_id', 'estado',
+            'hora_inicio', 'hora_fin', 'recursos_resumen',
+        )
+        .order_by()
+        .iterator(chunk_size=5000)
+    )
+    for fecha, espacio_id, area_id, carrera_id, estado, hora_inicio, hora_fin, recursos in filas:
+        acumulado = resumen.setdefault((fecha, espacio_id, area_id, carrera_id, estado), [0, 0, 0])
+        acumulado[0] += 1
+        acumulado[1] += _minutos(hora_inicio, hora_fin)
+        acumulado[2] += int(recursos or 0)
+
+    ResumenDiarioReserva.objects.bulk_create(
+        [
+            ResumenDiarioReserva(
+                fecha=fecha, espacio_id=espacio_id, area_id=area_id, carrera_id=carrera_id, estado=estado,
+                reservas=n, minutos=minutos, recursos=recursos,
+            )
+            for (fecha, espacio_id, area_id, carrera_id, estado), (n, minutos, recursos) in resumen.items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_alter_user_carrera'),
+        ('inventario', '0003_recurso_codigo_alter_recurso_stock'),
+        ('reservas', '0007_reserva_serie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'En Revisión'), ('APROBADA', 'Aprobada'), ('RECHAZADA', 'Rechazada'), ('FINALIZADA', 'Finalizada'), ('CANCELADA', 'Cancelada')], max_length=20)),
+                ('reservas', models.PositiveIntegerField(default=0)),
+                ('minutos', models.PositiveIntegerField(default=0, help_text='Minutos reservados (suma de duraciones)')),
+                ('recursos', models.PositiveIntegerField(default=0, help_text='Unidades de recursos pedidas')),
+                ('area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.area')),
+                ('carrera', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.carrera')),
+                ('espacio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_diario', to='inventario.espacio')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de reservas',
+                'verbose_name_plural': 'Resumen diario de reservas',
+                'indexes': [models.Index(fields=['fecha', 'estado'], name='resumen_fecha_estado_idx'), models.Index(fields=['espacio', 'fecha'], name='resumen_espacio_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(construir_resumen, migrations.RunPython.noop),
+    ]
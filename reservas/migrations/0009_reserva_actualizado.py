@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def desde_fecha_solicitud(apps, schema_editor):
+    # Las reservas existentes parten con su fecha de solicitud (no con la hora de la migración)
+    apps.get_model('reservas', 'Reserva').objects.update(actualizado=F('fecha_solicitud'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_resumendiarioreserva'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última modificación'),
+        ),
+        migrations.RunPython(desde_fecha_solicitud, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_recurso_codigo_alter_recurso_stock'),
+        ('reservas', '0009_reserva_actualizado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaEliminada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reserva_id', models.PositiveBigIntegerField()),
+                ('eliminada', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Reserva eliminada',
+                'verbose_name_plural': 'Reservas eliminadas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['actualizado'], name='reserva_actualizado_idx'),
+        ),
+    ]
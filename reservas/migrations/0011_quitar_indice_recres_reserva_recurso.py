@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0010_sincronizacion_calendario'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recursoreserva',
+            name='recres_reserva_recurso_idx',
+        ),
+    ]
@@ -3,13 +3,14 @@ from django.conf import settings
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from inventario.models import Espacio, Recurso
+from core.mixins import CamposRastreadosMixin
 
 def validate_file_size(value):
     limit = 5 * 1024 * 1024  # 5 MB
     if value.size > limit:
         raise ValidationError('El archivo es muy pesado. El límite es 5MB.')
 
-class Reserva(models.Model):
+class Reserva(CamposRastreadosMixin, models.Model):
     ESTADOS = (
         ('PENDIENTE', 'En Revisión'),
         ('APROBADA', 'Aprobada'),
@@ -18,6 +19,9 @@ class Reserva(models.Model):
         ('CANCELADA', 'Cancelada'),
     )
 
+    # Valores al cargar desde BD: signals de notificación y grilla de ocupación
+    campos_rastreados = ('estado', 'espacio_id', 'fecha')
+
     solicitante = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE,
@@ -41,6 +45,11 @@ class Reserva(models.Model):
     )
     
     fecha_solicitud = models.DateTimeField(auto_now_add=True)
+
+    # Última modificación: validadores del feed de calendario (ETag / Last-Modified).
+    # QuerySet.update() no lo actualiza solo: quien haga updates masivos lo pasa a mano.
+    # save(update_fields=...) lo agrega solo (ver save()).
+    actualizado = models.DateTimeField(auto_now=True, verbose_name="Última modificación")
     
     motivo_cancelacion = models.TextField(
         blank=True, 
@@ -61,6 +70,15 @@ class Reserva(models.Model):
         verbose_name="Documento Adjunto"
     )
 
+    # Reservas creadas juntas como serie semanal/quincenal comparten este identificador
+    serie = models.UUIDField(
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Serie"
+    )
+
     # Relación ManyToMany con Recurso a través de la tabla intermedia
     # Esto permite acceder a reserva.recursos.all() si fuera necesario
     recursos = models.ManyToManyField(
@@ -70,10 +88,36 @@ class Reserva(models.Model):
         blank=True
     )
 
+    def save(self, *args, **kwargs):
+        # auto_now solo se escribe en un save parcial si va en update_fields:
+        # sin esto, cancelar/aprobar/rechazar no movería la marca de cambio
+        update_fields = kwargs.get('update_fields')
+        if update_fields and 'actualizado' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'actualizado']
+        super().save(*args, **kwargs)
+
+    save.alters_data = True
+
     class Meta:
         verbose_name = "Reserva"
         verbose_name_plural = "Reservas"
         ordering = ['-fecha', '-hora_inicio']
+        indexes = [
+            # Solapamientos / calendario: espacio + día + estado
+            models.Index(fields=['espacio', 'fecha', 'estado'], name='reserva_esp_fecha_estado_idx'),
+            # Dashboard del solicitante y "Mis reservas"
+            models.Index(fields=['solicitante', 'estado'], name='reserva_solic_estado_idx'),
+            # Reportes por rango de fechas + estado
+            models.Index(fields=['fecha', 'estado'], name='reserva_fecha_estado_idx'),
+            # Sincronización incremental del calendario: "qué cambió desde X"
+            models.Index(fields=['actualizado'], name='reserva_actualizado_idx'),
+            # Parcial: solo reservas que ocupan (PENDIENTE/APROBADA), con el bloque horario
+            models.Index(
+                fields=['espacio', 'fecha', 'hora_inicio', 'hora_fin'],
+                name='reserva_activa_bloque_idx',
+                condition=models.Q(estado__in=['PENDIENTE', 'APROBADA']),
+            ),
+        ]
 
 
 def clean(self):
@@ -100,16 +144,14 @@ def clean(self):
     if not self.pk and espacio and not espacio.activo:
         raise ValidationError("Este espacio está desactivado y no se puede reservar.")
 
-    # 4) Validación de NO SOLAPAMIENTO (Básica)
-    solapamientos = Reserva.objects.filter(
-        espacio=espacio,
-        fecha=self.fecha,
-        estado='APROBADA'
-    ).exclude(id=self.id)
+    # 4) Validación de NO SOLAPAMIENTO (Básica) -> una sola consulta por rango
+    from .availability import conflictos_espacio
 
-    for r in solapamientos:
-        if self.hora_inicio < r.hora_fin and self.hora_fin > r.hora_inicio:
-            raise ValidationError("El espacio ya está ocupado (aprobado) en este horario.")
+    if conflictos_espacio(
+        espacio, self.fecha, self.hora_inicio, self.hora_fin,
+        estados=['APROBADA'], excluir_id=self.id,
+    ).exists():
+        raise ValidationError("El espacio ya está ocupado (aprobado) en este horario.")
 
     def save(self, *args, **kwargs):
         self.clean()
@@ -140,6 +182,108 @@ class RecursoReserva(models.Model):
     class Meta:
         verbose_name = "Recurso en Reserva"
         verbose_name_plural = "Recursos en Reservas"
+        indexes = [
+            # El lado reserva -> recurso ya lo cubre el índice de la FK reserva_id
+            models.Index(fields=['recurso', 'reserva'], name='recres_recurso_reserva_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cantidad}x {self.recurso.nombre} en Reserva #{self.reserva.id}"
+
+
+# ==============================================================================
+# GRILLA DE OCUPACIÓN (materializada)
+# ==============================================================================
+class OcupacionEspacio(models.Model):
+    """
+    Una fila por (espacio, fecha) con la ocupación del día como mapa de bits:
+    cada bit es un bloque de 30 minutos entre 08:30 y 21:00 (ver reservas.ocupacion).
+    Se mantiene con signals de Reserva y se puede reconstruir con
+    `python manage.py reconstruir_ocupacion`.
+    """
+    espacio = models.ForeignKey(
+        Espacio,
+        on_delete=models.CASCADE,
+        related_name='ocupacion'
+    )
+    fecha = models.DateField()
+    aprobadas = models.PositiveIntegerField(default=0, help_text="Bloques ocupados por reservas APROBADAS")
+    pendientes = models.PositiveIntegerField(default=0, help_text="Bloques ocupados por reservas PENDIENTES")
+
+    class Meta:
+        verbose_name = "Ocupación de Espacio"
+        verbose_name_plural = "Ocupación de Espacios"
+        constraints = [
+            models.UniqueConstraint(fields=['espacio', 'fecha'], name='ocupacion_espacio_fecha_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Ocupación {self.espacio_id} ({self.fecha})"
+
+# ==============================================================================
+# RESUMEN DIARIO (tabla de hechos para dashboards y reportes)
+# ==============================================================================
+class ResumenDiarioReserva(models.Model):
+    """
+    Reservas pre-agregadas por (fecha, espacio, área, carrera, estado):
+    cantidad, minutos reservados y unidades de recursos pedidas.
+    Área/carrera salen del solicitante (carrera.area o el área legacy).
+    Se mantiene con signals de Reserva/RecursoReserva (ver reservas.estadisticas)
+    y se puede reconstruir con `python manage.py reconstruir_estadisticas`.
+    """
+    fecha = models.DateField()
+    espacio = models.ForeignKey(
+        Espacio,
+        on_delete=models.CASCADE,
+        related_name='resumen_diario'
+    )
+    area = models.ForeignKey(
+        'core.Area',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    carrera = models.ForeignKey(
+        'core.Carrera',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    estado = models.CharField(max_length=20, choices=Reserva.ESTADOS)
+
+    reservas = models.PositiveIntegerField(default=0)
+    minutos = models.PositiveIntegerField(default=0, help_text="Minutos reservados (suma de duraciones)")
+    recursos = models.PositiveIntegerField(default=0, help_text="Unidades de recursos pedidas")
+
+    class Meta:
+        verbose_name = "Resumen diario de reservas"
+        verbose_name_plural = "Resumen diario de reservas"
+        indexes = [
+            models.Index(fields=['fecha', 'estado'], name='resumen_fecha_estado_idx'),
+            models.Index(fields=['espacio', 'fecha'], name='resumen_espacio_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Resumen {self.fecha} espacio {self.espacio_id} ({self.estado})"
+
+
+# ==============================================================================
+# RESERVAS ELIMINADAS (lápidas para la sincronización del calendario)
+# ==============================================================================
+class ReservaEliminada(models.Model):
+    """
+    Registro de una reserva borrada: Reserva.actualizado cubre altas y cambios,
+    pero una fila borrada ya no aparece en "qué cambió desde X". Se crea con el
+    post_delete de Reserva y se purga pasado reservas.calendario.RETENCION_CAMBIOS.
+    """
+    reserva_id = models.PositiveBigIntegerField()
+    eliminada = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Reserva eliminada"
+        verbose_name_plural = "Reservas eliminadas"
 
     def __str__(self):
-        return f"{self.cantidad}x {self.recurso.nombre} en Reserva #{self.reserva.id}"
\ No newline at end of file
+        return f"Reserva #{self.reserva_id} eliminada ({self.eliminada:%Y-%m-%d %H:%M})"
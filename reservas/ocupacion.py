@@ -0,0 +1,244 @@
+"""
+Grilla de ocupación materializada (OcupacionEspacio).
+
+Cada (espacio, fecha) guarda dos mapas de bits de 30 minutos entre 08:30 y
+21:00 (el horario que exige ReservaForm): uno para reservas APROBADAS y otro
+para PENDIENTES. El bit i representa el bloque [08:30 + 30*i, 08:30 + 30*(i+1)).
+
+- Una reserva marca todos los bloques que toca (aunque sea parcialmente).
+- Si una reserva cae fuera del horario, se marca además el bit FUERA_DE_HORARIO:
+  en esos días la grilla no sirve como respuesta rápida y se consulta Reserva.
+
+Así, "bits en cero" significa con certeza "libre", y solo cuando hay bits
+encendidos hace falta la consulta exacta sobre Reserva.
+
+Para que eso valga con guardados concurrentes, recalcular() bloquea los
+espacios (select_for_update) antes de leer sus reservas: dos reservas del mismo
+espacio se recalculan de a una y la segunda ya ve la primera; sin el bloqueo
+ganaría el último en escribir y la fila podría perder una reserva.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+HORA_APERTURA = time(8, 30)
+HORA_CIERRE = time(21, 0)
+MINUTOS_BLOQUE = 30
+N_BLOQUES = 25  # 08:30 -> 21:00
+FUERA_DE_HORARIO = 1 << N_BLOQUES
+
+# Columna de la grilla según el estado de la reserva
+COLUMNA_POR_ESTADO = {
+    "APROBADA": "aprobadas",
+    "PENDIENTE": "pendientes",
+}
+
+
+def _minutos(t) -> int:
+    return t.hour * 60 + t.minute + (1 if (t.second or t.microsecond) else 0)
+
+
+def mascara(hora_inicio, hora_fin) -> int:
+    """Bits de los bloques que se cruzan con [hora_inicio, hora_fin)."""
+    apertura = _minutos(HORA_APERTURA)
+    ini = _minutos(hora_inicio) - apertura
+    fin = _minutos(hora_fin) - apertura
+    total = N_BLOQUES * MINUTOS_BLOQUE
+
+    bits = 0
+    if ini < 0 or fin > total:
+        bits |= FUERA_DE_HORARIO
+
+    ini = max(ini, 0)
+    fin = min(fin, total)
+    if fin <= ini:
+        return bits
+
+    primero = ini // MINUTOS_BLOQUE
+    ultimo = (fin - 1) // MINUTOS_BLOQUE
+    for i in range(primero, ultimo + 1):
+        bits |= 1 << i
+    return bits
+
+
+def bloque(i):
+    """(inicio, fin) como time del bloque i."""
+    base = datetime.combine(date(2000, 1, 1), HORA_APERTURA)
+    ini = base + timedelta(minutes=MINUTOS_BLOQUE * i)
+    return ini.time(), (ini + timedelta(minutes=MINUTOS_BLOQUE)).time()
+
+
+def bloques_libres(bits: int):
+    """Lista de tramos libres [(inicio, fin), ...] uniendo bloques contiguos sin ocupar."""
+    tramos = []
+    inicio = None
+    for i in range(N_BLOQUES):
+        libre = not (bits >> i) & 1
+        if libre and inicio is None:
+            inicio = i
+        if not libre and inicio is not None:
+            tramos.append((bloque(inicio)[0], bloque(i - 1)[1]))
+            inicio = None
+    if inicio is not None:
+        tramos.append((bloque(inicio)[0], bloque(N_BLOQUES - 1)[1]))
+    return tramos
+
+
+def calcular_bitmaps(filas) -> dict:
+    """
+    filas: iterable de (espacio_id, fecha, estado, hora_inicio, hora_fin).
+    Devuelve {(espacio_id, fecha): {"aprobadas": int, "pendientes": int}}.
+    """
+    grilla = defaultdict(lambda: {"aprobadas": 0, "pendientes": 0})
+    for espacio_id, fecha, estado, hora_inicio, hora_fin in filas:
+        columna = COLUMNA_POR_ESTADO.get(estado)
+        if columna is None or not hora_inicio or not hora_fin:
+            continue
+        grilla[(espacio_id, fecha)][columna] |= mascara(hora_inicio, hora_fin)
+    return grilla
+
+
+def _modelos():
+    from .models import OcupacionEspacio, Reserva
+    return OcupacionEspacio, Reserva
+
+
+def recalcular(pares) -> None:
+    """
+    Recalcula la grilla para los (espacio_id, fecha) indicados.
+    Bloquea los espacios, lee las reservas en una consulta y escribe con un upsert masivo.
+    Dentro de una transacción mayor el bloqueo dura hasta que esta termina.
+    """
+    pares = {(e, f) for e, f in pares if e and f}
+    if not pares:
+        return
+
+    OcupacionEspacio, Reserva = _modelos()
+
+    with transaction.atomic():
+        _bloquear_espacios(OcupacionEspacio, {e for e, _ in pares})
+        _recalcular(OcupacionEspacio, Reserva, pares)
+
+
+def _bloquear_espacios(OcupacionEspacio, espacio_ids) -> None:
+    # Siempre en el mismo orden (por id) para no provocar deadlocks entre dos recálculos
+    Espacio = OcupacionEspacio._meta.get_field("espacio").related_model
+    list(Espacio.objects.select_for_update().filter(pk__in=espacio_ids).order_by("pk").values_list("pk", flat=True))
+
+
+def _recalcular(OcupacionEspacio, Reserva, pares) -> None:
+    filtro = Q()
+    for espacio_id, fecha in pares:
+        filtro |= Q(espacio_id=espacio_id, fecha=fecha)
+
+    filas = (
+        Reserva.objects.filter(filtro, estado__in=list(COLUMNA_POR_ESTADO))
+        .values_list("espacio_id", "fecha", "estado", "hora_inicio", "hora_fin")
+        .order_by()
+    )
+    grilla = calcular_bitmaps(filas)
+
+    objs = [
+        OcupacionEspacio(
+            espacio_id=espacio_id,
+            fecha=fecha,
+            aprobadas=grilla.get((espacio_id, fecha), {}).get("aprobadas", 0),
+            pendientes=grilla.get((espacio_id, fecha), {}).get("pendientes", 0),
+        )
+        for espacio_id, fecha in pares
+    ]
+    OcupacionEspacio.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=["espacio", "fecha"],
+        update_fields=["aprobadas", "pendientes"],
+    )
+
+
+def reconstruir(batch_size: int = 5000) -> int:
+    """Borra y regenera la grilla completa a partir de Reserva. Devuelve filas creadas."""
+    OcupacionEspacio, Reserva = _modelos()
+    return reconstruir_con(OcupacionEspacio, Reserva, batch_size)
+
+
+def reconstruir_con(OcupacionEspacio, Reserva, batch_size: int = 5000) -> int:
+    """
+    Igual que reconstruir(), pero recibiendo los modelos.
+
+    Recorre las reservas activas ordenadas por (espacio, fecha) con un iterador,
+    así la memoria queda acotada a un día de un espacio + un batch de filas.
+    """
+    OcupacionEspacio.objects.all().delete()
+
+    filas = (
+        Reserva.objects.filter(estado__in=list(COLUMNA_POR_ESTADO))
+        .values_list("espacio_id", "fecha", "estado", "hora_inicio", "hora_fin")
+        .order_by("espacio_id", "fecha")
+        .iterator(chunk_size=batch_size)
+    )
+
+    creadas = 0
+    pendientes_escritura = []
+    clave_actual = None
+    dia = []
+
+    def _volcar():
+        for (espacio_id, fecha), bits in calcular_bitmaps(dia).items():
+            pendientes_escritura.append(OcupacionEspacio(
+                espacio_id=espacio_id, fecha=fecha,
+                aprobadas=bits["aprobadas"], pendientes=bits["pendientes"],
+            ))
+
+    for fila in filas:
+        clave = (fila[0], fila[1])
+        if clave != clave_actual and dia:
+            _volcar()
+            dia = []
+            if len(pendientes_escritura) >= batch_size:
+                OcupacionEspacio.objects.bulk_create(pendientes_escritura, batch_size=batch_size)
+                creadas += len(pendientes_escritura)
+                pendientes_escritura = []
+        clave_actual = clave
+        dia.append(fila)
+
+    if dia:
+        _volcar()
+    if pendientes_escritura:
+        OcupacionEspacio.objects.bulk_create(pendientes_escritura, batch_size=batch_size)
+        creadas += len(pendientes_escritura)
+
+    return creadas
+
+
+def bits_del_dia(espacio_id, fecha, estados=("PENDIENTE", "APROBADA")):
+    """
+    Bits ocupados del día para los estados pedidos, leyendo UNA fila de la grilla.
+    Devuelve 0 si no hay fila (sin reservas activas ese día).
+    """
+    OcupacionEspacio, _ = _modelos()
+    columnas = [COLUMNA_POR_ESTADO[e] for e in estados if e in COLUMNA_POR_ESTADO]
+    if not columnas:
+        return 0
+    fila = OcupacionEspacio.objects.filter(espacio_id=espacio_id, fecha=fecha).values_list(*columnas).first()
+    bits = 0
+    for valor in fila or ():
+        bits |= int(valor or 0)
+    return bits
+
+
+def libre_segun_grilla(espacio_id, fecha, hora_inicio, hora_fin, estados=("PENDIENTE", "APROBADA")) -> bool:
+    """
+    True si la grilla garantiza que el bloque está libre.
+    False significa "no se sabe": hay que consultar Reserva para confirmar.
+    """
+    if set(estados) - set(COLUMNA_POR_ESTADO):
+        return False
+    # Lo que el pedido tenga fuera de horario no puede chocar con nada "dentro":
+    # las reservas fuera de horario encienden FUERA_DE_HORARIO en el día.
+    pedido = mascara(hora_inicio, hora_fin) & ~FUERA_DE_HORARIO
+    ocupado = bits_del_dia(espacio_id, fecha, estados)
+    if ocupado & FUERA_DE_HORARIO:
+        return False
+    return not (ocupado & pedido)
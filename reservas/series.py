@@ -0,0 +1,196 @@
+"""
+Reservas recurrentes (series semanales / quincenales).
+
+Un docente que pide la misma sala todas las semanas del semestre genera UNA
+solicitud: la serie se expande en fechas, se valida completa contra las
+reservas existentes y el stock en una pasada masiva (consultas fijas, no una
+por ocurrencia), se inserta con bulk_create y se avisa a los admins con una
+sola notificación.
+"""
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.urls import reverse
+
+from inventario.models import Recurso
+
+from .availability import ESTADOS_ACTIVOS, MARGEN_ENTRE_RESERVAS, rango_con_margen
+from .models import Reserva, RecursoReserva
+from .derivados import recalcular_dias
+from .stock import pico_concurrente
+
+REPETICIONES = (
+    ('SEMANAL', 'Cada semana'),
+    ('QUINCENAL', 'Cada 2 semanas'),
+)
+PASO_REPETICION = {
+    'SEMANAL': timedelta(weeks=1),
+    'QUINCENAL': timedelta(weeks=2),
+}
+MAX_OCURRENCIAS = 40
+
+
+class SerieError(Exception):
+    """La serie no se puede crear; `errores` trae un mensaje por ocurrencia con problemas."""
+
+    def __init__(self, errores):
+        self.errores = errores
+        super().__init__("; ".join(errores))
+
+
+def expandir_fechas(fecha, repeticion, hasta):
+    """Fechas de la serie desde `fecha` hasta `hasta` (inclusive)."""
+    paso = PASO_REPETICION[repeticion]
+    fechas = []
+    actual = fecha
+    while actual <= hasta and len(fechas) < MAX_OCURRENCIAS:
+        fechas.append(actual)
+        actual += paso
+    return fechas
+
+
+def validar_serie(espacio, fechas, hora_inicio, hora_fin, recursos_pedidos=None, margen=MARGEN_ENTRE_RESERVAS):
+    """
+    Lista de errores (vacía si la serie completa es válida).
+
+    Consultas: 1 para choques de espacio en TODAS las fechas, y si hay recursos,
+    1 para su stock + 1 para sus eventos en esas fechas.
+    """
+    errores = []
+    recursos_pedidos = recursos_pedidos or {}
+
+    # --- Espacio: choques + colchón en todas las fechas a la vez ---
+    desde, hasta = rango_con_margen(fechas[0], hora_inicio, hora_fin, margen)
+    choques = (
+        Reserva.objects.filter(
+            espacio=espacio,
+            fecha__in=fechas,
+            estado__in=list(ESTADOS_ACTIVOS),
+            hora_inicio__lt=hasta,
+            hora_fin__gt=desde,
+        )
+        .values_list("fecha", "hora_inicio", "hora_fin")
+        .order_by("fecha", "hora_inicio")
+    )
+    vistos = set()
+    for fecha, ini, fin in choques:
+        if fecha in vistos:
+            continue
+        vistos.add(fecha)
+        errores.append(
+            f"{fecha:%d-%m-%Y}: el espacio ya tiene una reserva {ini:%H:%M} - {fin:%H:%M} "
+            f"(recuerda el margen de 1 hora entre reservas)."
+        )
+
+    # --- Recursos: pico de uso por fecha ---
+    if recursos_pedidos:
+        recursos = Recurso.objects.in_bulk(list(recursos_pedidos))
+        for rid in recursos_pedidos:
+            if rid not in recursos:
+                errores.append(f"Recurso #{rid} no existe.")
+
+        eventos = defaultdict(list)
+        filas = RecursoReserva.objects.filter(
+            recurso_id__in=list(recursos),
+            reserva__fecha__in=fechas,
+            reserva__estado__in=list(ESTADOS_ACTIVOS),
+            reserva__hora_inicio__lt=hora_fin,
+            reserva__hora_fin__gt=hora_inicio,
+        ).values_list("reserva__fecha", "recurso_id", "reserva__hora_inicio", "reserva__hora_fin", "cantidad")
+        for fecha, rid, ini, fin, cant in filas:
+            eventos[fecha].append((rid, ini, fin, cant))
+
+        for fecha in fechas:
+            pico = pico_concurrente(eventos.get(fecha, ()), hora_inicio, hora_fin)
+            for rid, cantidad in recursos_pedidos.items():
+                recurso = recursos.get(rid)
+                if recurso is None:
+                    continue
+                disponible = max(int(recurso.stock or 0) - pico.get(rid, 0), 0)
+                if disponible < cantidad:
+                    errores.append(
+                        f"{fecha:%d-%m-%Y}: stock insuficiente para {recurso.nombre}. "
+                        f"Disponible: {disponible}, Pedido: {cantidad}"
+                    )
+
+    return errores
+
+
+def crear_serie(solicitante, espacio, fechas, hora_inicio, hora_fin, motivo, archivo_adjunto=None, recursos_pedidos=None):
+    """
+    Valida y crea todas las ocurrencias en una transacción.
+    Lanza SerieError si alguna ocurrencia no se puede reservar (no se crea ninguna).
+    Devuelve la lista de reservas creadas.
+    """
+    recursos_pedidos = {int(k): int(v) for k, v in (recursos_pedidos or {}).items() if int(v) > 0}
+
+    # El storage no participa de la transacción: si algo falla después de guardar el
+    # adjunto, el rollback deja el archivo huérfano y hay que borrarlo a mano.
+    campo = Reserva._meta.get_field("archivo_adjunto")
+    nombre_adjunto = None
+    try:
+        with transaction.atomic():
+            # Bloqueo de los recursos pedidos mientras se valida e inserta
+            if recursos_pedidos:
+                list(Recurso.objects.select_for_update().filter(id__in=list(recursos_pedidos)))
+
+            errores = validar_serie(espacio, fechas, hora_inicio, hora_fin, recursos_pedidos)
+            if errores:
+                raise SerieError(errores)
+
+            # El adjunto se guarda UNA vez y todas las ocurrencias apuntan al mismo archivo
+            if archivo_adjunto:
+                nombre_adjunto = campo.storage.save(
+                    campo.generate_filename(None, archivo_adjunto.name), archivo_adjunto
+                )
+
+            serie_id = uuid.uuid4()
+            reservas = Reserva.objects.bulk_create([
+                Reserva(
+                    solicitante=solicitante,
+                    espacio=espacio,
+                    fecha=fecha,
+                    hora_inicio=hora_inicio,
+                    hora_fin=hora_fin,
+                    motivo=motivo,
+                    archivo_adjunto=nombre_adjunto,
+                    serie=serie_id,
+                )
+                for fecha in fechas
+            ])
+
+            if recursos_pedidos:
+                RecursoReserva.objects.bulk_create([
+                    RecursoReserva(reserva=r, recurso_id=rid, cantidad=cant)
+                    for r in reservas
+                    for rid, cant in recursos_pedidos.items()
+                ])
+
+            # bulk_create no dispara signals: tablas derivadas y aviso a admins se hacen aquí
+            recalcular_dias({(espacio.pk, fecha) for fecha in fechas})
+            _notificar_admins_serie(solicitante, espacio, fechas, hora_inicio, hora_fin)
+    except BaseException:
+        if nombre_adjunto:
+            campo.storage.delete(nombre_adjunto)
+        raise
+
+    return reservas
+
+
+def _notificar_admins_serie(solicitante, espacio, fechas, hora_inicio, hora_fin):
+    from notificaciones.signals import _admins_qs
+    from notificaciones.utils import notificar_muchos
+
+    try:
+        url = reverse("gestion_reservas")
+    except Exception:
+        url = ""
+
+    titulo = "Nueva solicitud de reserva (serie)"
+    mensaje = (
+        f"{solicitante} solicitó {espacio} {len(fechas)} veces "
+        f"entre {fechas[0]} y {fechas[-1]} ({hora_inicio}-{hora_fin})."
+    )
+    notificar_muchos(_admins_qs(), titulo, mensaje, level="INFO", url=url)
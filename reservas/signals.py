@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Carrera
+
+from .calendario import registrar_eliminacion
+from .derivados import recalcular_dias
+from .estadisticas import recalcular as recalcular_estadisticas
+from .models import Reserva, RecursoReserva
+
+
+def _claves_ocupacion(instance):
+    # Si cambió el espacio o la fecha, también se recalcula el día original
+    claves = {(instance.espacio_id, instance.fecha)}
+    if instance.tiene_original("espacio_id") and instance.tiene_original("fecha"):
+        claves.add((instance.valor_original("espacio_id"), instance.valor_original("fecha")))
+    return claves
+
+
+def _claves_recurso_reserva(instance):
+    return set(Reserva.objects.filter(pk=instance.reserva_id).values_list("espacio_id", "fecha"))
+
+
+def _claves_solicitantes(**filtro):
+    return set(Reserva.objects.filter(**filtro).values_list("espacio_id", "fecha").distinct())
+
+
+# =============================================================================
+# GRILLA DE OCUPACIÓN + RESUMEN DIARIO: se recalcula el/los día(s) tocados por la reserva
+# =============================================================================
+@receiver(post_save, sender=Reserva)
+def ocupacion_reserva_guardada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    recalcular_dias(_claves_ocupacion(instance), origen=instance)
+
+
+@receiver(post_delete, sender=Reserva)
+def ocupacion_reserva_eliminada(sender, instance, **kwargs):
+    recalcular_dias(_claves_ocupacion(instance), origen=instance)
+
+
+# =============================================================================
+# CALENDARIO: los borrados quedan registrados para la sincronización incremental
+# =============================================================================
+@receiver(post_delete, sender=Reserva)
+def calendario_reserva_eliminada(sender, instance, **kwargs):
+    registrar_eliminacion(instance.pk)
+
+
+# =============================================================================
+# RESUMEN DIARIO: los recursos pedidos cuentan en el día de su reserva
+# =============================================================================
+@receiver(post_save, sender=RecursoReserva)
+def resumen_recurso_guardado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    recalcular_estadisticas(_claves_recurso_reserva(instance))
+
+
+@receiver(post_delete, sender=RecursoReserva)
+def resumen_recurso_eliminado(sender, instance, origin=None, **kwargs):
+    # Borrado en cascada desde la reserva: su propio post_delete ya recalcula el día
+    if isinstance(origin, Reserva):
+        return
+    recalcular_estadisticas(_claves_recurso_reserva(instance))
+
+
+# =============================================================================
+# RESUMEN DIARIO: el área/carrera del solicitante se copia en cada fila, así que
+# cambiarla (en el usuario o en su carrera) recalcula los días de sus reservas
+# =============================================================================
+@receiver(post_save, sender=get_user_model())
+def resumen_usuario_guardado(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    if instance.campo_cambio("carrera_id") or instance.campo_cambio("area_id"):
+        recalcular_dias(_claves_solicitantes(solicitante_id=instance.pk))
+
+
+@receiver(post_save, sender=Carrera)
+def resumen_carrera_guardada(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    if instance.campo_cambio("area_id"):
+        recalcular_dias(_claves_solicitantes(solicitante__carrera_id=instance.pk))
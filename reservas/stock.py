@@ -0,0 +1,139 @@
+"""
+Servicio de stock de recursos.
+
+El stock ocupado de un recurso en un bloque horario NO es la suma de todas
+las reservas que se cruzan con el bloque: dos reservas 10:00-11:00 y
+11:00-12:00 se cruzan con un bloque 10:00-12:00 pero nunca usan el recurso
+al mismo tiempo. Lo que importa es el MÁXIMO uso simultáneo (pico) dentro
+del bloque, que se calcula con un barrido (sweep-line) de eventos
+inicio/fin.
+
+Todo se resuelve con dos consultas, sin importar cuántos recursos existan:
+1) los recursos (id, nombre, stock)
+2) los eventos de las reservas que se cruzan con el bloque
+y un solo barrido en memoria que procesa todos los recursos a la vez.
+"""
+from collections import defaultdict
+from datetime import time
+
+from django.utils.dateparse import parse_time
+
+from inventario.models import Recurso
+
+from .availability import ESTADOS_ACTIVOS
+from .models import RecursoReserva
+
+
+def _como_time(valor):
+    if isinstance(valor, time) or valor is None:
+        return valor
+    try:
+        return parse_time(str(valor))
+    except ValueError:
+        return None
+
+
+def eventos_en_bloque(fecha, hora_inicio, hora_fin, recurso_ids=None, estados=ESTADOS_ACTIVOS, excluir_reserva_id=None):
+    """
+    Filas (recurso_id, inicio, fin, cantidad) de las reservas que se cruzan con el bloque.
+    Una sola consulta con values_list (sin instanciar modelos).
+    """
+    qs = RecursoReserva.objects.filter(
+        reserva__estado__in=list(estados),
+        reserva__fecha=fecha,
+        reserva__hora_inicio__lt=hora_fin,
+        reserva__hora_fin__gt=hora_inicio,
+    )
+    if recurso_ids is not None:
+        qs = qs.filter(recurso_id__in=list(recurso_ids))
+    if excluir_reserva_id:
+        qs = qs.exclude(reserva_id=excluir_reserva_id)
+
+    return qs.values_list("recurso_id", "reserva__hora_inicio", "reserva__hora_fin", "cantidad")
+
+
+def pico_concurrente(filas, hora_inicio=None, hora_fin=None) -> dict:
+    """
+    Barrido de eventos: devuelve {recurso_id: uso simultáneo máximo}.
+
+    - filas: iterable de (recurso_id, inicio, fin, cantidad).
+    - hora_inicio/hora_fin: recorta los intervalos al bloque consultado.
+
+    Los intervalos son semiabiertos [inicio, fin): una reserva que termina
+    a las 11:00 no choca con otra que empieza a las 11:00, por eso a igual
+    hora los eventos de salida (-) se procesan antes que los de entrada (+).
+    """
+    eventos = []
+    for recurso_id, inicio, fin, cantidad in filas:
+        if hora_inicio is not None and inicio < hora_inicio:
+            inicio = hora_inicio
+        if hora_fin is not None and fin > hora_fin:
+            fin = hora_fin
+        if fin <= inicio or not cantidad:
+            continue
+        eventos.append((inicio, cantidad, recurso_id))
+        eventos.append((fin, -cantidad, recurso_id))
+
+    eventos.sort(key=lambda e: (e[0], e[1]))
+
+    actual = defaultdict(int)
+    pico = defaultdict(int)
+    for _hora, delta, recurso_id in eventos:
+        actual[recurso_id] += delta
+        if actual[recurso_id] > pico[recurso_id]:
+            pico[recurso_id] = actual[recurso_id]
+    return dict(pico)
+
+
+def uso_maximo(fecha, hora_inicio, hora_fin, recurso_ids=None, estados=ESTADOS_ACTIVOS, excluir_reserva_id=None) -> dict:
+    """{recurso_id: pico de unidades ocupadas} dentro del bloque."""
+    hora_inicio = _como_time(hora_inicio)
+    hora_fin = _como_time(hora_fin)
+    filas = eventos_en_bloque(fecha, hora_inicio, hora_fin, recurso_ids, estados, excluir_reserva_id)
+    return pico_concurrente(filas, hora_inicio, hora_fin)
+
+
+def stock_snapshot(fecha=None, hora_inicio=None, hora_fin=None, recurso_ids=None, recursos=None,
+                   estados=ESTADOS_ACTIVOS, excluir_reserva_id=None):
+    """
+    Lista de dicts {id, nombre, total, ocupado, disponible} ordenada por nombre.
+
+    - Si falta fecha u horas, 'ocupado' es 0 (solo stock físico).
+    - recurso_ids: limita el cálculo a esos recursos (ej: el carrito de crear_reserva).
+    - recursos: QuerySet base opcional (ej: recursos filtrados por área).
+    - 'ocupado' es el pico de uso simultáneo dentro del bloque.
+    """
+    qs = recursos if recursos is not None else Recurso.objects.all()
+    if recurso_ids is not None:
+        qs = qs.filter(id__in=list(recurso_ids))
+
+    filas = list(qs.values("id", "nombre", "stock").order_by("nombre"))
+    hora_inicio = _como_time(hora_inicio)
+    hora_fin = _como_time(hora_fin)
+
+    ocupados = {}
+    if filas and fecha and hora_inicio and hora_fin:
+        ocupados = uso_maximo(
+            fecha, hora_inicio, hora_fin,
+            recurso_ids=[r["id"] for r in filas] if recurso_ids is not None else None,
+            estados=estados,
+            excluir_reserva_id=excluir_reserva_id,
+        )
+
+    data = []
+    for r in filas:
+        total = int(r["stock"] or 0)
+        ocupado = int(ocupados.get(r["id"], 0))
+        data.append({
+            "id": r["id"],
+            "nombre": r["nombre"],
+            "total": total,
+            "ocupado": ocupado,
+            "disponible": max(total - ocupado, 0),
+        })
+    return data
+
+
+def stock_por_id(*args, **kwargs):
+    """Igual que stock_snapshot, pero indexado por id de recurso."""
+    return {x["id"]: x for x in stock_snapshot(*args, **kwargs)}
@@ -1,3 +1,728 @@
-from django.test import TestCase
+import tempfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Area, Carrera, User
+from inventario.models import Espacio, Recurso
+from notificaciones.models import Notificacion
+
+from .aprobacion import aprobar_lote, rechazar_lote
+from .availability import buscar_bloques_libres, espacio_disponible, primer_conflicto
+from .calendario import MARGEN_SINCRONIZACION, token_de
+from .estadisticas import reconstruir
+from .ics import token_espacio, token_usuario
+from .models import OcupacionEspacio, Reserva, RecursoReserva, ResumenDiarioReserva
+from .ocupacion import FUERA_DE_HORARIO, mascara, reconstruir as reconstruir_ocupacion
+from .ocupacion import recalcular as recalcular_ocupacion
+from .series import MAX_OCURRENCIAS, SerieError, crear_serie, expandir_fechas
+from .stock import pico_concurrente, stock_snapshot
+
+MEDIA_TEMPORAL = tempfile.mkdtemp()
+
+
+def _archivos(carpeta):
+    return [p for p in Path(carpeta).rglob("*") if p.is_file()]
+
+
+def _filas_resumen():
+    return sorted(
+        ResumenDiarioReserva.objects.values_list(
+            "fecha", "espacio_id", "area_id", "carrera_id", "estado", "reservas", "minutos", "recursos",
+        )
+    )
+
+
+class ResumenDiarioReservaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        area = Area.objects.create(nombre="Salud")
+        cls.carrera = Carrera.objects.create(nombre="Enfermería", codigo="ENF", area=area)
+        cls.usuario = User.objects.create_user(
+            email="docente@test.cl", password="x", first_name="D", last_name="C", carrera=cls.carrera,
+        )
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        cls.otro_espacio = Espacio.objects.create(nombre="Lab 2", ubicacion="B", capacidad=20)
+        cls.recurso = Recurso.objects.create(nombre="Notebook", codigo="N1", stock=10)
+
+    def _reserva(self, dia, h1, h2, **extra):
+        return Reserva.objects.create(
+            solicitante=self.usuario, espacio=self.espacio, fecha=date(2030, 3, dia),
+            hora_inicio=time(h1), hora_fin=time(h2), motivo="x", **extra,
+        )
+
+    def test_signals_mantienen_el_resumen_igual_que_reconstruir(self):
+        a = self._reserva(4, 9, 11)
+        b = self._reserva(4, 14, 15, estado="APROBADA")
+        c = self._reserva(5, 10, 12)
+        RecursoReserva.objects.create(reserva=a, recurso=self.recurso, cantidad=3)
+        rr = RecursoReserva.objects.create(reserva=b, recurso=self.recurso, cantidad=2)
+
+        a.estado = "APROBADA"
+        a.save()
+        c.espacio = self.otro_espacio
+        c.fecha = date(2030, 3, 6)
+        c.save()
+        rr.delete()
+        b.delete()
+
+        incremental = _filas_resumen()
+        reconstruir()
+        self.assertEqual(incremental, _filas_resumen())
+
+        self.assertEqual(incremental, [
+            (date(2030, 3, 4), self.espacio.pk, self.carrera.area_id, self.carrera.pk, "APROBADA", 1, 120, 3),
+            (date(2030, 3, 6), self.otro_espacio.pk, self.carrera.area_id, self.carrera.pk, "PENDIENTE", 1, 120, 0),
+        ])
+
+    def test_cambiar_carrera_o_area_del_solicitante_recalcula_el_resumen(self):
+        self._reserva(4, 9, 11)
+        self._reserva(5, 10, 12, estado="APROBADA")
+        otra_area = Area.objects.create(nombre="Ingeniería")
+        otra_carrera = Carrera.objects.create(nombre="Informática", codigo="INF", area=otra_area)
+
+        self.usuario.carrera = otra_carrera
+        self.usuario.save()
+        self.assertEqual(
+            {(f[2], f[3]) for f in _filas_resumen()}, {(otra_area.pk, otra_carrera.pk)},
+        )
+
+        # El área de la carrera cambia sin tocar al usuario (su área legacy queda vieja)
+        tercera_area = Area.objects.create(nombre="Educación")
+        otra_carrera.area = tercera_area
+        otra_carrera.save(update_fields=["area"])
+        incremental = _filas_resumen()
+        self.assertEqual({(f[2], f[3]) for f in incremental}, {(tercera_area.pk, otra_carrera.pk)})
+
+        reconstruir()
+        self.assertEqual(incremental, _filas_resumen())
+
+        # Guardar sin cambiar área/carrera no recalcula nada
+        with self.assertNumQueries(1):  # solo el UPDATE (la versión de reportes sube al confirmar)
+            otra_carrera.save(update_fields=["nombre"])
+
+
+class CalendarioFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.salud = Area.objects.create(nombre="Salud")
+        otra_area = Area.objects.create(nombre="Ingeniería")
+        carrera = Carrera.objects.create(nombre="Enfermería", codigo="ENF", area=cls.salud)
+        cls.usuario = User.objects.create_user(
+            email="docente@test.cl", password="x", first_name="D", last_name="C", carrera=carrera,
+        )
+        cls.otro = User.objects.create_user(
+            email="otro@test.cl", password="x", first_name="O", last_name="T", area=otra_area,
+        )
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        cls.otro_espacio = Espacio.objects.create(nombre="Lab 2", ubicacion="B", capacidad=20)
+
+        def reserva(dia, espacio, solicitante, estado="APROBADA"):
+            return Reserva.objects.create(
+                solicitante=solicitante, espacio=espacio, fecha=date(2030, 3, dia),
+                hora_inicio=time(9), hora_fin=time(10), motivo="x", estado=estado,
+            )
+
+        cls.dentro = reserva(4, cls.espacio, cls.usuario)
+        cls.otro_lab = reserva(5, cls.otro_espacio, cls.otro)
+        reserva(6, cls.espacio, cls.usuario, estado="PENDIENTE")
+        reserva(20, cls.espacio, cls.usuario)  # fuera de la semana pedida
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.url = reverse("api_reservas_calendario")
+        # Semana del lunes 4 al domingo 10 (end exclusivo, como lo manda FullCalendar)
+        self.semana = {"start": "2030-03-04T00:00:00-03:00", "end": "2030-03-11T00:00:00-03:00"}
+
+    def _ids(self, **extra):
+        response = self.client.get(self.url, {**self.semana, **extra})
+        self.assertEqual(response.status_code, 200)
+        return [e["id"] for e in response.json()]
+
+    def test_solo_aprobadas_de_la_ventana_y_filtros(self):
+        self.assertEqual(self._ids(), [self.dentro.pk, self.otro_lab.pk])
+        self.assertEqual(self._ids(espacio=self.otro_espacio.pk), [self.otro_lab.pk])
+        self.assertEqual(self._ids(area=self.salud.pk), [self.dentro.pk])
+
+        evento = self.client.get(self.url, self.semana).json()[0]
+        self.assertEqual(evento["title"], "Ocupado: Lab 1")
+        self.assertEqual(evento["start"], "2030-03-04T09:00:00")
+
+    def test_parametros_invalidos(self):
+        for params in ({"start": "ayer"}, {"start": "2030-03-10", "end": "2030-03-04"},
+                       {"start": "2030-01-01", "end": "2030-12-31"}, {**self.semana, "espacio": "x"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+    def test_304_si_no_cambio_nada(self):
+        primera = self.client.get(self.url, self.semana)
+        etag = primera["ETag"]
+        self.assertIn("Last-Modified", primera)
+        self.assertIn("no-cache", primera["Cache-Control"])
+
+        with self.assertNumQueries(3):  # sesión + usuario + validadores (sin eventos)
+            segunda = self.client.get(self.url, self.semana, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda["ETag"], etag)
+
+        # Un cambio fuera de la ventana no la invalida; uno dentro sí
+        Reserva.objects.filter(fecha=date(2030, 3, 20)).update(estado="CANCELADA")
+        self.assertEqual(self.client.get(self.url, self.semana, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.dentro.estado = "CANCELADA"
+        self.dentro.save()
+        tercera = self.client.get(self.url, self.semana, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(tercera.status_code, 200)
+        self.assertNotEqual(tercera["ETag"], etag)
+        self.assertEqual([e["id"] for e in tercera.json()], [self.otro_lab.pk])
+
+    def test_eventos_en_dos_consultas(self):
+        with self.assertNumQueries(4):  # sesión + usuario + validadores + eventos
+            self.client.get(self.url, self.semana)
+
+    def test_cambio_de_estado_desde_la_vista_invalida_el_etag(self):
+        # FINALIZADA -> CANCELADA no cambia los conteos: solo la marca `actualizado`
+        finalizada = Reserva.objects.create(
+            solicitante=self.usuario, espacio=self.espacio, fecha=date(2030, 3, 7),
+            hora_inicio=time(9), hora_fin=time(10), motivo="x", estado="FINALIZADA",
+        )
+        etag = self.client.get(self.url, self.semana)["ETag"]
+        antes = Reserva.objects.get(pk=finalizada.pk).actualizado
+
+        self.client.post(reverse("reservas:cancelar", args=[finalizada.pk]))  # save(update_fields=[...])
+        finalizada.refresh_from_db()
+        self.assertEqual(finalizada.estado, "CANCELADA")
+        self.assertGreater(finalizada.actualizado, antes)
+
+        response = self.client.get(self.url, self.semana, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_sincronizacion_incremental(self):
+        url = reverse("reservas:api_calendario_cambios")
+        inicial = self.client.get(url, self.semana).json()
+        self.assertTrue(inicial["completo"])
+        self.assertEqual([e["id"] for e in inicial["eventos"]], [self.dentro.pk, self.otro_lab.pk])
+
+        # Token posterior al margen: lo anterior ya no vuelve
+        token = token_de(timezone.now() + MARGEN_SINCRONIZACION)
+        Reserva.objects.filter(pk=self.otro_lab.pk).update(actualizado=timezone.now() + 2 * MARGEN_SINCRONIZACION)
+        borrada = self.dentro.pk
+        self.dentro.delete()
+        pendiente = Reserva.objects.get(fecha=date(2030, 3, 6))
+
+        with self.assertNumQueries(5):  # sesión + usuario + visibles + cambiadas + eliminadas
+            datos = self.client.get(url, {**self.semana, "token": token}).json()
+        self.assertFalse(datos["completo"])
+        self.assertEqual([e["id"] for e in datos["eventos"]], [self.otro_lab.pk])
+        self.assertEqual(datos["eliminados"], [borrada])
+        self.assertNotIn(pendiente.pk, datos["eliminados"])
+
+        # Token vencido o inválido
+        viejo = token_de(timezone.now() - timedelta(days=365))
+        self.assertTrue(self.client.get(url, {**self.semana, "token": viejo}).json()["completo"])
+        self.assertEqual(self.client.get(url, {**self.semana, "token": "x"}).status_code, 400)
+
+    def test_sincronizacion_ve_la_cancelacion_desde_la_vista(self):
+        url = reverse("reservas:api_calendario_cambios")
+        token = self.client.get(url, self.semana).json()["token"]
+
+        self.client.post(reverse("reservas:cancelar", args=[self.dentro.pk]))  # save(update_fields=[...])
+
+        datos = self.client.get(url, {**self.semana, "token": token}).json()
+        self.assertFalse(datos["completo"])
+        # El solape del token puede repetir reservas recién creadas; la cancelada va a eliminados
+        self.assertNotIn(self.dentro.pk, [e["id"] for e in datos["eventos"]])
+        self.assertIn(self.dentro.pk, datos["eliminados"])
+
+
+class IcsFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        otro = User.objects.create_user(email="otro@test.cl", password="x", first_name="O", last_name="T")
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="Edificio B, piso 2", capacidad=20)
+        cls.dia = timezone.localdate() + timedelta(days=7)
+
+        def reserva(solicitante, h, estado, motivo="Clase"):
+            return Reserva.objects.create(
+                solicitante=solicitante, espacio=cls.espacio, fecha=cls.dia,
+                hora_inicio=time(h), hora_fin=time(h + 1), motivo=motivo, estado=estado,
+            )
+
+        cls.aprobada = reserva(cls.usuario, 9, "APROBADA", motivo="Taller; práctica " * 10)
+        cls.cancelada = reserva(cls.usuario, 11, "CANCELADA")
+        reserva(otro, 14, "APROBADA")
+        reserva(otro, 16, "PENDIENTE")
+
+    def test_feed_de_espacio_sin_sesion_y_en_streaming(self):
+        url = reverse("reservas:ics_espacio", args=[token_espacio(self.espacio.pk)])
+        with self.assertNumQueries(3):  # espacio + validadores + eventos (sin sesión ni usuario)
+            response = self.client.get(url)
+            cuerpo = b"".join(response.streaming_content).decode()
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertEqual(cuerpo.count("BEGIN:VEVENT"), 2)  # solo aprobadas
+        self.assertIn(f"UID:reserva-{self.aprobada.pk}@testserver", cuerpo)
+        self.assertIn("LOCATION:Edificio B\\, piso 2", cuerpo)
+        self.assertNotIn("Taller", cuerpo)  # el feed de espacio no muestra el motivo
+        self.assertTrue(all(len(linea.encode()) <= 75 for linea in cuerpo.split("\r\n")))
+
+        with self.assertNumQueries(2):
+            no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_feed_de_usuario(self):
+        url = reverse("reservas:ics_usuario", args=[token_usuario(self.usuario.pk)])
+        cuerpo = b"".join(self.client.get(url).streaming_content).decode()
+        desplegado = cuerpo.replace("\r\n ", "")
+
+        self.assertEqual(cuerpo.count("BEGIN:VEVENT"), 2)  # solo las suyas
+        self.assertIn("STATUS:CANCELLED", cuerpo)
+        self.assertIn("DESCRIPTION:" + "Taller\\; práctica " * 10, desplegado)
+
+    def test_cancelar_desde_la_vista_invalida_el_feed_de_usuario(self):
+        # FINALIZADA -> CANCELADA no cambia los conteos: solo la marca de cambio mueve el ETag
+        finalizada = Reserva.objects.create(
+            solicitante=self.usuario, espacio=self.espacio, fecha=self.dia,
+            hora_inicio=time(18), hora_fin=time(19), motivo="Clase", estado="FINALIZADA",
+        )
+        url = reverse("reservas:ics_usuario", args=[token_usuario(self.usuario.pk)])
+        etag = self.client.get(url)["ETag"]
+
+        self.client.force_login(self.usuario)
+        self.client.post(reverse("reservas:cancelar", args=[finalizada.pk]))  # save(update_fields=[...])
+        self.client.logout()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        cuerpo = b"".join(response.streaming_content).decode()
+        evento = cuerpo.split(f"UID:reserva-{finalizada.pk}@")[1].split("END:VEVENT")[0]
+        self.assertIn("STATUS:CANCELLED", evento)
+
+    def test_token_invalido(self):
+        self.assertEqual(self.client.get(reverse("reservas:ics_usuario", args=["1:falso"])).status_code, 404)
+        # Un token de espacio no sirve como token de usuario
+        url = reverse("reservas:ics_usuario", args=[token_espacio(self.usuario.pk)])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AprobacionLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        cls.otro_espacio = Espacio.objects.create(nombre="Lab 2", ubicacion="B", capacidad=20)
+
+    def _reserva(self, inicio, fin, estado="PENDIENTE", espacio=None):
+        return Reserva.objects.create(
+            solicitante=self.usuario, espacio=espacio or self.espacio, fecha=date(2030, 3, 4),
+            hora_inicio=inicio, hora_fin=fin, motivo="x", estado=estado,
+        )
+
+    def _ids(self, reservas):
+        return sorted(r.id for r in reservas)
+
+    def _estados(self, *reservas):
+        return [Reserva.objects.get(pk=r.pk).estado for r in reservas]
+
+    def test_competencia_sin_confirmar_queda_pendiente_y_se_informan_los_ids_omitidos(self):
+        a = self._reserva(time(9), time(11))
+        b = self._reserva(time(10), time(12))
+        fuera_del_lote = self._reserva(time(11, 30), time(13))
+        libre = self._reserva(time(9), time(11), espacio=self.otro_espacio)
+        ya_aprobada = self._reserva(time(14), time(15), estado="APROBADA")
+
+        resultado = aprobar_lote([a.id, b.id, libre.id, ya_aprobada.id, 999999])
+
+        self.assertEqual(self._ids(resultado["aprobadas"]), [libre.id])
+        self.assertEqual(resultado["rechazadas"], [])
+        self.assertEqual(resultado["omitidas"], [])
+        self.assertEqual(
+            sorted((r.id, ids) for r, ids in resultado["por_confirmar"]),
+            [(a.id, [b.id]), (b.id, [a.id, fuera_del_lote.id])],
+        )
+        self.assertEqual(resultado["no_pendientes"], [ya_aprobada.id, 999999])
+        self.assertEqual(self._estados(a, b, fuera_del_lote, libre), ["PENDIENTE", "PENDIENTE", "PENDIENTE", "APROBADA"])
+
+    def test_confirmado_aprueba_por_orden_de_llegada_y_rechaza_la_competencia(self):
+        a = self._reserva(time(9), time(11))
+        b = self._reserva(time(10), time(12))
+        fuera_del_lote = self._reserva(time(10, 30), time(13))
+
+        resultado = aprobar_lote([a.id, b.id], confirmado=True)
+
+        self.assertEqual(self._ids(resultado["aprobadas"]), [a.id])
+        self.assertEqual(self._ids(resultado["rechazadas"]), [b.id, fuera_del_lote.id])
+        self.assertEqual(resultado["por_confirmar"], [])
+        self.assertEqual(self._estados(a, b, fuera_del_lote), ["APROBADA", "RECHAZADA", "RECHAZADA"])
+
+    def test_cada_reserva_queda_en_una_sola_lista(self):
+        # x choca con una aprobada (omitida); y llega después, no choca con la aprobada
+        # pero sí con x: al aprobar y, x termina rechazada y deja de figurar como omitida
+        self._reserva(time(9), time(10), estado="APROBADA")
+        x = self._reserva(time(9, 30), time(10, 30))
+        y = self._reserva(time(10), time(11))
+
+        resultado = aprobar_lote([x.id, y.id], confirmado=True)
+
+        self.assertEqual(self._ids(resultado["aprobadas"]), [y.id])
+        self.assertEqual(self._ids(resultado["rechazadas"]), [x.id])
+        self.assertEqual(resultado["omitidas"], [])
+        listas = [
+            *resultado["aprobadas"], *resultado["rechazadas"],
+            *(r for r, _ in resultado["omitidas"]), *(r for r, _ in resultado["por_confirmar"]),
+        ]
+        self.assertEqual(len(listas), len({r.id for r in listas}))
+
+    def test_rechazar_lote_no_toca_las_que_ya_no_estan_pendientes(self):
+        pendiente = self._reserva(time(9), time(10))
+        cancelada = self._reserva(time(11), time(12), estado="CANCELADA")
+
+        rechazadas = rechazar_lote([pendiente.id, cancelada.id], motivo="Sin cupo")
+
+        self.assertEqual(self._ids(rechazadas), [pendiente.id])
+        self.assertEqual(self._estados(pendiente, cancelada), ["RECHAZADA", "CANCELADA"])
+
+    def test_vista_pide_confirmacion_antes_de_rechazar(self):
+        admin = User.objects.create_user(email="admin@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN")
+        a = self._reserva(time(9), time(11))
+        b = self._reserva(time(10), time(12))
+        self.client.force_login(admin)
+        url = reverse("gestion_reservas_lote")
+
+        response = self.client.post(url, {"action": "APROBAR", "reserva_ids": [a.id]}, follow=True)
+        self.assertContains(response, "Confirmar y Aprobar")
+        self.assertEqual(self._estados(a, b), ["PENDIENTE", "PENDIENTE"])
+
+        self.client.post(url, {"action": "APROBAR", "reserva_ids": [a.id], "confirmado": "si"})
+        self.assertEqual(self._estados(a, b), ["APROBADA", "RECHAZADA"])
+
+
+class BuscarBloquesLibresTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        cls.chica = Espacio.objects.create(nombre="Sala chica", ubicacion="A", capacidad=10)
+        cls.grande = Espacio.objects.create(nombre="Auditorio", ubicacion="A", capacidad=40)
+        cls.dia = date(2030, 3, 4)
+        # Anticipación mínima (48 h) cumplida de sobra para cls.dia
+        cls.ahora = datetime(2030, 3, 1, 9, 0)
+
+    def _reserva(self, espacio, inicio, fin, estado="APROBADA"):
+        return Reserva.objects.create(
+            solicitante=self.usuario, espacio=espacio, fecha=self.dia,
+            hora_inicio=inicio, hora_fin=fin, motivo="x", estado=estado,
+        )
+
+    def _buscar(self, duracion=timedelta(hours=1), **kwargs):
+        kwargs.setdefault("ahora", self.ahora)
+        return buscar_bloques_libres(self.dia, self.dia, duracion, **kwargs)
+
+    def test_anticipacion_minima_se_redondea_al_paso_de_busqueda(self):
+        bloques = self._buscar(ahora=datetime(2030, 3, 2, 10, 7))
+        self.assertEqual({b["inicio"] for b in bloques}, {time(10, 30)})
+
+        # Justo en el paso: no se mueve
+        bloques = self._buscar(ahora=datetime(2030, 3, 2, 11, 0))
+        self.assertEqual({b["inicio"] for b in bloques}, {time(11, 0)})
+
+    def test_reservas_con_margen_se_fusionan_en_un_solo_tramo_ocupado(self):
+        # 10-11 y 12:30-13 con 1 h de colchón: 09-12 y 11:30-14 -> ocupado 09-14
+        self._reserva(self.chica, time(10), time(11))
+        self._reserva(self.chica, time(12, 30), time(13), estado="PENDIENTE")
+
+        chica = [b for b in self._buscar() if b["espacio_id"] == self.chica.pk]
+        self.assertEqual(len(chica), 1)
+        self.assertEqual((chica[0]["inicio"], chica[0]["fin"], chica[0]["libre_hasta"]), (time(14), time(15), time(21)))
+
+        # Sin colchón queda libre el hueco 11-12:30 (y 08:30-10 antes)
+        sin_margen = [b for b in self._buscar(margen=timedelta(0)) if b["espacio_id"] == self.chica.pk]
+        self.assertEqual((sin_margen[0]["inicio"], sin_margen[0]["libre_hasta"]), (time(8, 30), time(10)))
+
+    def test_recursos_deben_alcanzar_en_todo_el_bloque(self):
+        proyector = Recurso.objects.create(nombre="Proyector", stock=2)
+        otra = self._reserva(self.chica, time(8, 30), time(12), estado="PENDIENTE")
+        RecursoReserva.objects.create(reserva=otra, recurso=proyector, cantidad=2)
+
+        bloques = self._buscar(capacidad_min=20, recursos_pedidos={proyector.pk: 1})
+        # Hasta las 12 los 2 proyectores están tomados; intervalos semiabiertos: 12:00 ya sirve
+        self.assertEqual([(b["espacio_id"], b["inicio"]) for b in bloques], [(self.grande.pk, time(12))])
+
+        # Más de lo que existe: ningún bloque
+        self.assertEqual(self._buscar(recursos_pedidos={proyector.pk: 3}), [])
+
+    def test_orden_por_hora_y_mejor_ajuste_de_capacidad(self):
+        bloques = self._buscar(capacidad_min=5)
+        self.assertEqual([b["espacio_id"] for b in bloques], [self.chica.pk, self.grande.pk])
+
+        # La más temprana va primero aunque su capacidad se ajuste peor
+        self._reserva(self.chica, time(8, 30), time(10))
+        bloques = self._buscar(capacidad_min=5)
+        self.assertEqual([(b["espacio_id"], b["inicio"]) for b in bloques], [
+            (self.grande.pk, time(8, 30)), (self.chica.pk, time(11)),
+        ])
+
+    def test_limite(self):
+        bloques = buscar_bloques_libres(self.dia, self.dia + timedelta(days=2), timedelta(hours=1), ahora=self.ahora, limite=3)
+        self.assertEqual(len(bloques), 3)
+        self.assertEqual([b["fecha"] for b in bloques], [self.dia, self.dia, self.dia + timedelta(days=1)])
+
+        todos = buscar_bloques_libres(self.dia, self.dia + timedelta(days=2), timedelta(hours=1), ahora=self.ahora, limite=None)
+        self.assertEqual(len(todos), 6)  # 2 espacios x 3 días
+
+
+class StockTests(TestCase):
+    def test_pico_reservas_contiguas_no_se_suman(self):
+        # Intervalos semiabiertos: la que termina a las 11 no coincide con la que empieza a las 11
+        filas = [(1, time(10), time(11), 2), (1, time(11), time(12), 3)]
+        self.assertEqual(pico_concurrente(filas), {1: 3})
+
+    def test_pico_reservas_anidadas(self):
+        filas = [
+            (1, time(9), time(13), 2),
+            (1, time(10), time(12), 1),
+            (1, time(10, 30), time(11), 4),
+            (1, time(12), time(13), 5),  # empieza cuando termina la de 10-12
+        ]
+        self.assertEqual(pico_concurrente(filas), {1: 7})
+
+    def test_pico_se_recorta_al_bloque(self):
+        filas = [
+            (1, time(8), time(10), 5),   # termina justo al empezar el bloque
+            (1, time(9), time(11), 2),   # entra en parte
+            (1, time(12), time(14), 9),  # empieza justo al terminar el bloque
+            (2, time(15), time(16), 1),  # fuera del bloque
+        ]
+        self.assertEqual(pico_concurrente(filas, time(10), time(12)), {1: 2})
+
+    def test_pico_varios_recursos_a_la_vez(self):
+        filas = [
+            (1, time(10), time(12), 2),
+            (2, time(10), time(11), 1),
+            (1, time(11), time(13), 1),
+            (2, time(10, 30), time(12), 4),
+            (3, time(10), time(11), 0),  # cantidad 0: no cuenta
+        ]
+        self.assertEqual(pico_concurrente(filas), {1: 3, 2: 5})
+
+    def test_stock_snapshot_dos_consultas(self):
+        usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        proyector = Recurso.objects.create(nombre="Proyector", stock=5)
+        notebook = Recurso.objects.create(nombre="Notebook", stock=3)
+        dia = date(2030, 3, 4)
+
+        def reserva(inicio, fin, estado, *pedidos):
+            r = Reserva.objects.create(
+                solicitante=usuario, espacio=espacio, fecha=dia,
+                hora_inicio=inicio, hora_fin=fin, motivo="x", estado=estado,
+            )
+            for recurso, cantidad in pedidos:
+                RecursoReserva.objects.create(reserva=r, recurso=recurso, cantidad=cantidad)
+            return r
+
+        reserva(time(9), time(10), "APROBADA", (proyector, 2), (notebook, 1))
+        reserva(time(10), time(11), "PENDIENTE", (proyector, 3))
+        reserva(time(9), time(11), "RECHAZADA", (proyector, 5))  # no ocupa
+        propia = reserva(time(9, 30), time(10, 30), "PENDIENTE", (notebook, 2))
+
+        with self.assertNumQueries(2):  # recursos + eventos del bloque
+            snapshot = stock_snapshot(dia, "09:00", "11:00")
+        self.assertEqual(snapshot, [
+            {"id": notebook.pk, "nombre": "Notebook", "total": 3, "ocupado": 3, "disponible": 0},
+            {"id": proyector.pk, "nombre": "Proyector", "total": 5, "ocupado": 3, "disponible": 2},
+        ])
+
+        # Al editar una reserva, lo suyo no cuenta como ocupado
+        with self.assertNumQueries(2):
+            snapshot = stock_snapshot(dia, time(9), time(11), recurso_ids=[notebook.pk], excluir_reserva_id=propia.pk)
+        self.assertEqual([(x["ocupado"], x["disponible"]) for x in snapshot], [(1, 2)])
+
+
+def _filas_ocupacion():
+    # recalcular() deja en cero los días que se vacían; reconstruir() no crea esas filas
+    return sorted(
+        OcupacionEspacio.objects.exclude(aprobadas=0, pendientes=0)
+        .values_list("espacio_id", "fecha", "aprobadas", "pendientes")
+    )
+
+
+class OcupacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        cls.otro_espacio = Espacio.objects.create(nombre="Lab 2", ubicacion="B", capacidad=20)
+        cls.dia = date(2030, 3, 4)
+
+    def _reserva(self, inicio, fin, estado="APROBADA", **extra):
+        extra.setdefault("espacio", self.espacio)
+        extra.setdefault("fecha", self.dia)
+        return Reserva.objects.create(
+            solicitante=self.usuario, hora_inicio=inicio, hora_fin=fin, motivo="x", estado=estado, **extra,
+        )
+
+    def test_mascara_marca_los_bloques_tocados_aunque_sea_en_parte(self):
+        self.assertEqual(mascara(time(8, 30), time(9)), 0b1)
+        self.assertEqual(mascara(time(9), time(9, 45)), 0b110)
+        self.assertEqual(mascara(time(8, 45), time(9, 1)), 0b11)
+        self.assertEqual(mascara(time(20, 30), time(21)), 1 << 24)
+        # Fuera de horario: se marca el bit especial y lo que caiga dentro
+        self.assertEqual(mascara(time(8), time(9)), FUERA_DE_HORARIO | 0b1)
+        self.assertEqual(mascara(time(21), time(22)), FUERA_DE_HORARIO)
+
+    def test_fuera_de_horario_consulta_reserva(self):
+        self._reserva(time(10), time(11))
+        with self.assertNumQueries(1):  # solo la grilla
+            self.assertTrue(espacio_disponible(self.espacio, self.dia, time(15), time(16)))
+
+        self._reserva(time(7), time(8))
+        with self.assertNumQueries(2):  # grilla con FUERA_DE_HORARIO -> consulta exacta
+            self.assertTrue(espacio_disponible(self.espacio, self.dia, time(15), time(16)))
+        with self.assertNumQueries(2):
+            self.assertFalse(espacio_disponible(self.espacio, self.dia, time(8, 30), time(9, 30)))
+
+    def test_cambios_incrementales_igual_que_reconstruir(self):
+        a = self._reserva(time(9), time(10, 15))
+        b = self._reserva(time(12), time(13), estado="PENDIENTE")
+        c = self._reserva(time(15), time(16, 30))
+        self._reserva(time(17), time(18), espacio=self.otro_espacio)
+
+        b.estado = "APROBADA"
+        b.save()
+        a.estado = "CANCELADA"
+        a.save(update_fields=["estado"])
+        c.espacio = self.otro_espacio
+        c.fecha = self.dia + timedelta(days=1)
+        c.save()
+        self._reserva(time(19), time(20), estado="PENDIENTE").delete()
+
+        incremental = _filas_ocupacion()
+        reconstruir_ocupacion()
+        self.assertEqual(incremental, _filas_ocupacion())
+        self.assertEqual(incremental, [
+            (self.espacio.pk, self.dia, mascara(time(12), time(13)), 0),
+            (self.otro_espacio.pk, self.dia, mascara(time(17), time(18)), 0),
+            (self.otro_espacio.pk, self.dia + timedelta(days=1), mascara(time(15), time(16, 30)), 0),
+        ])
+
+    def test_recalcular_bloquea_los_espacios_antes_de_leer(self):
+        self._reserva(time(9), time(10))
+        with CaptureQueriesContext(connection) as consultas:
+            recalcular_ocupacion([(self.otro_espacio.pk, self.dia), (self.espacio.pk, self.dia)])
+        sql = [q["sql"] for q in consultas.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        # SQLite ignora FOR UPDATE; lo que importa es que el bloqueo va primero y en orden de id
+        self.assertIn('FROM "inventario_espacio"', sql[0])
+        self.assertIn("ORDER BY", sql[0])
+        self.assertIn('FROM "reservas_reserva"', sql[1])
+
+    def test_margen_en_primer_conflicto_y_espacio_disponible(self):
+        reserva = self._reserva(time(10), time(11))
+
+        # Sin margen, 11:30-12:30 está libre y alcanza con la grilla
+        with self.assertNumQueries(1):
+            self.assertIsNone(primer_conflicto(self.espacio, self.dia, time(11, 30), time(12, 30)))
+        # Con 1 h de colchón choca (10:30-13:30 se cruza con 10-11)
+        self.assertEqual(
+            primer_conflicto(self.espacio, self.dia, time(11, 30), time(12, 30), margen=timedelta(hours=1)), reserva,
+        )
+        self.assertFalse(espacio_disponible(self.espacio, self.dia, time(11, 30), time(12, 30)))
+        # Una hora justa de separación sí cumple el colchón (intervalos semiabiertos)
+        self.assertTrue(espacio_disponible(self.espacio, self.dia, time(12), time(13)))
+        self.assertTrue(espacio_disponible(self.espacio, self.dia, time(8, 30), time(9)))
+        # La propia reserva no choca consigo misma
+        self.assertTrue(espacio_disponible(self.espacio, self.dia, time(10), time(11), excluir_id=reserva.pk))
+
+
+class SeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user(email="docente@test.cl", password="x", first_name="D", last_name="C")
+        cls.admins = [
+            User.objects.create_user(email=f"admin{i}@test.cl", password="x", first_name="A", last_name="D", rol="ADMIN")
+            for i in range(2)
+        ]
+        cls.espacio = Espacio.objects.create(nombre="Lab 1", ubicacion="B", capacidad=20)
+        cls.otro_espacio = Espacio.objects.create(nombre="Lab 2", ubicacion="B", capacidad=20)
+        cls.proyector = Recurso.objects.create(nombre="Proyector", stock=2)
+        cls.lunes = date(2030, 3, 4)
+        cls.fechas = expandir_fechas(cls.lunes, "SEMANAL", date(2030, 3, 25))
+
+    def _crear(self, **extra):
+        return crear_serie(self.usuario, self.espacio, self.fechas, time(10), time(12), "Clase", **extra)
+
+    def test_expandir_fechas(self):
+        self.assertEqual(self.fechas, [date(2030, 3, 4), date(2030, 3, 11), date(2030, 3, 18), date(2030, 3, 25)])
+        self.assertEqual(
+            expandir_fechas(self.lunes, "QUINCENAL", date(2030, 3, 31)),
+            [date(2030, 3, 4), date(2030, 3, 18)],
+        )
+        # Tope de ocurrencias aunque el rango sea más largo
+        fechas = expandir_fechas(self.lunes, "SEMANAL", date(2035, 1, 1))
+        self.assertEqual(len(fechas), MAX_OCURRENCIAS)
+        self.assertEqual(fechas[-1], self.lunes + timedelta(weeks=MAX_OCURRENCIAS - 1))
+
+    def test_crea_la_serie_y_avisa_una_vez_a_cada_admin(self):
+        reservas = self._crear(recursos_pedidos={self.proyector.pk: 1})
+
+        self.assertEqual(len(reservas), 4)
+        self.assertEqual(len({r.serie for r in reservas}), 1)
+        self.assertEqual(RecursoReserva.objects.filter(reserva__serie=reservas[0].serie).count(), 4)
+        # Tablas derivadas al día aunque bulk_create no dispare signals
+        self.assertEqual(OcupacionEspacio.objects.filter(espacio=self.espacio, pendientes__gt=0).count(), 4)
+
+        avisos = Notificacion.objects.all()
+        self.assertEqual(sorted(n.usuario_id for n in avisos), sorted(a.pk for a in self.admins))
+        self.assertTrue(all("4 veces" in n.mensaje for n in avisos))
+
+    @override_settings(MEDIA_ROOT=MEDIA_TEMPORAL)
+    def test_rollback_borra_el_adjunto_ya_guardado(self):
+        with mock.patch("reservas.series.recalcular_dias", side_effect=RuntimeError("falla")):
+            with self.assertRaises(RuntimeError):
+                self._crear(archivo_adjunto=SimpleUploadedFile("programa.pdf", b"%PDF-1.4"))
+        self.assertFalse(Reserva.objects.filter(espacio=self.espacio).exists())
+        self.assertEqual(_archivos(MEDIA_TEMPORAL), [])
+
+        # Sin falla el adjunto se guarda una sola vez para toda la serie
+        reservas = self._crear(archivo_adjunto=SimpleUploadedFile("programa.pdf", b"%PDF-1.4"))
+        self.assertEqual(len(_archivos(MEDIA_TEMPORAL)), 1)
+        self.assertEqual({r.archivo_adjunto.name for r in reservas}, {_archivos(MEDIA_TEMPORAL)[0].relative_to(MEDIA_TEMPORAL).as_posix()})
+
+    def test_choque_de_espacio_rechaza_la_serie_completa(self):
+        Reserva.objects.create(
+            solicitante=self.usuario, espacio=self.espacio, fecha=date(2030, 3, 18),
+            hora_inicio=time(12, 30), hora_fin=time(13), motivo="x", estado="APROBADA",
+        )
+        antes = Reserva.objects.count()
+        Notificacion.objects.all().delete()
+
+        with self.assertRaises(SerieError) as ctx:
+            self._crear()
+        self.assertEqual(len(ctx.exception.errores), 1)
+        self.assertIn("18-03-2030", ctx.exception.errores[0])
+        self.assertEqual(Reserva.objects.count(), antes)
+        self.assertFalse(Notificacion.objects.exists())
+
+    def test_falta_de_stock_rechaza_la_serie_completa(self):
+        otra = Reserva.objects.create(
+            solicitante=self.usuario, espacio=self.otro_espacio, fecha=date(2030, 3, 11),
+            hora_inicio=time(11), hora_fin=time(13), motivo="x", estado="PENDIENTE",
+        )
+        RecursoReserva.objects.create(reserva=otra, recurso=self.proyector, cantidad=2)
+        antes = Reserva.objects.count()
+
+        with self.assertRaises(SerieError) as ctx:
+            self._crear(recursos_pedidos={self.proyector.pk: 1})
+        self.assertEqual(ctx.exception.errores, [
+            "11-03-2030: stock insuficiente para Proyector. Disponible: 0, Pedido: 1",
+        ])
+        self.assertEqual(Reserva.objects.count(), antes)
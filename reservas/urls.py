@@ -29,4 +29,14 @@ urlpatterns = [
 
     # API para alimentar el calendario visual (usado por FullCalendar)
     path('api/reservas-calendario/', views.api_reservas_calendario, name='api_reservas_calendario'),
+
+    # API de sincronización incremental del calendario (token de cambios)
+    path('api/reservas-calendario/cambios/', views.api_calendario_cambios, name='api_calendario_cambios'),
+
+    # Feeds ICS suscribibles (sin login: el token firmado identifica el feed)
+    path('ics/espacio/<str:token>.ics', views.ics_espacio, name='ics_espacio'),
+    path('ics/usuario/<str:token>.ics', views.ics_usuario, name='ics_usuario'),
+
+    # API para buscar bloques libres en todos los espacios activos
+    path('api/bloques-libres/', views.api_bloques_libres, name='api_bloques_libres'),
 ]
\ No newline at end of file
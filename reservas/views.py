@@ -1,17 +1,24 @@
 import json
+from datetime import timedelta
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Sum, Q
 from django.http import JsonResponse
 from django.core.paginator import Paginator
 from django.utils.safestring import mark_safe
 from django.urls import reverse
 from django.core.exceptions import ValidationError
+from django.utils.dateparse import parse_date
 
 from .forms import ReservaForm
 from .models import Reserva, RecursoReserva
+from .availability import conflictos_espacio, buscar_bloques_libres
+from .calendario import respuesta_calendario, respuesta_cambios
+from . import ics
+from .stock import stock_snapshot, stock_por_id
+from .series import crear_serie, SerieError
+from .estadisticas import recalcular as recalcular_estadisticas
 from inventario.models import Recurso, Espacio
 
 
@@ -30,6 +37,7 @@ def listar_reservas(request):
     return render(request, 'reservas/listar_reservas.html', {
         'reservas': page_obj.object_list,
         'page_obj': page_obj,
+        'ics_url': request.build_absolute_uri(reverse('reservas:ics_usuario', args=[ics.token_usuario(request.user.pk)])),
     })
 
 
@@ -68,27 +76,49 @@ def crear_reserva(request):
                 })
             recursos_iniciales_json = json.dumps(recursos_asignados)
 
-        if form.is_valid():
+        if form.is_valid() and len(form.cleaned_data['fechas_serie']) > 1:
+            # Serie semanal/quincenal: validación y creación masiva
+            fechas = form.cleaned_data['fechas_serie']
+            try:
+                reservas = crear_serie(
+                    request.user,
+                    form.cleaned_data['espacio'],
+                    fechas,
+                    form.cleaned_data['hora_inicio'],
+                    form.cleaned_data['hora_fin'],
+                    form.cleaned_data['motivo'],
+                    archivo_adjunto=form.cleaned_data.get('archivo_adjunto'),
+                    recursos_pedidos={item['id']: item['cantidad'] for item in recursos_a_pedir},
+                )
+                messages.success(request, f'Serie de {len(reservas)} solicitudes creada con éxito. Esperando aprobación.')
+                return redirect('reservas:listar_reservas')
+            except SerieError as e:
+                for error in e.errores:
+                    messages.error(request, error)
+
+        elif form.is_valid():
             try:
                 with transaction.atomic():
                     reserva = form.save(commit=False)
                     reserva.solicitante = request.user
                     reserva.save()
 
-                    for item in recursos_a_pedir:
-                        recurso_db = Recurso.objects.select_for_update().get(id=item['id'])
-                        cantidad_pedida = item['cantidad']
+                    # Bloqueamos los recursos del carrito y calculamos su stock en una sola consulta
+                    ids = [item['id'] for item in recursos_a_pedir]
+                    recursos_db = Recurso.objects.select_for_update().in_bulk(ids)
+                    stock = stock_por_id(
+                        reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                        recurso_ids=ids,
+                    )
 
-                        ocupados = RecursoReserva.objects.filter(
-                            recurso=recurso_db,
-                            reserva__estado__in=['PENDIENTE', 'APROBADA'],
-                            reserva__fecha=reserva.fecha
-                        ).filter(
-                            Q(reserva__hora_inicio__lt=reserva.hora_fin) &
-                            Q(reserva__hora_fin__gt=reserva.hora_inicio)
-                        ).aggregate(total=Sum('cantidad'))['total'] or 0
+                    nuevos = []
+                    for item in recursos_a_pedir:
+                        recurso_db = recursos_db.get(item['id'])
+                        if recurso_db is None:
+                            raise ValueError(f"Recurso #{item['id']} no existe.")
 
-                        disponible_real = recurso_db.stock - ocupados
+                        cantidad_pedida = item['cantidad']
+                        disponible_real = stock[recurso_db.id]['disponible']
 
                         if disponible_real < cantidad_pedida:
                             raise ValueError(
@@ -96,11 +126,16 @@ def crear_reserva(request):
                                 f"Disponible: {disponible_real}, Pedido: {cantidad_pedida}"
                             )
 
-                        RecursoReserva.objects.create(
+                        nuevos.append(RecursoReserva(
                             reserva=reserva,
                             recurso=recurso_db,
                             cantidad=cantidad_pedida
-                        )
+                        ))
+
+                    RecursoReserva.objects.bulk_create(nuevos)
+                    if nuevos:
+                        # bulk_create no dispara signals: el resumen diario cuenta los recursos recién agregados
+                        recalcular_estadisticas([(reserva.espacio_id, reserva.fecha)])
 
                     messages.success(request, 'Solicitud creada con éxito. Esperando aprobación.')
                     return redirect('reservas:listar_reservas')
@@ -170,25 +205,19 @@ def aprobar_reserva(request, reserva_id):
         confirmado = request.POST.get('confirmado')
 
         if action == 'APROBAR':
-            conflictos_existentes = Reserva.objects.filter(
-                espacio=reserva.espacio,
-                fecha=reserva.fecha,
-                estado='APROBADA'
-            ).filter(
-                Q(hora_inicio__lt=reserva.hora_fin) & Q(hora_fin__gt=reserva.hora_inicio)
-            ).exclude(id=reserva.id)
+            conflictos_existentes = conflictos_espacio(
+                reserva.espacio_id, reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                estados=['APROBADA'], excluir_id=reserva.id,
+            )
 
             if conflictos_existentes.exists():
                 messages.error(request, "Error: El espacio ya está ocupado por otra reserva aprobada.")
                 return redirect('gestion_reservas')
 
-            competencia = Reserva.objects.filter(
-                espacio=reserva.espacio,
-                fecha=reserva.fecha,
-                estado='PENDIENTE'
-            ).filter(
-                Q(hora_inicio__lt=reserva.hora_fin) & Q(hora_fin__gt=reserva.hora_inicio)
-            ).exclude(id=reserva.id)
+            competencia = conflictos_espacio(
+                reserva.espacio_id, reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                estados=['PENDIENTE'], excluir_id=reserva.id,
+            )
 
             if competencia.exists() and confirmado != 'si':
                 ids_conflictivos = ", ".join([f"#{r.id}" for r in competencia])
@@ -222,17 +251,16 @@ def aprobar_reserva(request, reserva_id):
 
             try:
                 with transaction.atomic():
-                    for rr in reserva.recursos_asociados.all():
-                        ocupados = RecursoReserva.objects.filter(
-                            recurso=rr.recurso,
-                            reserva__estado='APROBADA',
-                            reserva__fecha=reserva.fecha
-                        ).filter(
-                            Q(reserva__hora_inicio__lt=reserva.hora_fin) &
-                            Q(reserva__hora_fin__gt=reserva.hora_inicio)
-                        ).aggregate(total=Sum('cantidad'))['total'] or 0
-
-                        if (rr.recurso.stock - ocupados) < rr.cantidad:
+                    # Pico de uso simultáneo de los recursos de esta reserva (una sola pasada)
+                    pedidos = list(reserva.recursos_asociados.select_related('recurso'))
+                    stock = stock_por_id(
+                        reserva.fecha, reserva.hora_inicio, reserva.hora_fin,
+                        recurso_ids=[rr.recurso_id for rr in pedidos],
+                        estados=['APROBADA'],
+                    )
+
+                    for rr in pedidos:
+                        if stock[rr.recurso_id]['disponible'] < rr.cantidad:
                             raise ValidationError(f"Stock insuficiente para {rr.recurso.nombre} en el horario solicitado.")
 
                     reserva.estado = 'APROBADA'
@@ -288,35 +316,96 @@ def api_consultar_stock(request):
     if not all([recurso_id, fecha, hora_inicio, hora_fin]):
         return JsonResponse({'error': 'Faltan datos'}, status=400)
 
-    try:
-        recurso = Recurso.objects.get(id=recurso_id)
+    # Si se está editando, la reserva propia no cuenta como ocupación
+    snapshot = stock_snapshot(
+        fecha, hora_inicio, hora_fin,
+        recurso_ids=[recurso_id],
+        excluir_reserva_id=request.GET.get('reserva_id'),
+    )
+    if not snapshot:
+        return JsonResponse({'error': 'Recurso no encontrado'}, status=404)
 
-        ocupados = RecursoReserva.objects.filter(
-            recurso=recurso,
-            reserva__estado__in=['PENDIENTE', 'APROBADA'],
-            reserva__fecha=fecha
-        ).filter(
-            Q(reserva__hora_inicio__lt=hora_fin) &
-            Q(reserva__hora_fin__gt=hora_inicio)
-        ).aggregate(total=Sum('cantidad'))['total'] or 0
+    return JsonResponse({'stock_real': snapshot[0]['disponible']})
 
-        disponible = max(recurso.stock - ocupados, 0)
-        return JsonResponse({'stock_real': disponible})
 
-    except Recurso.DoesNotExist:
-        return JsonResponse({'error': 'Recurso no encontrado'}, status=404)
+@login_required
+def api_reservas_calendario(request):
+    return respuesta_calendario(request)
 
 
 @login_required
-def api_reservas_calendario(request):
-    reservas = Reserva.objects.filter(estado='APROBADA')
-    eventos = []
-    for r in reservas:
-        eventos.append({
-            'title': f"Ocupado: {r.espacio.nombre}",
-            'start': f"{r.fecha}T{r.hora_inicio}",
-            'end': f"{r.fecha}T{r.hora_fin}",
-            'color': '#D71920',
-            'allDay': False,
-        })
-    return JsonResponse(eventos, safe=False)
+def api_calendario_cambios(request):
+    """
+    Sincronización incremental del calendario (ver reservas.calendario.cambios):
+    sin token devuelve la ventana completa; con token, solo lo que cambió.
+    """
+    return respuesta_cambios(request)
+
+
+# ==============================================================================
+# FEEDS ICS (suscripción desde apps de calendario, sin sesión: token en la URL)
+# ==============================================================================
+def ics_espacio(request, token):
+    return ics.respuesta_espacio(request, token)
+
+
+def ics_usuario(request, token):
+    return ics.respuesta_usuario(request, token)
+
+
+@login_required
+def api_bloques_libres(request):
+    """
+    Busca bloques libres en TODOS los espacios activos.
+
+    GET:
+      fecha_desde=YYYY-MM-DD (obligatorio), fecha_hasta=YYYY-MM-DD (máx. 31 días)
+      duracion=minutos (mín. 60), capacidad=N, limite=N
+      recursos=3:2,5:1  (recurso_id:cantidad requeridos)
+    """
+    try:
+        fecha_desde = parse_date(request.GET.get('fecha_desde') or '')
+        fecha_hasta = parse_date(request.GET.get('fecha_hasta') or '') or fecha_desde
+    except ValueError:
+        return JsonResponse({'error': 'Fecha inválida'}, status=400)
+
+    if not fecha_desde:
+        return JsonResponse({'error': 'Faltan datos'}, status=400)
+    if fecha_hasta < fecha_desde or (fecha_hasta - fecha_desde).days > 31:
+        return JsonResponse({'error': 'Rango de fechas inválido (máximo 31 días).'}, status=400)
+
+    try:
+        duracion = max(int(request.GET.get('duracion') or 60), 60)
+        capacidad = int(request.GET.get('capacidad') or 0)
+        limite = min(int(request.GET.get('limite') or 50), 200)
+
+        recursos_pedidos = {}
+        for par in (request.GET.get('recursos') or '').split(','):
+            if ':' in par:
+                rid, cant = par.split(':', 1)
+                recursos_pedidos[int(rid)] = int(cant)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+
+    bloques = buscar_bloques_libres(
+        fecha_desde,
+        fecha_hasta,
+        timedelta(minutes=duracion),
+        capacidad_min=capacidad,
+        recursos_pedidos=recursos_pedidos,
+        limite=limite,
+    )
+
+    return JsonResponse({
+        'bloques': [
+            {
+                **b,
+                'fecha': b['fecha'].isoformat(),
+                'inicio': b['inicio'].strftime('%H:%M'),
+                'fin': b['fin'].strftime('%H:%M'),
+                'libre_hasta': b['libre_hasta'].strftime('%H:%M'),
+            }
+            for b in bloques
+        ],
+        'total': len(bloques),
+    })